@@ -8,6 +8,7 @@ from .models import Post, Category, UserProfile, PendingAuthor
 from .models_ads import AdConfig
 from .admin_ads import AdConfigAdmin
 from .widgets import ImageCropWidget
+from .thumbnails import thumb_url
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.encoding import force_bytes
@@ -220,7 +221,7 @@ class UserAdmin(BaseUserAdmin):
         if hasattr(obj, 'profile') and obj.profile.avatar:
             return format_html(
                 '<img src="{}" width="40" height="40" style="border-radius:50%; object-fit:cover;" />', 
-                obj.profile.avatar.url
+                thumb_url(obj.profile.avatar.name, 80, 80)
             )
         return format_html('<div style="width:40px;height:40px;background:#ddd;border-radius:50%;display:flex;align-items:center;justify-content:center;color:#666;">{}</div>', obj.username[0].upper())
     get_avatar.short_description = 'Avatar'
@@ -628,10 +629,20 @@ class PostAdmin(admin.ModelAdmin):
     actions_menu.short_description = ''
     
     def title_display(self, obj):
+        # Crop/variantes da capa e renditions do corpo rodam em background (blog/image_jobs.py).
+        image_note = {
+            'processing': ' · imagem processando…',
+            'failed': ' · imagem falhou (rode process_image_jobs)',
+        }.get(obj.image_status, '')
+        image_note += {
+            'processing': ' · imagens do corpo processando…',
+            'failed': ' · imagens do corpo falharam (rode process_image_jobs)',
+        }.get(obj.content_images_status, '')
         return format_html(
-            '<strong>{}</strong><br><small class="text-muted">{}</small>',
+            '<strong>{}</strong><br><small class="text-muted">{}{}</small>',
             obj.title,
-            obj.subtitle[:50] + "..." if obj.subtitle else ""
+            obj.subtitle[:50] + "..." if obj.subtitle else "",
+            image_note,
         )
     title_display.short_description = "Matéria"
 
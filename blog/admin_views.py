@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from datetime import date, datetime, timedelta
+from datetime import date, datetime, timedelta, timezone as dt_timezone
 
 from django.db.models import Count
 from django.db.models import Avg, Max
@@ -12,6 +12,8 @@ from django.utils import timezone
 
 from django.contrib import admin
 
+from . import consultas_breaker
+from .consultas_upstream import PROVIDERS
 from .models import EngagementEvent, LinkClick, PageView, Post
 
 
@@ -64,6 +66,16 @@ def _make_range(request: HttpRequest) -> tuple[DateRange, str, date | None, date
     return DateRange(start=start_dt, end=end_dt), preset, start_d, end_d
 
 
+def _consultas_breakers() -> list[dict]:
+    # Circuit breakers dos provedores de /consultas/ (estado compartilhado, no diretório dos snapshots).
+    rows = consultas_breaker.snapshot(PROVIDERS)
+    for row in rows:
+        for field in ("last_failure_at", "last_success_at"):
+            ts = row[field]
+            row[field] = timezone.localtime(datetime.fromtimestamp(ts, tz=dt_timezone.utc)) if ts else None
+    return rows
+
+
 def oxira_dashboard(request: HttpRequest) -> HttpResponse:
     dr, preset, start_d, end_d = _make_range(request)
 
@@ -219,6 +231,7 @@ def oxira_dashboard(request: HttpRequest) -> HttpResponse:
         "clicks_series": list(clicks_series),
         "top_links": top_links,
         "range_label": f"{start_d.strftime('%d/%m/%Y')} – {end_d.strftime('%d/%m/%Y')}",
+        "consultas_breakers": _consultas_breakers(),
     }
 
     return render(request, "admin/oxira_dashboard.html", context)
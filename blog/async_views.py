@@ -0,0 +1,212 @@
+"""Versões async (ASGI) das APIs de /consultas/.
+
+Mesmo contrato das views síncronas em blog/views.py (parse, payload e keys do
+memo de resposta são compartilhados); a diferença é que a espera pelos
+upstreams não segura thread nenhuma e as buscas independentes saem em paralelo.
+"""
+from __future__ import annotations
+
+import asyncio
+from datetime import date
+from urllib.error import HTTPError, URLError
+
+from django.http import HttpRequest, JsonResponse
+from django.utils import timezone
+from django.views.decorators.http import require_GET
+
+from .consultas_cache import CacheMiss, CachedValue, acached_fetch, arefresh_in_background
+from .consultas_prefetch import ensure_prefetcher_started
+from .consultas_response import acached_json_response, fresh_for
+from .consultas_upstream import (
+    UpstreamTarget,
+    crypto_chart_target,
+    crypto_prices_target,
+    fx_table_target,
+    wikipedia_onthisday_target,
+)
+from .views import (
+    LOCAL_FRESH_SECONDS,
+    _bundle_fresh_seconds,
+    _bundle_key,
+    _bundle_params,
+    _crypto_chart_key,
+    _crypto_chart_params,
+    _crypto_chart_payload,
+    _crypto_prices_key,
+    _crypto_prices_params,
+    _crypto_prices_payload,
+    _dayfacts_fresh_seconds,
+    _dayfacts_indexed,
+    _dayfacts_wiki_payload,
+    _fx_latest_key,
+    _fx_latest_params,
+    _fx_latest_payload,
+    _fx_range_key,
+    _fx_range_params,
+    _fx_range_payload,
+    _holidays_payload,
+    _upstream_error_response,
+)
+
+
+async def _acached_fetch_json(target: UpstreamTarget, *, cache_only: bool = False) -> CachedValue:
+    ensure_prefetcher_started()
+    return await acached_fetch(target.cache_key, target.afetch, soft_ttl=target.ttl_seconds, cache_only=cache_only)
+
+
+@require_GET
+async def api_consultas_fx_latest(request: HttpRequest):
+    base, symbols = _fx_latest_params(request)
+    target = fx_table_target(timezone.localdate())
+
+    async def abuild():
+        result = await _acached_fetch_json(target)
+        return _fx_latest_payload(base, symbols, result), fresh_for(result, ttl=target.ttl_seconds)
+
+    try:
+        return await acached_json_response(request, _fx_latest_key(target, base, symbols), abuild)
+    except (HTTPError, URLError, TimeoutError, ValueError) as e:
+        return _upstream_error_response(e)
+
+
+@require_GET
+async def api_consultas_fx_range(request: HttpRequest):
+    base, days = _fx_range_params(request)
+    end = timezone.localdate()
+    target = fx_table_target(end)
+
+    async def abuild():
+        result = await _acached_fetch_json(target)
+        return _fx_range_payload(base, days, end, result), fresh_for(result, ttl=target.ttl_seconds)
+
+    try:
+        return await acached_json_response(request, _fx_range_key(target, base, days, end), abuild)
+    except (HTTPError, URLError, TimeoutError, ValueError) as e:
+        return _upstream_error_response(e)
+
+
+@require_GET
+async def api_consultas_crypto_prices(request: HttpRequest):
+    requested = _crypto_prices_params(request)
+    target = crypto_prices_target()
+
+    async def abuild():
+        result = await _acached_fetch_json(target)
+        return _crypto_prices_payload(requested, result), fresh_for(result, ttl=target.ttl_seconds)
+
+    try:
+        return await acached_json_response(request, _crypto_prices_key(target, requested), abuild)
+    except (HTTPError, URLError, TimeoutError, ValueError) as e:
+        return _upstream_error_response(e)
+
+
+@require_GET
+async def api_consultas_crypto_chart(request: HttpRequest):
+    coin_id, days = _crypto_chart_params(request)
+    if coin_id is None:
+        return JsonResponse({'ok': False, 'error': 'id inválido'}, status=400, json_dumps_params={'ensure_ascii': False})
+    target = crypto_chart_target(coin_id)
+
+    async def abuild():
+        result = await _acached_fetch_json(target)
+        return _crypto_chart_payload(coin_id, days, result), fresh_for(result, ttl=target.ttl_seconds)
+
+    try:
+        return await acached_json_response(request, _crypto_chart_key(target, days), abuild)
+    except (HTTPError, URLError, TimeoutError, ValueError) as e:
+        return _upstream_error_response(e)
+
+
+@require_GET
+async def api_consultas_holidays_today(request: HttpRequest):
+    # Cálculo local, mas a mesclagem com o Nager lê o cache (e, num worker novo,
+    # os snapshots do disco): roda em thread, fora do loop.
+    today = timezone.localdate()
+
+    async def abuild():
+        return await asyncio.to_thread(_holidays_payload, today), LOCAL_FRESH_SECONDS
+
+    return await acached_json_response(request, f"consultas:holidays:{today.isoformat()}", abuild)
+
+
+async def _adayfacts_payload(today: date) -> dict:
+    # O índice é um .json.gz lido do disco (e recarregado quando muda): fora do loop.
+    indexed = await asyncio.to_thread(_dayfacts_indexed, today)
+    if indexed is not None:
+        return indexed
+    # Fora do índice: só o cache da Wikipedia, miss vai para background (como a versão síncrona).
+    target = wikipedia_onthisday_target(today)
+    try:
+        wiki = await _acached_fetch_json(target, cache_only=True)
+    except CacheMiss:
+        arefresh_in_background(target.cache_key, target.afetch)
+        wiki = None
+    return _dayfacts_wiki_payload(today, wiki)
+
+
+@require_GET
+async def api_consultas_dayfacts_today(request: HttpRequest):
+    today = timezone.localdate()
+
+    async def abuild():
+        payload = await _adayfacts_payload(today)
+        return payload, _dayfacts_fresh_seconds(payload)
+
+    return await acached_json_response(request, f"consultas:dayfacts:{today.isoformat()}", abuild)
+
+
+async def _asection(build):
+    # Mesmo isolamento do bundle síncrono: uma seção com erro não derruba as outras.
+    try:
+        return await build()
+    except Exception as e:
+        return {'ok': False, 'error': str(e)}
+
+
+async def _abundle(fx_codes: list[str], crypto_ids: list[str], days: int) -> dict:
+    today = timezone.localdate()
+
+    async def fx_section(code: str) -> dict:
+        return _fx_range_payload(code, days, today, await _acached_fetch_json(fx_table_target(today)))
+
+    async def chart_section(coin_id: str) -> dict:
+        return _crypto_chart_payload(coin_id, days, await _acached_fetch_json(crypto_chart_target(coin_id)))
+
+    async def prices_section() -> dict:
+        return _crypto_prices_payload(crypto_ids, await _acached_fetch_json(crypto_prices_target()))
+
+    async def holidays_section() -> dict:
+        return await asyncio.to_thread(_holidays_payload, today)
+
+    async def dayfacts_section() -> dict:
+        return await _adayfacts_payload(today)
+
+    fx_results, chart_results, prices, holidays, dayfacts = await asyncio.gather(
+        asyncio.gather(*[_asection(lambda code=code: fx_section(code)) for code in fx_codes]),
+        asyncio.gather(*[_asection(lambda coin_id=coin_id: chart_section(coin_id)) for coin_id in crypto_ids]),
+        _asection(prices_section),
+        _asection(holidays_section),
+        _asection(dayfacts_section),
+    )
+
+    return {
+        'ok': True,
+        'fx': dict(zip(fx_codes, fx_results)),
+        'crypto': {
+            'prices': prices,
+            'charts': dict(zip(crypto_ids, chart_results)),
+        },
+        'holidays': holidays,
+        'dayfacts': dayfacts,
+    }
+
+
+@require_GET
+async def api_consultas_bundle(request: HttpRequest):
+    fx_codes, crypto_ids, days = _bundle_params(request)
+
+    async def abuild():
+        bundle = await _abundle(fx_codes, crypto_ids, days)
+        return bundle, _bundle_fresh_seconds(bundle)
+
+    return await acached_json_response(request, _bundle_key(fx_codes, crypto_ids, days), abuild)
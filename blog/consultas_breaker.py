@@ -0,0 +1,236 @@
+from __future__ import annotations
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Iterator
+from urllib.error import HTTPError
+
+from django.core.cache import cache
+
+from . import consultas_snapshot
+from .consultas_cache import UpstreamUnavailable
+
+
+# Falhas seguidas (dentro da janela) para abrir o circuito do provedor.
+FAILURE_THRESHOLD = 5
+FAILURE_WINDOW_SECONDS = 60
+
+# Tempo aberto antes do primeiro probe; dobra a cada probe que falha.
+OPEN_SECONDS = 30
+MAX_OPEN_SECONDS = 5 * 60
+
+# Só um probe por vez no half-open (entre threads e workers).
+# Maior que o timeout de leitura, para o lock não vencer com o probe em voo.
+PROBE_LOCK_SECONDS = 15
+
+STATE_TTL_SECONDS = 24 * 60 * 60
+
+# O estado fica num arquivo no diretório dos snapshots, compartilhado entre
+# workers (o LocMem é por processo). Cada atualização é um read-modify-write
+# sob trava em arquivo; se a trava demorar, atualiza sem ela (perde no máximo
+# uma contagem de falha, não o estado).
+STATE_LOCK_SECONDS = 5
+STATE_LOCK_WAIT_SECONDS = 0.5
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpen(UpstreamUnavailable):
+    """Provedor com circuito aberto: falha na hora, sem ir à rede."""
+
+    def __init__(self, provider: str, retry_after: float):
+        super().__init__(f"{provider} indisponível (circuito aberto)", retry_after=retry_after)
+        self.provider = provider
+
+
+_lock = threading.Lock()
+
+
+def _state_key(provider: str) -> str:
+    return f"consultas:breaker:{provider}"
+
+
+def _probe_key(provider: str) -> str:
+    return f"consultas:breaker:{provider}:probe"
+
+
+def _load(provider: str) -> dict:
+    if consultas_snapshot.snapshot_dir():
+        state = consultas_snapshot.load_state(_state_key(provider))
+    else:
+        # Sem diretório de snapshots: estado só deste processo.
+        state = cache.get(_state_key(provider))
+    if not isinstance(state, dict):
+        state = {
+            'state': CLOSED,
+            'failures': 0,
+            'open_until': 0.0,
+            'open_seconds': 0,
+            'trips': 0,
+            'last_error': '',
+            'last_failure_at': None,
+            'last_success_at': None,
+        }
+    return state
+
+
+def _save(provider: str, state: dict) -> None:
+    if not consultas_snapshot.save_state(_state_key(provider), state):
+        cache.set(_state_key(provider), state, STATE_TTL_SECONDS)
+
+
+@contextmanager
+def _updating(provider: str) -> Iterator[dict]:
+    """Carrega, deixa alterar e grava o estado, travado entre threads e workers."""
+    lock_key = f"{_state_key(provider)}:write"
+    deadline = time.monotonic() + STATE_LOCK_WAIT_SECONDS
+    with _lock:
+        claimed = consultas_snapshot.claim(lock_key, STATE_LOCK_SECONDS)
+        while not claimed and time.monotonic() < deadline:
+            time.sleep(0.01)
+            claimed = consultas_snapshot.claim(lock_key, STATE_LOCK_SECONDS)
+        try:
+            state = _load(provider)
+            yield state
+            _save(provider, state)
+        finally:
+            if claimed:
+                consultas_snapshot.release(lock_key)
+
+
+def _claim_probe(provider: str) -> bool:
+    # cache.add trava threads deste processo; claim() trava os outros workers.
+    if not cache.add(_probe_key(provider), 1, PROBE_LOCK_SECONDS):
+        return False
+    if consultas_snapshot.claim(_probe_key(provider), PROBE_LOCK_SECONDS):
+        return True
+    cache.delete(_probe_key(provider))
+    return False
+
+
+def _release_probe(provider: str) -> None:
+    consultas_snapshot.release(_probe_key(provider))
+    cache.delete(_probe_key(provider))
+
+
+def _counts_as_failure(e: Exception) -> bool:
+    # 4xx (fora 429) é erro nosso/do parâmetro: o provedor respondeu, está de pé.
+    if isinstance(e, HTTPError):
+        return e.code == 429 or e.code >= 500
+    return True
+
+
+def _before_call(provider: str) -> bool:
+    """Levanta CircuitOpen se não pode chamar. Retorna True se a chamada é o probe."""
+    state = _load(provider)
+    if state['state'] == CLOSED:
+        return False
+
+    now = time.time()
+    if state['state'] == OPEN and now < state['open_until']:
+        raise CircuitOpen(provider, retry_after=state['open_until'] - now)
+
+    if not _claim_probe(provider):
+        raise CircuitOpen(provider, retry_after=PROBE_LOCK_SECONDS)
+
+    with _updating(provider) as state:
+        state['state'] = HALF_OPEN
+    return True
+
+
+def _record_success(provider: str, probe: bool) -> None:
+    with _updating(provider) as state:
+        if state['state'] != CLOSED or state['failures']:
+            state.update(state=CLOSED, failures=0, open_until=0.0, open_seconds=0)
+        state['last_success_at'] = time.time()
+    if probe:
+        _release_probe(provider)
+
+
+def _record_failure(provider: str, probe: bool, error: BaseException) -> None:
+    now = time.time()
+    with _updating(provider) as state:
+        last = state.get('last_failure_at')
+        if last is None or now - last > FAILURE_WINDOW_SECONDS:
+            state['failures'] = 0
+        state['failures'] += 1
+        state['last_failure_at'] = now
+        state['last_error'] = f"{type(error).__name__}: {error}"[:200]
+
+        if probe:
+            # Probe falhou: volta a abrir, com espera maior.
+            open_seconds = min(max(state['open_seconds'], OPEN_SECONDS) * 2, MAX_OPEN_SECONDS)
+            state.update(state=OPEN, open_seconds=open_seconds, open_until=now + open_seconds)
+        elif state['state'] == CLOSED and state['failures'] >= FAILURE_THRESHOLD:
+            state.update(state=OPEN, open_seconds=OPEN_SECONDS, open_until=now + OPEN_SECONDS, trips=state['trips'] + 1)
+    if probe:
+        _release_probe(provider)
+
+
+def _settle(provider: str, probe: bool, error: BaseException | None) -> None:
+    if error is not None and not isinstance(error, Exception):
+        # Cancelamento/interrupção: não diz nada sobre o provedor.
+        if probe:
+            _release_probe(provider)
+    elif error is None:
+        _record_success(provider, probe)
+    elif _counts_as_failure(error):
+        _record_failure(provider, probe, error)
+    else:
+        _record_success(provider, probe)
+
+
+def guard(provider: str, fetch: Callable[[], Any]) -> Callable[[], Any]:
+    """Embrulha o fetch de um provedor no circuit breaker."""
+
+    def guarded():
+        probe = _before_call(provider)
+        try:
+            data = fetch()
+        except BaseException as e:
+            _settle(provider, probe, e)
+            raise
+        _settle(provider, probe, None)
+        return data
+
+    return guarded
+
+
+def aguard(provider: str, afetch: Callable[[], Awaitable[Any]]) -> Callable[[], Awaitable[Any]]:
+    """Versão async de guard."""
+
+    async def guarded():
+        probe = _before_call(provider)
+        try:
+            data = await afetch()
+        except BaseException as e:
+            _settle(provider, probe, e)
+            raise
+        _settle(provider, probe, None)
+        return data
+
+    return guarded
+
+
+def snapshot(providers) -> list[dict]:
+    """Estado atual dos circuitos, o mesmo para todos os workers (dashboard do admin)."""
+    now = time.time()
+    rows = []
+    for provider in providers:
+        state = _load(provider)
+        rows.append(
+            {
+                'provider': provider,
+                'state': state['state'],
+                'failures': state['failures'],
+                'trips': state['trips'],
+                'retry_in': max(0, int(state['open_until'] - now)) if state['state'] == OPEN else 0,
+                'last_error': state['last_error'],
+                'last_failure_at': state['last_failure_at'],
+                'last_success_at': state['last_success_at'],
+            }
+        )
+    return rows
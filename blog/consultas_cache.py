@@ -0,0 +1,479 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
+from urllib.error import URLError
+
+from django.core.cache import cache
+
+from . import consultas_snapshot
+
+
+# Quanto tempo manter a última resposta boa no cache, mesmo velha.
+# É isso que permite servir "stale" quando o upstream cai.
+KEEP_SECONDS = 7 * 24 * 60 * 60
+
+# TTL "duro": passou disso, o dado ainda é servido, mas marcado como stale.
+# Sempre bem acima do soft TTL (alvos de 6h não podem nascer stale).
+DEFAULT_HARD_TTL = 6 * 60 * 60
+HARD_TTL_FACTOR = 4
+
+# Trava curta (entre workers) para não disparar vários refresh do mesmo key.
+REFRESH_LOCK_SECONDS = 30
+
+# Single-flight: só um fetch por key em voo. Entre threads, o Future do líder;
+# entre workers (o LocMem é por processo), o arquivo de trava do
+# consultas_snapshot, e quem espera adota o snapshot que o líder gravar.
+# O lock expira sozinho caso o worker líder morra no meio do caminho.
+SINGLE_FLIGHT_LOCK_SECONDS = 15
+SINGLE_FLIGHT_WAIT_SECONDS = 10.0
+SINGLE_FLIGHT_POLL_SECONDS = 0.05
+
+# Cache negativo: depois de um fetch com erro, misses da mesma key falham na
+# hora por alguns segundos em vez de esperar o timeout de novo.
+NEGATIVE_TTL_SECONDS = 30
+
+
+class CacheMiss(LookupError):
+    """Key ainda não buscada (leituras com cache_only=True)."""
+
+
+class UpstreamUnavailable(URLError):
+    """Upstream falhou há pouco (cache negativo ou circuito aberto)."""
+
+    def __init__(self, reason: str, retry_after: float = NEGATIVE_TTL_SECONDS):
+        super().__init__(reason)
+        self.retry_after = max(1, int(retry_after))
+
+
+def hard_ttl_for(soft_ttl: int) -> int:
+    """TTL duro padrão de um alvo: pelo menos DEFAULT_HARD_TTL e HARD_TTL_FACTOR × soft_ttl."""
+    return max(DEFAULT_HARD_TTL, HARD_TTL_FACTOR * int(soft_ttl))
+
+
+@dataclass(frozen=True)
+class CachedValue:
+    data: Any
+    fetched_at: float
+    stale: bool
+
+
+_refreshing: set[str] = set()
+_refreshing_lock = threading.Lock()
+
+_inflight: dict[str, Future] = {}
+_inflight_lock = threading.Lock()
+
+# Versão async: futures por (event loop, key) e tasks de refresh vivas.
+_ainflight: dict[tuple[int, str], asyncio.Future] = {}
+_abackground: set[asyncio.Task] = set()
+
+
+def _envelope(data: Any) -> dict:
+    return {'_swr': 1, 'data': data, 'fetched_at': time.time()}
+
+
+def _restore(cache_key: str, entry: dict) -> None:
+    # Não sobrescreve o que o processo já tiver de mais novo.
+    current = cache.get(cache_key)
+    if isinstance(current, dict) and current.get('_swr') == 1 and current['fetched_at'] >= entry['fetched_at']:
+        return
+    cache.set(cache_key, entry, KEEP_SECONDS)
+
+
+def _read(cache_key: str) -> dict | None:
+    # Worker novo: parte da última resposta boa gravada em disco (consultas_snapshot).
+    consultas_snapshot.ensure_loaded(_restore)
+    entry = cache.get(cache_key)
+    # Entradas antigas (antes do SWR) guardavam o JSON cru: trata como miss.
+    if not isinstance(entry, dict) or entry.get('_swr') != 1:
+        return None
+    return entry
+
+
+def _store(cache_key: str, data: Any) -> dict:
+    entry = _envelope(data)
+    cache.set(cache_key, entry, KEEP_SECONDS)
+    consultas_snapshot.save(cache_key, entry)
+    return entry
+
+
+def _adopt_snapshot(cache_key: str, than: float) -> dict | None:
+    """Usa o snapshot do disco se ele for mais novo que `than` (outro worker já buscou).
+
+    Com cache por processo, é o que evita cada worker ir ao upstream pela mesma key.
+    """
+    entry = consultas_snapshot.load(cache_key)
+    if entry is None or float(entry.get('fetched_at') or 0.0) <= than:
+        return None
+    cache.set(cache_key, entry, KEEP_SECONDS)
+    return entry
+
+
+def _fetched_at(cache_key: str) -> float:
+    entry = _read(cache_key)
+    return float(entry.get('fetched_at') or 0.0) if entry else 0.0
+
+
+def _remember_failure(cache_key: str, error: Exception) -> None:
+    # Circuito aberto já falha rápido sozinho; não precisa de entrada negativa.
+    if isinstance(error, UpstreamUnavailable):
+        return
+    cache.set(
+        f"{cache_key}:neg",
+        {'error': f"{type(error).__name__}: {error}"[:200], 'until': time.time() + NEGATIVE_TTL_SECONDS},
+        NEGATIVE_TTL_SECONDS,
+    )
+
+
+def _raise_if_recently_failed(cache_key: str) -> None:
+    neg = cache.get(f"{cache_key}:neg")
+    if isinstance(neg, dict):
+        raise UpstreamUnavailable(neg.get('error') or 'upstream indisponível', retry_after=neg['until'] - time.time())
+
+
+def _claim(cache_key: str) -> bool:
+    # cache.add trava threads e loops deste processo; claim() trava os outros workers.
+    lock_key = f"{cache_key}:lock"
+    if not cache.add(lock_key, 1, SINGLE_FLIGHT_LOCK_SECONDS):
+        return False
+    if consultas_snapshot.claim(cache_key, SINGLE_FLIGHT_LOCK_SECONDS):
+        return True
+    cache.delete(lock_key)
+    return False
+
+
+def _unclaim(cache_key: str) -> None:
+    consultas_snapshot.release(cache_key)
+    cache.delete(f"{cache_key}:lock")
+
+
+def _claimed(cache_key: str) -> bool:
+    return (
+        cache.get(f"{cache_key}:lock") is not None
+        or consultas_snapshot.claimed(cache_key, SINGLE_FLIGHT_LOCK_SECONDS)
+    )
+
+
+def _landed(cache_key: str) -> dict | None:
+    # O que o líder gravou: no cache, se for deste processo; no disco, se for de outro worker.
+    return _read(cache_key) or _adopt_snapshot(cache_key, 0.0)
+
+
+def _fetch_across_workers(cache_key: str, fetch: Callable[[], Any]) -> dict:
+    deadline = time.monotonic() + SINGLE_FLIGHT_WAIT_SECONDS
+
+    while True:
+        if _claim(cache_key):
+            try:
+                # Outro worker pode ter gravado entre o miss e o lock.
+                entry = _landed(cache_key)
+                if entry is not None:
+                    return entry
+                try:
+                    data = fetch()
+                except Exception as e:
+                    _remember_failure(cache_key, e)
+                    raise
+                return _store(cache_key, data)
+            finally:
+                _unclaim(cache_key)
+
+        # Outro worker está buscando: espera o resultado aparecer no cache ou no disco.
+        while _claimed(cache_key):
+            entry = _landed(cache_key)
+            if entry is not None:
+                return entry
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"Timeout aguardando fetch de {cache_key}")
+            time.sleep(SINGLE_FLIGHT_POLL_SECONDS)
+
+        entry = _landed(cache_key)
+        if entry is not None:
+            return entry
+        # O líder falhou (lock liberado sem valor): repassa o erro dele, se gravado.
+        _raise_if_recently_failed(cache_key)
+        if time.monotonic() >= deadline:
+            raise TimeoutError(f"Timeout aguardando fetch de {cache_key}")
+
+
+def fetch_single_flight(cache_key: str, fetch: Callable[[], Any]) -> dict:
+    """Busca e grava a key garantindo um único fetch em voo.
+
+    Threads do mesmo processo esperam o Future do líder; outros workers
+    esperam enquanto o arquivo de trava existir e adotam o snapshot gravado.
+    Sem diretório de snapshots, a garantia vale só dentro do processo.
+    Se a key falhou há menos de NEGATIVE_TTL_SECONDS, levanta UpstreamUnavailable na hora.
+    """
+    _raise_if_recently_failed(cache_key)
+    with _inflight_lock:
+        fut = _inflight.get(cache_key)
+        leader = fut is None
+        if leader:
+            fut = Future()
+            _inflight[cache_key] = fut
+
+    if not leader:
+        return fut.result(timeout=SINGLE_FLIGHT_WAIT_SECONDS)
+
+    try:
+        entry = _fetch_across_workers(cache_key, fetch)
+    except BaseException as e:
+        fut.set_exception(e)
+        raise
+    else:
+        fut.set_result(entry)
+        return entry
+    finally:
+        with _inflight_lock:
+            _inflight.pop(cache_key, None)
+
+
+def peek(cache_key: str) -> dict | None:
+    """Lê a entrada (data + fetched_at) sem disparar refresh."""
+    return _read(cache_key)
+
+
+def refresh_now(cache_key: str, fetch: Callable[[], Any]) -> dict | None:
+    """Busca e grava agora (usado pelo prefetcher).
+
+    Retorna None se outro refresh da mesma key já está em andamento.
+    Exceções do fetch sobem para quem chamou.
+    """
+    if not cache.add(f"{cache_key}:refresh", 1, REFRESH_LOCK_SECONDS):
+        return None
+    if not consultas_snapshot.claim(cache_key, REFRESH_LOCK_SECONDS):
+        cache.delete(f"{cache_key}:refresh")
+        return None
+    try:
+        return _adopt_snapshot(cache_key, _fetched_at(cache_key)) or _store(cache_key, fetch())
+    finally:
+        consultas_snapshot.release(cache_key)
+        cache.delete(f"{cache_key}:refresh")
+
+
+def _refresh_worker(cache_key: str, fetch: Callable[[], Any]) -> None:
+    try:
+        if _adopt_snapshot(cache_key, _fetched_at(cache_key)) is None:
+            _store(cache_key, fetch())
+    except Exception:
+        # Mantém o valor antigo; a próxima leitura tenta de novo.
+        pass
+    finally:
+        consultas_snapshot.release(cache_key)
+        cache.delete(f"{cache_key}:refresh")
+        with _refreshing_lock:
+            _refreshing.discard(cache_key)
+
+
+def refresh_in_background(cache_key: str, fetch: Callable[[], Any]) -> bool:
+    """Dispara um refresh em thread, no máximo um por key (processo e workers)."""
+    with _refreshing_lock:
+        if cache_key in _refreshing:
+            return False
+        _refreshing.add(cache_key)
+
+    if not cache.add(f"{cache_key}:refresh", 1, REFRESH_LOCK_SECONDS):
+        with _refreshing_lock:
+            _refreshing.discard(cache_key)
+        return False
+    # Outro worker já está atualizando: a trava local fica até expirar e o
+    # próximo refresh daqui adota o snapshot que ele gravar.
+    if not consultas_snapshot.claim(cache_key, REFRESH_LOCK_SECONDS):
+        with _refreshing_lock:
+            _refreshing.discard(cache_key)
+        return False
+
+    t = threading.Thread(
+        target=_refresh_worker,
+        args=(cache_key, fetch),
+        name=f"oxira-swr:{cache_key}",
+        daemon=True,
+    )
+    t.start()
+    return True
+
+
+def cached_fetch(
+    cache_key: str,
+    fetch: Callable[[], Any],
+    *,
+    soft_ttl: int,
+    hard_ttl: int | None = None,
+    cache_only: bool = False,
+) -> CachedValue:
+    """Cache stale-while-revalidate.
+
+    - Até soft_ttl: devolve o cache.
+    - Depois de soft_ttl: devolve o cache na hora e atualiza em background.
+    - Depois de hard_ttl: idem, mas marca `stale=True` (upstream falhando).
+      Sem hard_ttl, usa hard_ttl_for(soft_ttl).
+    Só bloqueia no upstream quando a key nunca foi buscada (ou expirou de vez),
+    e mesmo assim com um único fetch em voo por key (single-flight).
+    Com cache_only=True, um miss levanta CacheMiss em vez de ir ao upstream.
+    """
+    entry = _read(cache_key)
+    if entry is None:
+        if cache_only:
+            raise CacheMiss(cache_key)
+        entry = fetch_single_flight(cache_key, fetch)
+        return CachedValue(data=entry['data'], fetched_at=entry['fetched_at'], stale=False)
+
+    fetched_at = float(entry.get('fetched_at') or 0.0)
+    age = time.time() - fetched_at
+    if age >= soft_ttl:
+        refresh_in_background(cache_key, fetch)
+
+    hard = max(hard_ttl or hard_ttl_for(soft_ttl), soft_ttl)
+    return CachedValue(data=entry['data'], fetched_at=fetched_at, stale=age >= hard)
+
+
+# Versão async (views ASGI). O cache (LocMem) continua síncrono, em memória;
+# o que toca o disco (carga, leitura e gravação dos snapshots, travas entre
+# workers) roda em thread via asyncio.to_thread, fora do loop.
+
+async def _aread(cache_key: str) -> dict | None:
+    if not consultas_snapshot.is_loaded():
+        await asyncio.to_thread(consultas_snapshot.ensure_loaded, _restore)
+    return _read(cache_key)
+
+
+async def _astore(cache_key: str, data: Any) -> dict:
+    entry = _envelope(data)
+    cache.set(cache_key, entry, KEEP_SECONDS)
+    await asyncio.to_thread(consultas_snapshot.save, cache_key, entry)
+    return entry
+
+
+async def _aadopt_snapshot(cache_key: str, than: float) -> dict | None:
+    entry = await asyncio.to_thread(consultas_snapshot.load, cache_key)
+    if entry is None or float(entry.get('fetched_at') or 0.0) <= than:
+        return None
+    cache.set(cache_key, entry, KEEP_SECONDS)
+    return entry
+
+
+async def _afetch_across_workers(cache_key: str, afetch: Callable[[], Awaitable[Any]]) -> dict:
+    deadline = time.monotonic() + SINGLE_FLIGHT_WAIT_SECONDS
+
+    while True:
+        if await asyncio.to_thread(_claim, cache_key):
+            try:
+                entry = await _aread(cache_key) or await _aadopt_snapshot(cache_key, 0.0)
+                if entry is not None:
+                    return entry
+                try:
+                    data = await afetch()
+                except Exception as e:
+                    _remember_failure(cache_key, e)
+                    raise
+                return await _astore(cache_key, data)
+            finally:
+                await asyncio.to_thread(_unclaim, cache_key)
+
+        while await asyncio.to_thread(_claimed, cache_key):
+            entry = await asyncio.to_thread(_landed, cache_key)
+            if entry is not None:
+                return entry
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"Timeout aguardando fetch de {cache_key}")
+            await asyncio.sleep(SINGLE_FLIGHT_POLL_SECONDS)
+
+        entry = await asyncio.to_thread(_landed, cache_key)
+        if entry is not None:
+            return entry
+        _raise_if_recently_failed(cache_key)
+        if time.monotonic() >= deadline:
+            raise TimeoutError(f"Timeout aguardando fetch de {cache_key}")
+
+
+async def afetch_single_flight(cache_key: str, afetch: Callable[[], Awaitable[Any]]) -> dict:
+    """Equivalente async de fetch_single_flight (um fetch por key no loop e entre workers)."""
+    _raise_if_recently_failed(cache_key)
+    loop = asyncio.get_running_loop()
+    flight_key = (id(loop), cache_key)
+    fut = _ainflight.get(flight_key)
+    if fut is not None:
+        return await asyncio.wait_for(asyncio.shield(fut), timeout=SINGLE_FLIGHT_WAIT_SECONDS)
+
+    fut = loop.create_future()
+    _ainflight[flight_key] = fut
+    try:
+        entry = await _afetch_across_workers(cache_key, afetch)
+    except BaseException as e:
+        fut.set_exception(e)
+        # Evita "exception was never retrieved" quando ninguém estava esperando.
+        fut.exception()
+        raise
+    else:
+        fut.set_result(entry)
+        return entry
+    finally:
+        _ainflight.pop(flight_key, None)
+
+
+async def _arefresh_worker(cache_key: str, afetch: Callable[[], Awaitable[Any]]) -> None:
+    claimed = False
+    try:
+        # Outro worker já está atualizando: a trava local fica até expirar e o
+        # próximo refresh daqui adota o snapshot que ele gravar.
+        claimed = await asyncio.to_thread(consultas_snapshot.claim, cache_key, REFRESH_LOCK_SECONDS)
+        if not claimed:
+            return
+        if await _aadopt_snapshot(cache_key, _fetched_at(cache_key)) is None:
+            await _astore(cache_key, await afetch())
+    except Exception:
+        pass
+    finally:
+        if claimed:
+            await asyncio.to_thread(consultas_snapshot.release, cache_key)
+            cache.delete(f"{cache_key}:refresh")
+        with _refreshing_lock:
+            _refreshing.discard(cache_key)
+
+
+def arefresh_in_background(cache_key: str, afetch: Callable[[], Awaitable[Any]]) -> bool:
+    with _refreshing_lock:
+        if cache_key in _refreshing:
+            return False
+        _refreshing.add(cache_key)
+
+    if not cache.add(f"{cache_key}:refresh", 1, REFRESH_LOCK_SECONDS):
+        with _refreshing_lock:
+            _refreshing.discard(cache_key)
+        return False
+
+    # A trava entre workers (arquivo) é pega dentro da task, fora do loop.
+    task = asyncio.get_running_loop().create_task(_arefresh_worker(cache_key, afetch))
+    _abackground.add(task)
+    task.add_done_callback(_abackground.discard)
+    return True
+
+
+async def acached_fetch(
+    cache_key: str,
+    afetch: Callable[[], Awaitable[Any]],
+    *,
+    soft_ttl: int,
+    hard_ttl: int | None = None,
+    cache_only: bool = False,
+) -> CachedValue:
+    """Mesmo contrato de cached_fetch, com fetch assíncrono."""
+    entry = await _aread(cache_key)
+    if entry is None:
+        if cache_only:
+            raise CacheMiss(cache_key)
+        entry = await afetch_single_flight(cache_key, afetch)
+        return CachedValue(data=entry['data'], fetched_at=entry['fetched_at'], stale=False)
+
+    fetched_at = float(entry.get('fetched_at') or 0.0)
+    age = time.time() - fetched_at
+    if age >= soft_ttl:
+        arefresh_in_background(cache_key, afetch)
+
+    hard = max(hard_ttl or hard_ttl_for(soft_ttl), soft_ttl)
+    return CachedValue(data=entry['data'], fetched_at=fetched_at, stale=age >= hard)
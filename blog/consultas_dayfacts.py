@@ -0,0 +1,228 @@
+"""Curiosidades do dia (/api/consultas/dayfacts/today/).
+
+O request só faz lookup: o índice do ano inteiro (366 dias, dataset interno
++ Wikipedia "on this day", com os resumos já montados) é gerado pelo comando
+`build_dayfacts_index` e lido do disco uma vez por processo.
+"""
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import threading
+import time
+from datetime import date, timedelta
+from functools import lru_cache
+
+from django.conf import settings
+
+from .consultas_upstream import stable_pick
+
+
+INDEX_VERSION = 1
+MAX_ITEMS = 12
+
+# Ano bissexto de referência para percorrer todos os MM-DD (inclui 29/02).
+_LEAP_YEAR = 2024
+
+# Só confere o mtime do arquivo de tempos em tempos (o lookup continua em memória).
+_INDEX_RECHECK_SECONDS = 60
+
+# Chave: MM-DD (datas fixas). Mantemos só coisas úteis/realmente populares.
+DAY_FACTS: dict[str, list[dict]] = {
+    '01-01': [
+        {'kind': 'comemorativa', 'title': 'Ano Novo', 'year': None, 'about': 'Primeiro dia do ano; muita gente usa como marco pra planos e recomeços.'},
+    ],
+    '03-08': [
+        {'kind': 'comemorativa', 'title': 'Dia Internacional da Mulher', 'year': None, 'about': 'Data de reconhecimento e reflexão sobre direitos e igualdade.'},
+    ],
+    '04-21': [
+        {'kind': 'feriado', 'title': 'Tiradentes (Brasil)', 'year': None, 'about': 'Feriado nacional brasileiro em homenagem a Tiradentes.'},
+    ],
+    '05-01': [
+        {'kind': 'comemorativa', 'title': 'Dia do Trabalhador', 'year': None, 'about': 'Data ligada à história do trabalho e direitos trabalhistas.'},
+    ],
+    '05-08': [
+        {'kind': 'fato', 'title': 'Fim da Segunda Guerra Mundial na Europa (VE Day)', 'year': 1945, 'about': 'Marca a rendição da Alemanha na Europa e o encerramento do conflito no continente.'},
+    ],
+    '06-05': [
+        {'kind': 'comemorativa', 'title': 'Dia Mundial do Meio Ambiente', 'year': None, 'about': 'Data global para lembrar ações de preservação ambiental.'},
+    ],
+    '07-20': [
+        {'kind': 'comemorativa', 'title': 'Dia do Amigo (Brasil)', 'year': None, 'about': 'Data popular no Brasil para celebrar amizade e vínculos.'},
+    ],
+    '07-30': [
+        {'kind': 'comemorativa', 'title': 'Dia Internacional da Amizade (ONU)', 'year': None, 'about': 'Data internacional para incentivar amizade e cooperação.'},
+    ],
+    '08-11': [
+        {'kind': 'comemorativa', 'title': 'Dia dos Pais (referência)', 'year': None, 'about': 'No Brasil é celebrado em agosto (data variável por ano).'},
+    ],
+    '09-02': [
+        {'kind': 'fato', 'title': 'Fim da Segunda Guerra Mundial (assinatura da rendição do Japão)', 'year': 1945, 'about': 'Assinatura formal da rendição do Japão, marcando o fim do conflito em escala global.'},
+    ],
+    '09-07': [
+        {'kind': 'feriado', 'title': 'Independência do Brasil', 'year': 1822, 'about': 'Feriado nacional que marca a independência do Brasil.'},
+    ],
+    '10-12': [
+        {'kind': 'feriado', 'title': 'Nossa Senhora Aparecida (Brasil)', 'year': None, 'about': 'Feriado nacional e data religiosa importante no país.'},
+        {'kind': 'comemorativa', 'title': 'Dia das Crianças (Brasil)', 'year': None, 'about': 'Data popular de celebração e consumo (presentes) no Brasil.'},
+    ],
+    '11-02': [
+        {'kind': 'feriado', 'title': 'Finados (Brasil)', 'year': None, 'about': 'Dia de memória e homenagem aos falecidos.'},
+    ],
+    '11-15': [
+        {'kind': 'feriado', 'title': 'Proclamação da República (Brasil)', 'year': 1889, 'about': 'Feriado nacional que marca a proclamação da República.'},
+    ],
+    '11-20': [
+        {'kind': 'feriado', 'title': 'Dia da Consciência Negra (Brasil)', 'year': None, 'about': 'Data de reflexão sobre a luta e contribuições da população negra.'},
+    ],
+    '12-25': [
+        {'kind': 'feriado', 'title': 'Natal', 'year': None, 'about': 'Data tradicional, com forte presença cultural e religiosa.'},
+    ],
+}
+
+
+def index_path() -> str:
+    return getattr(settings, 'OXIRA_DAYFACTS_INDEX', '') or os.path.join(settings.BASE_DIR, 'var', 'dayfacts_index.json.gz')
+
+
+@lru_cache(maxsize=8)
+def _dataset_items_cached(date_obj: date) -> tuple[dict, ...]:
+    items = DAY_FACTS.get(date_obj.strftime('%m-%d'), [])
+    out = []
+    for idx, item in enumerate(items):
+        title = item.get('title') or 'Curiosidade'
+        about = item.get('about') or ''
+        year = item.get('year')
+        kind = item.get('kind') or 'comemorativa'
+
+        vibe = stable_pick(
+            f"{date_obj.isoformat()}:{title}:{idx}",
+            [
+                'Hoje é um daqueles dias que vale marcar no calendário.',
+                'Dá pra usar isso como gancho pra uma conversa boa.',
+                'Se você gosta de contexto, essa data é um prato cheio.',
+                'Curiosidade útil pra não passar batido no dia.',
+            ],
+        )
+        why = stable_pick(
+            f"{date_obj.isoformat()}:{title}:why:{idx}",
+            [
+                'Por que isso importa: muda a agenda, o humor do país ou a rotina de muita gente.',
+                'Por que isso importa: vira referência cultural e aparece muito em notícias e calendários.',
+                'Por que isso importa: é um marco que ajuda a entender o presente.',
+            ],
+        )
+
+        year_txt = f" ({year})" if isinstance(year, int) else ''
+        ia_summary = f"{vibe} {about} {why}".strip()
+
+        out.append(
+            {
+                'kind': kind,
+                'title': f"{title}{year_txt}",
+                'about': about,
+                'ia_summary': ia_summary,
+                'source': 'dataset',
+            }
+        )
+    return tuple(out)
+
+
+def dataset_items(date_obj: date) -> list[dict]:
+    """Itens do dataset interno para o dia, com os resumos (stable_pick) prontos."""
+    return list(_dataset_items_cached(date_obj))
+
+
+def merge_items(dataset: list[dict], wiki: list[dict]) -> list[dict]:
+    # Dataset (curado) primeiro; Wikipedia completa, sem repetir título.
+    out: list[dict] = []
+    seen: set[str] = set()
+    for item in list(dataset) + list(wiki or []):
+        key = (item.get('title') or '').strip().lower()
+        if not key or key in seen:
+            continue
+        seen.add(key)
+        out.append(item)
+        if len(out) >= MAX_ITEMS:
+            break
+    return out
+
+
+def index_days(year: int) -> list[tuple[str, date]]:
+    """Os 366 MM-DD, cada um com a data usada para os resumos (29/02 cai no ano bissexto de referência)."""
+    out = []
+    day = date(_LEAP_YEAR, 1, 1)
+    while day.year == _LEAP_YEAR:
+        key = day.strftime('%m-%d')
+        try:
+            out.append((key, date(year, day.month, day.day)))
+        except ValueError:
+            out.append((key, day))
+        day += timedelta(days=1)
+    return out
+
+
+def save_index(days: dict[str, list[dict]], *, year: int, path: str | None = None) -> str:
+    path = path or index_path()
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    payload = {'version': INDEX_VERSION, 'year': year, 'built_at': time.time(), 'days': days}
+    raw = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    # Grava em arquivo temporário e troca: leitores nunca veem um índice pela metade.
+    tmp = f"{path}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(gzip.compress(raw, compresslevel=9))
+    os.replace(tmp, path)
+    return path
+
+
+_index_lock = threading.Lock()
+# (path, mtime, checked_at, days)
+_index_state: tuple[str, float, float, dict[str, list[dict]] | None] | None = None
+
+
+def _load_index(path: str) -> dict[str, list[dict]] | None:
+    try:
+        with open(path, 'rb') as f:
+            payload = json.loads(gzip.decompress(f.read()).decode('utf-8'))
+    except (OSError, ValueError):
+        return None
+    if not isinstance(payload, dict) or payload.get('version') != INDEX_VERSION:
+        return None
+    days = payload.get('days')
+    return days if isinstance(days, dict) else None
+
+
+def _index() -> dict[str, list[dict]] | None:
+    global _index_state
+    path = index_path()
+    now = time.monotonic()
+    state = _index_state
+    if state is not None and state[0] == path and now - state[2] < _INDEX_RECHECK_SECONDS:
+        return state[3]
+
+    with _index_lock:
+        state = _index_state
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            mtime = 0.0
+        if state is not None and state[0] == path and state[1] == mtime:
+            days = state[3]
+        else:
+            days = _load_index(path) if mtime else None
+        _index_state = (path, mtime, now, days)
+        return days
+
+
+def has_index() -> bool:
+    return _index() is not None
+
+
+def lookup(date_obj: date) -> list[dict] | None:
+    """Itens prontos do índice; None se não há índice (ou o dia não está nele)."""
+    days = _index()
+    if days is None:
+        return None
+    items = days.get(date_obj.strftime('%m-%d'))
+    return items if isinstance(items, list) else None
@@ -0,0 +1,87 @@
+"""Câmbio calculado localmente a partir da tabela canônica (base EUR).
+
+Uma única busca ao Frankfurter por dia (consultas_upstream.fx_table_target)
+atende qualquer combinação de base, símbolos e janela: a cotação cruzada é
+`eur[símbolo] / eur[base]`, que é o mesmo que o Frankfurter faz do lado dele.
+"""
+from __future__ import annotations
+
+from datetime import date, timedelta
+from typing import Any
+
+from .consultas_upstream import FX_CANONICAL_BASE
+
+
+# Mesma precisão que o Frankfurter devolve nas cotações cruzadas.
+RATE_DIGITS = 6
+
+
+class UnknownCurrency(ValueError):
+    """Moeda que não existe na tabela do BCE."""
+
+
+def _table_rows(table: Any) -> dict[str, dict[str, float]]:
+    """{data ISO: {moeda: cotação em EUR}} já com EUR = 1."""
+    rates = table.get('rates') if isinstance(table, dict) else None
+    if not isinstance(rates, dict):
+        return {}
+    rows: dict[str, dict[str, float]] = {}
+    for d, row in rates.items():
+        if not isinstance(row, dict):
+            continue
+        clean = {c: float(v) for c, v in row.items() if isinstance(v, (int, float)) and v > 0}
+        clean[FX_CANONICAL_BASE] = 1.0
+        rows[d] = clean
+    return rows
+
+
+def _cross_row(row: dict[str, float], base: str, symbols: list[str]) -> dict[str, float]:
+    pivot = row.get(base)
+    if pivot is None:
+        return {}
+    wanted = symbols or [c for c in row if c != base]
+    return {c: round(row[c] / pivot, RATE_DIGITS) for c in wanted if c in row and c != base}
+
+
+def currencies(table: Any) -> set[str]:
+    out: set[str] = set()
+    for row in _table_rows(table).values():
+        out.update(row)
+    return out
+
+
+def cross_latest(table: Any, base: str, symbols: list[str]) -> dict:
+    """Equivale a /latest?from=base&to=symbols (formato do Frankfurter)."""
+    rows = _table_rows(table)
+    if not rows:
+        return {}
+    last_day = max(rows)
+    if base not in rows[last_day]:
+        raise UnknownCurrency(f"moeda desconhecida: {base}")
+    return {
+        'amount': 1.0,
+        'base': base,
+        'date': last_day,
+        'rates': _cross_row(rows[last_day], base, symbols),
+    }
+
+
+def cross_range(table: Any, base: str, days: int, end: date, symbols: list[str] | None = None) -> dict:
+    """Equivale a /{end-days+1}..{end}?from=base&to=symbols (formato do Frankfurter)."""
+    rows = _table_rows(table)
+    if rows and base not in currencies(table):
+        raise UnknownCurrency(f"moeda desconhecida: {base}")
+    start = (end - timedelta(days=days - 1)).isoformat()
+    wanted = list(symbols or [])
+    rates = {
+        d: _cross_row(row, base, wanted)
+        for d, row in sorted(rows.items())
+        if start <= d <= end.isoformat()
+    }
+    return {
+        'amount': 1.0,
+        'base': base,
+        'start_date': start,
+        'end_date': end.isoformat(),
+        'rates': {d: r for d, r in rates.items() if r},
+    }
@@ -0,0 +1,141 @@
+"""Feriados nacionais do Brasil calculados localmente.
+
+Datas fixas (Lei 662/1949 e alterações) mais as móveis, que dependem da
+Páscoa: Carnaval (-48/-47 dias), Sexta-feira Santa (-2) e Corpus Christi (+60).
+O formato de cada item é o mesmo do Nager.Date, que agora só complementa
+(em background) o que a tabela local não tiver.
+"""
+from __future__ import annotations
+
+import bisect
+import time
+from datetime import date, timedelta
+from functools import lru_cache
+
+from django.conf import settings
+
+from .consultas_cache import peek, refresh_in_background
+from .consultas_upstream import HOLIDAYS_TTL, holidays_year_target
+
+
+# (mês, dia, nome local, nome em inglês, a partir de que ano)
+_FIXED: tuple[tuple[int, int, str, str, int], ...] = (
+    (1, 1, 'Confraternização Universal', "New Year's Day", 1949),
+    (4, 21, 'Tiradentes', 'Tiradentes', 1949),
+    (5, 1, 'Dia do Trabalhador', 'Labour Day', 1949),
+    (9, 7, 'Independência do Brasil', 'Independence Day', 1949),
+    (10, 12, 'Nossa Senhora Aparecida', 'Our Lady of Aparecida', 1980),
+    (11, 2, 'Finados', "All Souls' Day", 1949),
+    (11, 15, 'Proclamação da República', 'Republic Proclamation Day', 1949),
+    (11, 20, 'Dia Nacional de Zumbi e da Consciência Negra', 'Black Awareness Day', 2024),
+    (12, 25, 'Natal', 'Christmas Day', 1949),
+)
+
+# (dias a partir da Páscoa, nome local, nome em inglês, tipo)
+# Carnaval e Corpus Christi são ponto facultativo nacional ("Optional" no Nager).
+_MOVABLE: tuple[tuple[int, str, str, str], ...] = (
+    (-48, 'Carnaval', 'Carnival', 'Optional'),
+    (-47, 'Carnaval', 'Carnival', 'Optional'),
+    (-2, 'Sexta-feira Santa', 'Good Friday', 'Public'),
+    (60, 'Corpus Christi', 'Corpus Christi', 'Optional'),
+)
+
+
+def easter(year: int) -> date:
+    """Domingo de Páscoa (calendário gregoriano, algoritmo de Meeus/Jones/Butcher)."""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def _item(day: date, local_name: str, name: str, kind: str, fixed: bool) -> dict:
+    return {
+        'date': day.isoformat(),
+        'localName': local_name,
+        'name': name,
+        'countryCode': 'BR',
+        'fixed': fixed,
+        'global': True,
+        'counties': None,
+        'launchYear': None,
+        'types': [kind],
+    }
+
+
+@lru_cache(maxsize=32)
+def national_holidays(year: int) -> tuple[dict, ...]:
+    """Feriados nacionais do ano, em ordem de data."""
+    items = [
+        _item(date(year, month, day), local_name, name, 'Public', True)
+        for month, day, local_name, name, since in _FIXED
+        if year >= since
+    ]
+    sunday = easter(year)
+    items.extend(
+        _item(sunday + timedelta(days=offset), local_name, name, kind, False)
+        for offset, local_name, name, kind in _MOVABLE
+    )
+    items.sort(key=lambda h: h['date'])
+    return tuple(items)
+
+
+def _nager_enabled() -> bool:
+    return getattr(settings, 'OXIRA_CONSULTAS_NAGER', True)
+
+
+@lru_cache(maxsize=32)
+def _merged(year: int, nager_fetched_at: float) -> tuple[tuple[dict, ...], tuple[str, ...]]:
+    # nager_fetched_at só entra na chave: snapshot novo do Nager = nova mesclagem.
+    holidays = list(national_holidays(year))
+    entry = peek(holidays_year_target(year).cache_key) if nager_fetched_at else None
+    known = {h['date'] for h in holidays}
+    rows = entry['data'] if entry and isinstance(entry.get('data'), list) else []
+    for row in rows:
+        if isinstance(row, dict) and isinstance(row.get('date'), str) and row['date'] not in known:
+            holidays.append(row)
+            known.add(row['date'])
+    holidays.sort(key=lambda h: h['date'])
+    return tuple(holidays), tuple(h['date'] for h in holidays)
+
+
+def _enrich_in_background(year: int) -> float:
+    """Dispara o refresh do Nager se estiver vencido; nunca espera. Retorna o fetched_at atual."""
+    if not _nager_enabled():
+        return 0.0
+    target = holidays_year_target(year)
+    entry = peek(target.cache_key)
+    fetched_at = float(entry['fetched_at']) if entry else 0.0
+    if time.time() - fetched_at >= HOLIDAYS_TTL:
+        refresh_in_background(target.cache_key, target.fetch)
+    return fetched_at
+
+
+def holidays_for_year(year: int) -> tuple[dict, ...]:
+    return _merged(year, _enrich_in_background(year))[0]
+
+
+def holidays_on(day: date) -> list[dict]:
+    holidays, dates = _merged(day.year, _enrich_in_background(day.year))
+    key = day.isoformat()
+    lo = bisect.bisect_left(dates, key)
+    hi = bisect.bisect_right(dates, key, lo)
+    return list(holidays[lo:hi])
+
+
+def next_holiday(day: date) -> dict | None:
+    """Próximo feriado depois de `day` (vira o ano se preciso)."""
+    key = day.isoformat()
+    for year in (day.year, day.year + 1):
+        holidays, dates = _merged(year, _enrich_in_background(year))
+        idx = bisect.bisect_right(dates, key)
+        if idx < len(holidays):
+            return holidays[idx]
+    return None
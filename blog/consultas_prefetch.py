@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import os
+import random
+import threading
+import time
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .consultas_cache import peek, refresh_now
+from .consultas_dayfacts import lookup as dayfacts_lookup
+from .consultas_upstream import UpstreamTarget, warm_targets
+
+
+# Intervalo mínimo entre chamadas ao mesmo provedor (segundos).
+PROVIDER_MIN_INTERVAL: dict[str, float] = {
+    'frankfurter': 1.0,
+    'coingecko': 6.0,
+    'nager': 2.0,
+    'wikipedia': 1.0,
+}
+
+# Atualiza quando a key chega a 80% do TTL, menos um jitter de até 10% do TTL,
+# para as keys não vencerem todas juntas.
+REFRESH_AHEAD = 0.8
+JITTER = 0.1
+
+FRESHNESS_CACHE_KEY = 'consultas:prefetch:freshness'
+
+
+class ConsultasPrefetcher:
+    """Mantém as keys de /api/consultas/* quentes, antes de vencerem.
+
+    O tráfego para os upstreams vira constante (por TTL) em vez de depender
+    de quantos leitores aparecem.
+    """
+
+    def __init__(
+        self,
+        *,
+        min_interval: dict[str, float] | None = None,
+        refresh_ahead: float = REFRESH_AHEAD,
+        jitter: float = JITTER,
+    ):
+        self.min_interval = dict(PROVIDER_MIN_INTERVAL if min_interval is None else min_interval)
+        self.refresh_ahead = refresh_ahead
+        self.jitter = jitter
+        # cache_key -> {provider, fetched_at, ok, error, last_attempt}
+        self.freshness: dict[str, dict] = {}
+        self._due: dict[str, tuple[float, float]] = {}
+        self._last_call: dict[str, float] = {}
+        self._stop = threading.Event()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _due_at(self, target: UpstreamTarget, fetched_at: float) -> float:
+        known = self._due.get(target.cache_key)
+        if known and known[0] == fetched_at:
+            return known[1]
+        ahead = target.ttl_seconds * self.refresh_ahead
+        due = fetched_at + ahead - random.uniform(0.0, target.ttl_seconds * self.jitter)
+        self._due[target.cache_key] = (fetched_at, due)
+        return due
+
+    def _wait_for_provider(self, provider: str) -> bool:
+        interval = self.min_interval.get(provider, 0.0)
+        last = self._last_call.get(provider)
+        if last is not None:
+            delay = last + interval - time.monotonic()
+            if delay > 0 and self._stop.wait(delay):
+                return False
+        self._last_call[provider] = time.monotonic()
+        return True
+
+    def _record(self, target: UpstreamTarget, *, fetched_at: float | None, error: str = '') -> None:
+        prev = self.freshness.get(target.cache_key) or {}
+        self.freshness[target.cache_key] = {
+            'provider': target.provider,
+            'fetched_at': fetched_at if fetched_at is not None else prev.get('fetched_at'),
+            'ok': not error,
+            'error': error[:200],
+            'last_attempt': time.time(),
+        }
+
+    def run_once(self, today: date | None = None) -> int:
+        """Atualiza as keys vencidas (ou nunca buscadas). Retorna quantas buscou."""
+        today = today or timezone.localdate()
+        targets = warm_targets(today)
+        if dayfacts_lookup(today) is not None:
+            # Dia no índice pré-montado: o request de dayfacts não usa a Wikipedia.
+            # Dia fora dele (sem índice, ou falhou no build) continua aquecido aqui.
+            targets = [t for t in targets if t.provider != 'wikipedia']
+        refreshed = 0
+
+        for target in targets:
+            if self._stop.is_set():
+                break
+            entry = peek(target.cache_key)
+            fetched_at = float(entry['fetched_at']) if entry else 0.0
+            if entry and time.time() < self._due_at(target, fetched_at):
+                self._record(target, fetched_at=fetched_at)
+                continue
+
+            if not self._wait_for_provider(target.provider):
+                break
+            try:
+                stored = refresh_now(target.cache_key, target.fetch)
+            except Exception as e:
+                self._record(target, fetched_at=fetched_at or None, error=f"{type(e).__name__}: {e}")
+                continue
+            if stored is not None:
+                refreshed += 1
+                self._record(target, fetched_at=stored['fetched_at'])
+
+        # Descarta keys de dias anteriores (ex.: range com end=ontem).
+        live = {t.cache_key for t in targets}
+        for key in list(self.freshness):
+            if key not in live:
+                self.freshness.pop(key, None)
+                self._due.pop(key, None)
+
+        cache.set(FRESHNESS_CACHE_KEY, dict(self.freshness), 24 * 60 * 60)
+        return refreshed
+
+    def run_forever(self, poll_seconds: float = 5.0) -> None:
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception:
+                # Nunca derruba o loop por causa de um ciclo ruim.
+                pass
+            self._stop.wait(poll_seconds)
+
+
+_started_pid: int | None = None
+_started_lock = threading.Lock()
+
+
+def ensure_prefetcher_started() -> None:
+    """Sobe o prefetcher em thread no processo atual (se habilitado em settings).
+
+    É chamado pelas views de consultas, então só processos web sobem a thread.
+    Com cache por processo (LocMem), cada worker precisa do seu próprio.
+    """
+    global _started_pid
+    if not getattr(settings, 'OXIRA_CONSULTAS_PREFETCH', False):
+        return
+    pid = os.getpid()
+    if _started_pid == pid:
+        return
+    with _started_lock:
+        if _started_pid == pid:
+            return
+        prefetcher = ConsultasPrefetcher()
+        t = threading.Thread(target=prefetcher.run_forever, name='oxira-consultas-prefetch', daemon=True)
+        t.start()
+        _started_pid = pid
@@ -0,0 +1,163 @@
+"""Respostas JSON de /api/consultas/* guardadas já serializadas.
+
+Cada corpo fica em memória (por processo) como bytes, junto das variantes
+gzip/brotli e de um ETag forte. Enquanto o dado de origem está fresco, um hit
+não toca no cache de dados nem no json.dumps: só escolhe a variante e devolve.
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
+
+from django.http import HttpRequest, HttpResponse
+
+from .consultas_cache import CachedValue
+
+try:
+    import brotli
+except ImportError:  # opcional: sem o pacote, só gzip
+    brotli = None
+
+
+MEMO_MAX_ENTRIES = 512
+# Mesmo com dado stale (max-age=0 para o navegador), segura o corpo por alguns
+# segundos para um pico de acessos não reserializar a cada request.
+MIN_MEMO_SECONDS = 5
+# Abaixo disso a compressão não compensa.
+COMPRESS_MIN_BYTES = 256
+
+
+@dataclass(frozen=True)
+class _Body:
+    identity: bytes
+    gzip: bytes | None
+    br: bytes | None
+    etag: str
+    # Até quando o dado é fresco (vira o max-age) e até quando o memo segura o corpo.
+    fresh_until: float
+    memo_until: float
+
+
+_memo: OrderedDict[str, _Body] = OrderedDict()
+_memo_lock = threading.Lock()
+
+
+def fresh_for(*results: CachedValue, ttl: int) -> int:
+    """Segundos que o payload ainda fica fresco (o menor entre as fontes)."""
+    now = time.time()
+    remaining = ttl
+    for result in results:
+        if result.stale:
+            return 0
+        remaining = min(remaining, int(ttl - (now - result.fetched_at)))
+    return max(0, remaining)
+
+
+def _make_body(payload: Any, fresh_seconds: int) -> _Body:
+    now = time.time()
+    raw = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    big = len(raw) >= COMPRESS_MIN_BYTES
+    return _Body(
+        identity=raw,
+        gzip=gzip.compress(raw, compresslevel=6, mtime=0) if big else None,
+        br=brotli.compress(raw, quality=5) if (big and brotli is not None) else None,
+        etag=hashlib.sha256(raw).hexdigest()[:32],
+        fresh_until=now + fresh_seconds,
+        memo_until=now + max(fresh_seconds, MIN_MEMO_SECONDS),
+    )
+
+
+def _memo_get(key: str) -> _Body | None:
+    with _memo_lock:
+        body = _memo.get(key)
+        if body is None:
+            return None
+        if time.time() >= body.memo_until:
+            _memo.pop(key, None)
+            return None
+        _memo.move_to_end(key)
+        return body
+
+
+def _memo_put(key: str, body: _Body) -> None:
+    with _memo_lock:
+        _memo[key] = body
+        _memo.move_to_end(key)
+        while len(_memo) > MEMO_MAX_ENTRIES:
+            _memo.popitem(last=False)
+
+
+def _accepts(request: HttpRequest, coding: str) -> bool:
+    for part in (request.headers.get('Accept-Encoding') or '').split(','):
+        name, *params = part.split(';')
+        if name.strip().lower() != coding:
+            continue
+        q = 1.0
+        for param in params:
+            k, _, v = param.partition('=')
+            if k.strip().lower() == 'q':
+                try:
+                    q = float(v)
+                except ValueError:
+                    q = 0.0
+        return q > 0
+    return False
+
+
+def _respond(request: HttpRequest, body: _Body) -> HttpResponse:
+    if body.br is not None and _accepts(request, 'br'):
+        content, coding, etag = body.br, 'br', f'"{body.etag}-br"'
+    elif body.gzip is not None and _accepts(request, 'gzip'):
+        content, coding, etag = body.gzip, 'gzip', f'"{body.etag}-gz"'
+    else:
+        content, coding, etag = body.identity, '', f'"{body.etag}"'
+
+    max_age = max(0, int(body.fresh_until - time.time()))
+    cache_control = f'public, max-age={max_age}' if max_age else 'public, max-age=0, must-revalidate'
+
+    # Qualquer variante do mesmo corpo vale como validador.
+    sent = {t.strip().removeprefix('W/') for t in (request.headers.get('If-None-Match') or '').split(',')}
+    if sent & {f'"{body.etag}"', f'"{body.etag}-br"', f'"{body.etag}-gz"', '*'}:
+        resp = HttpResponse(status=304)
+    else:
+        resp = HttpResponse(content, content_type='application/json')
+        resp['Content-Length'] = str(len(content))
+        if coding:
+            resp['Content-Encoding'] = coding
+    resp['ETag'] = etag
+    resp['Cache-Control'] = cache_control
+    resp['Vary'] = 'Accept-Encoding'
+    return resp
+
+
+def cached_json_response(request: HttpRequest, key: str, build: Callable[[], tuple[Any, int]]) -> HttpResponse:
+    """Responde com o corpo memorizado em `key` ou monta via build() -> (payload, segundos frescos).
+
+    Exceções do build sobem (a view transforma em resposta de erro, que não é memorizada).
+    """
+    body = _memo_get(key)
+    if body is None:
+        payload, fresh_seconds = build()
+        body = _make_body(payload, fresh_seconds)
+        _memo_put(key, body)
+    return _respond(request, body)
+
+
+async def acached_json_response(
+    request: HttpRequest,
+    key: str,
+    abuild: Callable[[], Awaitable[tuple[Any, int]]],
+) -> HttpResponse:
+    """Versão async de cached_json_response (hit não aguarda nada)."""
+    body = _memo_get(key)
+    if body is None:
+        payload, fresh_seconds = await abuild()
+        body = _make_body(payload, fresh_seconds)
+        _memo_put(key, body)
+    return _respond(request, body)
@@ -0,0 +1,163 @@
+"""Histórico local (append-only) de câmbio e cripto para /consultas/.
+
+Cada série guarda um valor por dia em MarketClose. O upstream só é chamado
+para os dias depois do último ponto gravado; ranges e gráficos são fatias
+lidas daqui. Só acesso a banco: as URLs e a rede ficam em consultas_upstream.
+"""
+from __future__ import annotations
+
+from datetime import date, datetime, time as dt_time, timedelta, timezone as dt_timezone
+from typing import Any
+
+from django.db.models import Max
+
+from .models import MarketClose
+
+
+# Maior janela que as APIs de /consultas/ aceitam (days=7..60).
+HISTORY_DAYS = 60
+
+FX_SERIES_PREFIX = 'fx:EUR:'
+
+
+def _crypto_series(coin_id: str) -> str:
+    return f"crypto:{coin_id}:brl"
+
+
+def _last_day(**filters) -> date | None:
+    return MarketClose.objects.filter(**filters).aggregate(last=Max('day'))['last']
+
+
+def _upsert(rows: list[MarketClose]) -> None:
+    if not rows:
+        return
+    # O último dia pode ser reescrito (cripto: o ponto "de agora" muda até o dia fechar).
+    MarketClose.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['series', 'day'],
+        update_fields=['value'],
+    )
+
+
+def _window_start(last: date | None, end: date) -> date | None:
+    """Primeiro dia que falta buscar (None = já está em dia)."""
+    oldest = end - timedelta(days=HISTORY_DAYS - 1)
+    if last is None or last < oldest:
+        return oldest
+    if last >= end:
+        return None
+    return last + timedelta(days=1)
+
+
+# Câmbio: base EUR, uma série por moeda.
+
+# Dias sem cotação do BCE (calendário TARGET), além de sábado e domingo:
+# 1/1, Sexta-feira Santa, Segunda-feira de Páscoa, 1/5, 25/12 e 26/12.
+_ECB_CLOSED = ((1, 1), (5, 1), (12, 25), (12, 26))
+
+
+def _ecb_business_day(day: date) -> bool:
+    # Import tardio: consultas_holidays importa consultas_upstream, que importa este módulo.
+    from .consultas_holidays import easter
+
+    if day.weekday() >= 5 or (day.month, day.day) in _ECB_CLOSED:
+        return False
+    sunday = easter(day.year)
+    return day not in (sunday - timedelta(days=2), sunday + timedelta(days=1))
+
+
+def fx_fetch_start(end: date) -> date | None:
+    """Primeiro dia a buscar no Frankfurter (None = não há nada novo para publicar).
+
+    O BCE não publica em fim de semana nem feriado: sem dia útil depois do
+    último ponto gravado, está em dia (senão o upstream seria chamado a cada
+    FX_TTL o fim de semana inteiro).
+    """
+    start = _window_start(_last_day(series__startswith=FX_SERIES_PREFIX), end)
+    day = start
+    while day is not None and day <= end:
+        if _ecb_business_day(day):
+            return start
+        day += timedelta(days=1)
+    return None
+
+
+def store_fx_table(data: Any) -> int:
+    """Grava a resposta do Frankfurter (range, base EUR). Retorna quantos pontos."""
+    rates = data.get('rates') if isinstance(data, dict) else None
+    if not isinstance(rates, dict):
+        return 0
+    rows = []
+    for d, row in rates.items():
+        try:
+            day = date.fromisoformat(d)
+        except (TypeError, ValueError):
+            continue
+        if not isinstance(row, dict):
+            continue
+        for code, value in row.items():
+            if isinstance(value, (int, float)) and value > 0:
+                rows.append(MarketClose(series=f"{FX_SERIES_PREFIX}{code}", day=day, value=float(value)))
+    _upsert(rows)
+    return len(rows)
+
+
+def fx_table(start: date, end: date) -> dict:
+    """Mesmo formato do range do Frankfurter: {'base': 'EUR', 'rates': {dia: {moeda: valor}}}."""
+    rates: dict[str, dict[str, float]] = {}
+    qs = (
+        MarketClose.objects.filter(series__startswith=FX_SERIES_PREFIX, day__gte=start, day__lte=end)
+        .values_list('series', 'day', 'value')
+    )
+    for series, day, value in qs:
+        rates.setdefault(day.isoformat(), {})[series[len(FX_SERIES_PREFIX):]] = value
+    return {
+        'amount': 1.0,
+        'base': 'EUR',
+        'start_date': start.isoformat(),
+        'end_date': end.isoformat(),
+        'rates': dict(sorted(rates.items())),
+    }
+
+
+# Cripto: preço em BRL, um ponto por dia (UTC, como o CoinGecko).
+
+def utc_today() -> date:
+    return datetime.now(dt_timezone.utc).date()
+
+
+def crypto_fetch_days(coin_id: str, today: date) -> int:
+    """`days` para o market_chart do CoinGecko. Nunca 0: o ponto de hoje muda o dia todo."""
+    start = _window_start(_last_day(series=_crypto_series(coin_id)), today)
+    if start is None:
+        return 1
+    return (today - start).days + 1
+
+
+def store_crypto_chart(coin_id: str, data: Any) -> int:
+    prices = data.get('prices') if isinstance(data, dict) else None
+    if not isinstance(prices, list):
+        return 0
+    by_day: dict[date, float] = {}
+    for row in prices:
+        if isinstance(row, list) and len(row) >= 2 and isinstance(row[0], (int, float)) and isinstance(row[1], (int, float)):
+            # Pontos em ordem: o último do dia (o mais recente) prevalece.
+            by_day[datetime.fromtimestamp(row[0] / 1000.0, tz=dt_timezone.utc).date()] = float(row[1])
+    series = _crypto_series(coin_id)
+    _upsert([MarketClose(series=series, day=day, value=value) for day, value in by_day.items()])
+    return len(by_day)
+
+
+def crypto_chart(coin_id: str, start: date, end: date) -> dict:
+    """Mesmo formato do market_chart do CoinGecko: {'prices': [[ms, valor], ...]}."""
+    qs = (
+        MarketClose.objects.filter(series=_crypto_series(coin_id), day__gte=start, day__lte=end)
+        .order_by('day')
+        .values_list('day', 'value')
+    )
+    prices = []
+    for day, value in qs:
+        ms = int(datetime.combine(day, dt_time.min, tzinfo=dt_timezone.utc).timestamp() * 1000)
+        prices.append([ms, value])
+    return {'prices': prices}
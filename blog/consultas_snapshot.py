@@ -0,0 +1,245 @@
+"""Última resposta boa de cada upstream de /consultas/, gravada em disco.
+
+O cache padrão é LocMem (por processo): sem isto, todo deploy ou restart de
+worker começa frio e cada worker vai ao upstream por conta própria. Cada
+_store do consultas_cache também grava o envelope aqui (um arquivo por key,
+troca atômica); um worker novo carrega tudo na primeira leitura e serve na
+hora, com o fetched_at original (o SWR decide se precisa atualizar).
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Callable
+
+from django.conf import settings
+
+
+SNAPSHOT_VERSION = 1
+
+# Idade máxima de um snapshot (a mesma do KEEP_SECONDS do consultas_cache).
+# Keys por data (dias da Wikipedia, por exemplo) não crescem sem limite: o
+# load_all apaga os vencidos em vez de carregá-los.
+MAX_AGE_SECONDS = 7 * 24 * 60 * 60
+
+
+def snapshot_dir() -> str:
+    """Diretório dos snapshots ('' = desligado)."""
+    return getattr(settings, 'OXIRA_CONSULTAS_SNAPSHOT_DIR', '')
+
+
+def _path(directory: str, cache_key: str) -> str:
+    # Keys têm ':' e '|'; o nome do arquivo é o hash, a key vai dentro.
+    return os.path.join(directory, hashlib.sha1(cache_key.encode('utf-8')).hexdigest() + '.json')
+
+
+def _read_file(path: str) -> tuple[str, dict] | None:
+    try:
+        with open(path, 'rb') as f:
+            payload = json.loads(f.read().decode('utf-8'))
+    except (OSError, ValueError):
+        return None
+    if not isinstance(payload, dict) or payload.get('version') != SNAPSHOT_VERSION:
+        return None
+    key, entry = payload.get('key'), payload.get('entry')
+    if not isinstance(key, str) or not isinstance(entry, dict) or entry.get('_swr') != 1:
+        return None
+    if _expired(entry):
+        return None
+    return key, entry
+
+
+def _expired(entry: dict) -> bool:
+    try:
+        return time.time() - float(entry.get('fetched_at') or 0.0) > MAX_AGE_SECONDS
+    except (TypeError, ValueError):
+        return True
+
+
+def _write_json(path: str, payload: dict) -> bool:
+    try:
+        raw = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    except (TypeError, ValueError):
+        return False
+    # Temporário por processo: dois workers gravando o mesmo arquivo não se atropelam.
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp, 'wb') as f:
+            f.write(raw)
+        os.replace(tmp, path)
+    except OSError:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        return False
+    return True
+
+
+def save(cache_key: str, entry: dict) -> bool:
+    """Grava o envelope da key. Falha de disco ou dado não-JSON só pula o snapshot."""
+    directory = snapshot_dir()
+    if not directory:
+        return False
+    return _write_json(
+        _path(directory, cache_key),
+        {'version': SNAPSHOT_VERSION, 'key': cache_key, 'entry': entry},
+    )
+
+
+def load(cache_key: str) -> dict | None:
+    """Envelope gravado da key (ou None)."""
+    directory = snapshot_dir()
+    if not directory:
+        return None
+    found = _read_file(_path(directory, cache_key))
+    if found is None or found[0] != cache_key:
+        return None
+    return found[1]
+
+
+def load_all() -> dict[str, dict]:
+    """Todos os snapshots válidos: {cache_key: envelope}. Apaga os vencidos no caminho."""
+    directory = snapshot_dir()
+    if not directory:
+        return {}
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return {}
+    out: dict[str, dict] = {}
+    now = time.time()
+    for name in names:
+        if not name.endswith(('.json', '.tmp')):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            # O arquivo é gravado junto com o fetched_at: o mtime basta para decidir sem ler.
+            age = now - os.path.getmtime(path)
+        except OSError:
+            continue
+        if age > MAX_AGE_SECONDS:
+            # Vencido (ou .tmp de um worker que morreu no meio da gravação).
+            _remove(path)
+        elif name.endswith('.json'):
+            found = _read_file(path)
+            if found is not None:
+                out[found[0]] = found[1]
+    return out
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+# Estado pequeno compartilhado entre workers (ex.: circuit breakers), fora dos
+# snapshots do cache: fica em state/ e o load_all não carrega.
+
+def load_state(name: str) -> dict | None:
+    """Estado gravado com save_state (ou None)."""
+    directory = snapshot_dir()
+    if not directory:
+        return None
+    try:
+        with open(_path(os.path.join(directory, 'state'), name), 'rb') as f:
+            payload = json.loads(f.read().decode('utf-8'))
+    except (OSError, ValueError):
+        return None
+    if not isinstance(payload, dict) or payload.get('version') != SNAPSHOT_VERSION or payload.get('key') != name:
+        return None
+    state = payload.get('state')
+    return state if isinstance(state, dict) else None
+
+
+def save_state(name: str, state: dict) -> bool:
+    directory = snapshot_dir()
+    if not directory:
+        return False
+    return _write_json(
+        _path(os.path.join(directory, 'state'), name),
+        {'version': SNAPSHOT_VERSION, 'key': name, 'state': state},
+    )
+
+
+_loaded_pid: int | None = None
+_loaded_lock = threading.Lock()
+
+
+def is_loaded() -> bool:
+    """Os snapshots já foram carregados neste processo?"""
+    return _loaded_pid == os.getpid()
+
+
+def ensure_loaded(restore: Callable[[str, dict], None]) -> None:
+    """Chama restore(key, envelope) para cada snapshot, uma vez por processo.
+
+    Por pid, como o prefetcher: com preload + fork, cada worker carrega o seu.
+    """
+    global _loaded_pid
+    pid = os.getpid()
+    if _loaded_pid == pid:
+        return
+    with _loaded_lock:
+        if _loaded_pid == pid:
+            return
+        # Marca antes de carregar: restore() pode ler o cache e voltar aqui.
+        _loaded_pid = pid
+        for cache_key, entry in load_all().items():
+            restore(cache_key, entry)
+
+
+def claim(cache_key: str, seconds: float) -> bool:
+    """Trava de fetch entre processos (arquivo exclusivo ao lado do snapshot).
+
+    O cache.add do LocMem só trava dentro do processo; isto impede que todos os
+    workers de um deploy busquem (miss frio ou refresh) a mesma key juntos.
+    Sem diretório, sempre libera.
+    """
+    directory = snapshot_dir()
+    if not directory:
+        return True
+    lock = _path(directory, cache_key) + '.lock'
+    for _ in range(2):
+        try:
+            os.makedirs(directory, exist_ok=True)
+            os.close(os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except FileExistsError:
+            # Trava de um worker que morreu no meio: expira pelo mtime.
+            try:
+                if time.time() - os.path.getmtime(lock) < seconds:
+                    return False
+                os.remove(lock)
+            except OSError:
+                pass
+        except OSError:
+            return True
+    return False
+
+
+def claimed(cache_key: str, seconds: float) -> bool:
+    """Algum processo segura a trava da key (e ela não expirou)?"""
+    directory = snapshot_dir()
+    if not directory:
+        return False
+    try:
+        return time.time() - os.path.getmtime(_path(directory, cache_key) + '.lock') < seconds
+    except OSError:
+        return False
+
+
+def release(cache_key: str) -> None:
+    directory = snapshot_dir()
+    if not directory:
+        return
+    try:
+        os.remove(_path(directory, cache_key) + '.lock')
+    except OSError:
+        pass
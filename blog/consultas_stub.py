@@ -0,0 +1,243 @@
+"""Stub local dos upstreams de /consultas/ (só para teste de carga, nunca em produção).
+
+Responde no mesmo formato do Frankfurter, CoinGecko, Nager.Date e Wikipedia
+(onthisday), em /{provedor}/..., com latência, erros 5xx, 429 e travamentos
+configuráveis. Os valores são determinísticos (hash da data/moeda), então duas
+rodadas iguais devolvem os mesmos dados. GET /_stats devolve a contagem de
+chamadas por provedor; POST /_reset zera.
+
+Com OXIRA_CONSULTAS_UPSTREAM_STUB=http://127.0.0.1:8765, consultas_upstream
+manda tudo para cá (ver manage.py consultas_stub e loadtest_consultas).
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, time as dt_time, timedelta, timezone as dt_timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+# Moedas da tabela do BCE com uma cotação base (EUR = 1) perto da real.
+_FX_BASE_RATES = {
+    'AUD': 1.65, 'BRL': 6.2, 'CAD': 1.5, 'CHF': 0.95, 'CNY': 7.8, 'GBP': 0.85,
+    'JPY': 165.0, 'MXN': 19.5, 'USD': 1.08, 'ARS': 1000.0,
+}
+_CRYPTO_BRL = {
+    'bitcoin': 350000.0, 'ethereum': 18000.0, 'solana': 800.0,
+    'ripple': 3.2, 'cardano': 2.5, 'dogecoin': 0.9,
+}
+_USD_PER_BRL = 0.18
+
+# Quanto um request "travado" fica parado (maior que o timeout de leitura do cliente).
+HANG_SECONDS = 30.0
+
+
+@dataclass
+class StubConfig:
+    latency_ms: float = 50.0
+    jitter_ms: float = 20.0
+    error_rate: float = 0.0
+    rate_429: float = 0.0
+    hang_rate: float = 0.0
+    retry_after: int = 5
+
+
+@dataclass
+class StubStats:
+    calls: dict[str, int] = field(default_factory=dict)
+    statuses: dict[str, dict[str, int]] = field(default_factory=dict)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def record(self, provider: str, status: int | str) -> None:
+        with self.lock:
+            self.calls[provider] = self.calls.get(provider, 0) + 1
+            by_status = self.statuses.setdefault(provider, {})
+            by_status[str(status)] = by_status.get(str(status), 0) + 1
+
+    def as_dict(self) -> dict:
+        with self.lock:
+            return {
+                'calls': dict(self.calls),
+                'statuses': {p: dict(s) for p, s in self.statuses.items()},
+                'total': sum(self.calls.values()),
+            }
+
+    def reset(self) -> None:
+        with self.lock:
+            self.calls.clear()
+            self.statuses.clear()
+
+
+def _wobble(seed: str, spread: float = 0.03) -> float:
+    """Fator determinístico em [1 - spread, 1 + spread]."""
+    h = int(hashlib.md5(seed.encode('utf-8')).hexdigest()[:8], 16)
+    return 1.0 + spread * ((h / 0xFFFFFFFF) * 2.0 - 1.0)
+
+
+# Respostas (mesmo formato dos upstreams reais).
+
+def _frankfurter(path: str, query: dict[str, list[str]]) -> tuple[int, object]:
+    m = re.fullmatch(r'/(\d{4}-\d{2}-\d{2})\.\.(\d{4}-\d{2}-\d{2})?', path)
+    if not m:
+        return 404, {'message': 'not found'}
+    start = date.fromisoformat(m.group(1))
+    end = date.fromisoformat(m.group(2)) if m.group(2) else date.today()
+    rates = {}
+    day = start
+    while day <= end:
+        if day.weekday() < 5:  # BCE só publica em dia útil
+            rates[day.isoformat()] = {
+                code: round(value * _wobble(f"{code}:{day}"), 4) for code, value in sorted(_FX_BASE_RATES.items())
+            }
+        day += timedelta(days=1)
+    base = (query.get('from') or ['EUR'])[0]
+    return 200, {'amount': 1.0, 'base': base, 'start_date': start.isoformat(), 'end_date': end.isoformat(), 'rates': rates}
+
+
+def _coingecko(path: str, query: dict[str, list[str]]) -> tuple[int, object]:
+    today = datetime.now(dt_timezone.utc).date()
+    if path == '/api/v3/simple/price':
+        ids = [i for i in (query.get('ids') or [''])[0].split(',') if i in _CRYPTO_BRL]
+        out = {}
+        for coin_id in ids:
+            brl = round(_CRYPTO_BRL[coin_id] * _wobble(f"{coin_id}:{today}"), 2)
+            change = round((_wobble(f"{coin_id}:{today}:chg", 0.05) - 1.0) * 100, 3)
+            out[coin_id] = {
+                'brl': brl,
+                'usd': round(brl * _USD_PER_BRL, 2),
+                'brl_24h_change': change,
+                'usd_24h_change': change,
+            }
+        return 200, out
+    m = re.fullmatch(r'/api/v3/coins/([a-z0-9-]+)/market_chart', path)
+    if not m or m.group(1) not in _CRYPTO_BRL:
+        return 404, {'error': 'coin not found'}
+    coin_id = m.group(1)
+    try:
+        days = max(1, min(365, int((query.get('days') or ['1'])[0])))
+    except ValueError:
+        return 400, {'error': 'invalid days'}
+    prices = []
+    for offset in range(days, -1, -1):
+        day = today - timedelta(days=offset)
+        ms = int(datetime.combine(day, dt_time.min, tzinfo=dt_timezone.utc).timestamp() * 1000)
+        prices.append([ms, round(_CRYPTO_BRL[coin_id] * _wobble(f"{coin_id}:{day}"), 2)])
+    return 200, {'prices': prices, 'market_caps': [], 'total_volumes': []}
+
+
+def _nager(path: str, query: dict[str, list[str]]) -> tuple[int, object]:
+    m = re.fullmatch(r'/api/v3/PublicHolidays/(\d{4})/BR', path)
+    if not m:
+        return 404, {'title': 'Not Found'}
+    year = int(m.group(1))
+    rows = [
+        (f"{year}-01-01", 'Confraternização Universal', "New Year's Day"),
+        (f"{year}-04-21", 'Tiradentes', 'Tiradentes'),
+        (f"{year}-09-07", 'Independência do Brasil', 'Independence Day'),
+        (f"{year}-12-25", 'Natal', 'Christmas Day'),
+    ]
+    return 200, [
+        {
+            'date': d, 'localName': local_name, 'name': name, 'countryCode': 'BR', 'fixed': True,
+            'global': True, 'counties': None, 'launchYear': None, 'types': ['Public'],
+        }
+        for d, local_name, name in rows
+    ]
+
+
+def _wikipedia(path: str, query: dict[str, list[str]]) -> tuple[int, object]:
+    m = re.fullmatch(r'/api/rest_v1/feed/onthisday/(holidays|events)/(\d{1,2})/(\d{1,2})', path)
+    if not m:
+        return 404, {'type': 'not_found'}
+    kind, month, day = m.group(1), int(m.group(2)), int(m.group(3))
+    rows = [
+        {'text': f"Item {i + 1} de {kind} em {day:02d}/{month:02d} (stub)", 'year': 1900 + (month * 31 + day + i * 7) % 120}
+        for i in range(6)
+    ]
+    return 200, {kind: rows}
+
+
+_ROUTES = {
+    'frankfurter': _frankfurter,
+    'coingecko': _coingecko,
+    'nager': _nager,
+    'wikipedia': _wikipedia,
+}
+
+
+def make_handler(config: StubConfig, stats: StubStats, rng: random.Random) -> type[BaseHTTPRequestHandler]:
+    rng_lock = threading.Lock()
+
+    def roll() -> float:
+        with rng_lock:
+            return rng.random()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        server_version = 'OxiraStub/1.0'
+
+        def log_message(self, format, *args):
+            # Milhares de requests por rodada: sem log por linha.
+            pass
+
+        def _send(self, status: int, payload: object, headers: dict[str, str] | None = None) -> None:
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            if urlsplit(self.path).path == '/_reset':
+                stats.reset()
+                return self._send(200, {'ok': True})
+            return self._send(404, {'error': 'not found'})
+
+        def do_GET(self):
+            parts = urlsplit(self.path)
+            if parts.path == '/_stats':
+                return self._send(200, stats.as_dict())
+
+            provider, _, rest = parts.path.lstrip('/').partition('/')
+            route = _ROUTES.get(provider)
+            if route is None:
+                return self._send(404, {'error': 'provedor desconhecido'})
+
+            delay = max(0.0, config.latency_ms + (roll() * 2.0 - 1.0) * config.jitter_ms) / 1000.0
+            time.sleep(delay)
+
+            dice = roll()
+            if dice < config.hang_rate:
+                stats.record(provider, 'hang')
+                time.sleep(HANG_SECONDS)
+                return self._send(504, {'error': 'stub: travou'})
+            dice -= config.hang_rate
+            if dice < config.rate_429:
+                stats.record(provider, 429)
+                return self._send(429, {'error': 'stub: rate limit'}, {'Retry-After': str(config.retry_after)})
+            dice -= config.rate_429
+            if dice < config.error_rate:
+                stats.record(provider, 502)
+                return self._send(502, {'error': 'stub: erro'})
+
+            status, payload = route('/' + rest, parse_qs(parts.query))
+            stats.record(provider, status)
+            return self._send(status, payload)
+
+    return Handler
+
+
+def make_server(host: str, port: int, config: StubConfig, *, seed: int | None = None) -> tuple[ThreadingHTTPServer, StubStats]:
+    stats = StubStats()
+    server = ThreadingHTTPServer((host, port), make_handler(config, stats, random.Random(seed)))
+    server.daemon_threads = True
+    return server, stats
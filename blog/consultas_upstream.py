@@ -0,0 +1,279 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Any, Awaitable, Callable
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from . import consultas_series, http_client
+from .consultas_breaker import aguard, guard
+
+
+# Moedas que a página /consultas/ oferece nos cards de câmbio.
+FX_PAGE_BASES = ('USD', 'EUR', 'GBP', 'ARS', 'CAD', 'AUD', 'CHF', 'JPY', 'MXN')
+FX_PAGE_DEFAULT = ('USD', 'EUR', 'GBP')
+FX_PAGE_RANGE_DAYS = 30
+
+# Câmbio: uma tabela canônica (base EUR, todas as moedas) cobrindo a maior
+# janela que as APIs aceitam. Qualquer base/símbolo/range sai dela (consultas_fx).
+FX_CANONICAL_BASE = 'EUR'
+FX_TABLE_DAYS = consultas_series.HISTORY_DAYS
+
+# Whitelist de moedas cripto (segurança + estabilidade do rate-limit).
+CRYPTO_ALLOWED_IDS = ('bitcoin', 'ethereum', 'solana', 'ripple', 'cardano', 'dogecoin')
+CRYPTO_DEFAULT_IDS = ('bitcoin', 'ethereum')
+
+PROVIDERS = ('frankfurter', 'coingecko', 'nager', 'wikipedia')
+
+UPSTREAM_BASES = {
+    'frankfurter': 'https://api.frankfurter.app',
+    'coingecko': 'https://api.coingecko.com',
+    'nager': 'https://date.nager.at',
+    'wikipedia': 'https://pt.wikipedia.org',
+}
+
+# O BCE publica uma vez por dia útil; 1h de TTL mole basta para pegar a virada.
+FX_TTL = 60 * 60
+CRYPTO_TTL = 600
+HOLIDAYS_TTL = 6 * 60 * 60
+DAYFACTS_TTL = 6 * 60 * 60
+
+
+@dataclass(frozen=True)
+class UpstreamTarget:
+    cache_key: str
+    provider: str
+    ttl_seconds: int
+    # Os dois fetch já passam pelo circuit breaker do provedor (consultas_breaker).
+    fetch: Callable[[], Any]
+    # Mesmo fetch em asyncio (views ASGI).
+    afetch: Callable[[], Awaitable[Any]]
+
+
+def _base(provider: str) -> str:
+    # Com OXIRA_CONSULTAS_UPSTREAM_STUB, todo provedor vira {stub}/{provedor} (manage.py consultas_stub).
+    stub = (getattr(settings, 'OXIRA_CONSULTAS_UPSTREAM_STUB', '') or '').rstrip('/')
+    return f"{stub}/{provider}" if stub else UPSTREAM_BASES[provider]
+
+
+def http_get_json(url: str, timeout: float = 8.0):
+    # Pool keep-alive compartilhado; respostas dos upstreams são pequenas (2 MB de teto).
+    return http_client.get_json(url, read_timeout=timeout, max_bytes=2 * 1024 * 1024)
+
+
+async def ahttp_get_json(url: str, timeout: float = 8.0):
+    return await http_client.aget_json(url, read_timeout=timeout, max_bytes=2 * 1024 * 1024)
+
+
+def _json_target(cache_key: str, provider: str, ttl_seconds: int, url: str) -> UpstreamTarget:
+    return UpstreamTarget(
+        cache_key=cache_key,
+        provider=provider,
+        ttl_seconds=ttl_seconds,
+        fetch=guard(provider, lambda: http_get_json(url)),
+        afetch=aguard(provider, lambda: ahttp_get_json(url)),
+    )
+
+
+def _fx_table_url(start: date, end: date) -> str:
+    # Frankfurter: /YYYY-MM-DD..YYYY-MM-DD?from=EUR (sem `to` = todas as moedas)
+    return f"{_base('frankfurter')}/{start.isoformat()}..{end.isoformat()}?from={FX_CANONICAL_BASE}"
+
+
+def _load_fx_table(end: date) -> dict:
+    # Só busca os dias depois do último gravado; a tabela sai do histórico local.
+    start = consultas_series.fx_fetch_start(end)
+    if start is not None:
+        consultas_series.store_fx_table(http_get_json(_fx_table_url(start, end)))
+    return consultas_series.fx_table(end - timedelta(days=FX_TABLE_DAYS - 1), end)
+
+
+async def _aload_fx_table(end: date) -> dict:
+    start = await sync_to_async(consultas_series.fx_fetch_start)(end)
+    if start is not None:
+        data = await ahttp_get_json(_fx_table_url(start, end))
+        await sync_to_async(consultas_series.store_fx_table)(data)
+    return await sync_to_async(consultas_series.fx_table)(end - timedelta(days=FX_TABLE_DAYS - 1), end)
+
+
+def fx_table_target(end: date) -> UpstreamTarget:
+    """Tabela canônica até `end`: FX_TABLE_DAYS dias, base EUR, todas as moedas.
+
+    A key não leva a data: na virada do dia a tabela de ontem continua servida
+    (SWR) enquanto o refresh busca a de hoje, em vez de um miss frio por dia.
+    """
+    return UpstreamTarget(
+        cache_key=f"consultas:fx:table:{FX_CANONICAL_BASE}:{FX_TABLE_DAYS}",
+        provider='frankfurter',
+        ttl_seconds=FX_TTL,
+        fetch=guard('frankfurter', lambda: _load_fx_table(end)),
+        afetch=aguard('frankfurter', lambda: _aload_fx_table(end)),
+    )
+
+
+def crypto_prices_target() -> UpstreamTarget:
+    """Snapshot de todas as moedas da whitelist numa chamada só; cada request recorta o seu subconjunto."""
+    ids_param = ','.join(CRYPTO_ALLOWED_IDS)
+    url = (
+        f"{_base('coingecko')}/api/v3/simple/price"
+        f"?ids={ids_param}"
+        "&vs_currencies=brl,usd"
+        "&include_24hr_change=true"
+    )
+    return _json_target("consultas:crypto:prices:all", 'coingecko', CRYPTO_TTL, url)
+
+
+def _crypto_chart_url(coin_id: str, days: int) -> str:
+    return f"{_base('coingecko')}/api/v3/coins/{coin_id}/market_chart?vs_currency=brl&days={days}&interval=daily"
+
+
+def _crypto_history_start(today: date) -> date:
+    return today - timedelta(days=consultas_series.HISTORY_DAYS)
+
+
+def _load_crypto_chart(coin_id: str) -> dict:
+    # Incremental: days = dias desde o último ponto gravado (normalmente 1).
+    today = consultas_series.utc_today()
+    days = consultas_series.crypto_fetch_days(coin_id, today)
+    consultas_series.store_crypto_chart(coin_id, http_get_json(_crypto_chart_url(coin_id, days)))
+    return consultas_series.crypto_chart(coin_id, _crypto_history_start(today), today)
+
+
+async def _aload_crypto_chart(coin_id: str) -> dict:
+    today = consultas_series.utc_today()
+    days = await sync_to_async(consultas_series.crypto_fetch_days)(coin_id, today)
+    data = await ahttp_get_json(_crypto_chart_url(coin_id, days))
+    await sync_to_async(consultas_series.store_crypto_chart)(coin_id, data)
+    return await sync_to_async(consultas_series.crypto_chart)(coin_id, _crypto_history_start(today), today)
+
+
+def crypto_chart_target(coin_id: str) -> UpstreamTarget:
+    """Histórico da moeda (HISTORY_DAYS dias); as janelas de 7/30/60 dias são fatias dele."""
+    return UpstreamTarget(
+        cache_key=f"consultas:crypto:history:{coin_id}",
+        provider='coingecko',
+        ttl_seconds=CRYPTO_TTL,
+        fetch=guard('coingecko', lambda: _load_crypto_chart(coin_id)),
+        afetch=aguard('coingecko', lambda: _aload_crypto_chart(coin_id)),
+    )
+
+
+def holidays_year_target(year: int) -> UpstreamTarget:
+    # Só complemento: os feriados nacionais são calculados em consultas_holidays.
+    url = f"{_base('nager')}/api/v3/PublicHolidays/{year}/BR"
+    return _json_target(f"consultas:holidays:BR:{year}", 'nager', HOLIDAYS_TTL, url)
+
+
+def stable_pick(seed: str, options: list[str]) -> str:
+    if not options:
+        return ''
+    h = hashlib.md5(seed.encode('utf-8')).hexdigest()
+    idx = int(h[:8], 16) % len(options)
+    return options[idx]
+
+
+def _wikipedia_onthisday_urls(date_obj: date) -> tuple[str, str]:
+    month = int(date_obj.month)
+    day = int(date_obj.day)
+    return (
+        f"{_base('wikipedia')}/api/rest_v1/feed/onthisday/holidays/{month}/{day}",
+        f"{_base('wikipedia')}/api/rest_v1/feed/onthisday/events/{month}/{day}",
+    )
+
+
+def load_wikipedia_onthisday(date_obj: date) -> list[dict]:
+    """Busca itens do dia via Wikipedia (pt) usando a API 'onthisday'.
+
+    Fonte: pt.wikipedia.org (conteúdo CC BY-SA; consumimos via API pública).
+    """
+    holidays_url, events_url = _wikipedia_onthisday_urls(date_obj)
+    return _wikipedia_items(date_obj, http_get_json(holidays_url), http_get_json(events_url))
+
+
+async def _aload_wikipedia_onthisday(date_obj: date) -> list[dict]:
+    # Os dois feeds em paralelo.
+    holidays_url, events_url = _wikipedia_onthisday_urls(date_obj)
+    holidays_data, events_data = await asyncio.gather(ahttp_get_json(holidays_url), ahttp_get_json(events_url))
+    return _wikipedia_items(date_obj, holidays_data, events_data)
+
+
+def _wikipedia_items(date_obj: date, holidays_data, events_data) -> list[dict]:
+    holidays = holidays_data.get('holidays') if isinstance(holidays_data, dict) else None
+    events = events_data.get('events') if isinstance(events_data, dict) else None
+
+    out: list[dict] = []
+
+    def _add_items(kind: str, rows, limit: int):
+        if not isinstance(rows, list):
+            return
+        for row in rows:
+            if len(out) >= 12:
+                return
+            if not isinstance(row, dict):
+                continue
+            text = (row.get('text') or '').strip()
+            if not text:
+                continue
+            year = row.get('year')
+            year_txt = f" ({year})" if isinstance(year, int) else ''
+
+            vibe = stable_pick(
+                f"wiki:{date_obj.isoformat()}:{kind}:{text}",
+                [
+                    'Hoje tem dessas datas que ajudam a puxar contexto.',
+                    'Isso costuma passar batido, mas é bem interessante.',
+                    'Se você curte curiosidade prática: anota essa.',
+                    'Pra lembrar e comentar no dia: fica ótimo.',
+                ],
+            )
+            why = stable_pick(
+                f"wiki:{date_obj.isoformat()}:{kind}:{text}:why",
+                [
+                    'Serve como referência cultural e aparece em calendários e notícias.',
+                    'Ajuda a entender por que algumas datas viram “marco” na conversa pública.',
+                    'É um ótimo gancho pra organizar agenda e conteúdo do dia.',
+                ],
+            )
+
+            out.append(
+                {
+                    'kind': kind,
+                    'title': f"{text}{year_txt}",
+                    'about': '',
+                    'ia_summary': f"{vibe} {why}",
+                    'source': 'wikipedia',
+                }
+            )
+
+    _add_items('comemorativa', holidays, limit=8)
+    _add_items('fato', events, limit=6)
+    return out
+
+
+def wikipedia_onthisday_target(date_obj: date) -> UpstreamTarget:
+    return UpstreamTarget(
+        cache_key=f"consultas:dayfacts:wikipedia:onthisday:{date_obj.isoformat()}",
+        provider='wikipedia',
+        ttl_seconds=DAYFACTS_TTL,
+        fetch=guard('wikipedia', lambda: load_wikipedia_onthisday(date_obj)),
+        afetch=aguard('wikipedia', lambda: _aload_wikipedia_onthisday(date_obj)),
+    )
+
+
+def warm_targets(today: date) -> list[UpstreamTarget]:
+    """Todas as keys que a página /consultas/ usa (o conjunto é pequeno e conhecido)."""
+    targets: list[UpstreamTarget] = []
+    targets.append(fx_table_target(today))
+
+    targets.append(crypto_prices_target())
+    for coin_id in CRYPTO_ALLOWED_IDS:
+        targets.append(crypto_chart_target(coin_id))
+
+    if getattr(settings, 'OXIRA_CONSULTAS_NAGER', True):
+        targets.append(holidays_year_target(today.year))
+    targets.append(wikipedia_onthisday_target(today))
+    return targets
@@ -6,6 +6,8 @@ from django import forms
 from django.contrib.auth import get_user_model
 from django.contrib.auth.forms import UserCreationForm
 
+from .image_ingest import validate_image_budget
+
 
 class AuthorSignupForm(UserCreationForm):
     username = forms.CharField(label="Usuário", max_length=150)
@@ -17,7 +19,7 @@ class AuthorSignupForm(UserCreationForm):
     phone = forms.CharField(label="Telefone", max_length=20, required=False)
     instagram = forms.URLField(label="Instagram (link)", required=False)
 
-    avatar = forms.ImageField(label="Foto de perfil", required=False)
+    avatar = forms.ImageField(label="Foto de perfil", required=False, validators=[validate_image_budget])
     bio = forms.CharField(label="Biografia", required=False, widget=forms.Textarea(attrs={"rows": 5}))
 
     class Meta(UserCreationForm.Meta):
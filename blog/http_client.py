@@ -0,0 +1,590 @@
+"""Cliente HTTP de saída com pool de conexões por host (stdlib, sem dependências).
+
+- keep-alive: reaproveita a conexão TCP/TLS entre chamadas ao mesmo host;
+- gzip/deflate negociado e decodificado aqui;
+- limite de tamanho da resposta (também depois de descomprimir);
+- timeouts separados de conexão e de leitura;
+- métricas de latência por host (`host_stats()`);
+- versão asyncio (`AsyncHttpClient`) para as views ASGI, sem segurar thread.
+
+Erros seguem os tipos do urllib (HTTPError/URLError) e TimeoutError, para
+o código que já tratava `urlopen` continuar funcionando igual.
+"""
+from __future__ import annotations
+
+import asyncio
+import http.client
+import io
+import json
+import socket
+import ssl
+import threading
+import time
+import zlib
+from collections import deque
+from dataclasses import dataclass, field
+from email.message import Message
+from urllib.error import HTTPError, URLError
+from urllib.parse import urljoin, urlsplit
+
+from .stats import percentile
+
+
+DEFAULT_USER_AGENT = 'Oxira/1.0 (+https://oxira.local)'
+DEFAULT_CONNECT_TIMEOUT = 3.0
+DEFAULT_READ_TIMEOUT = 8.0
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024
+
+MAX_IDLE_PER_HOST = 4
+IDLE_TIMEOUT = 60.0
+MAX_REDIRECTS = 5
+
+_READ_CHUNK = 64 * 1024
+_REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+
+
+class ResponseTooLarge(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class HttpResponse:
+    url: str
+    status: int
+    headers: Message
+    body: bytes
+
+    def json(self):
+        return json.loads(self.body.decode('utf-8'))
+
+
+@dataclass
+class _HostStats:
+    requests: int = 0
+    errors: int = 0
+    opened: int = 0
+    reused: int = 0
+    last_ms: float = 0.0
+    samples: deque = field(default_factory=lambda: deque(maxlen=200))
+
+
+def _split_url(url: str) -> tuple[tuple[str, str, int], str]:
+    parts = urlsplit(url)
+    scheme = (parts.scheme or '').lower()
+    if scheme not in ('http', 'https') or not parts.hostname:
+        raise URLError(f"URL inválida: {url}")
+    port = parts.port or (443 if scheme == 'https' else 80)
+    path = (parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+    return (scheme, parts.hostname, port), path
+
+
+def _decode_body(raw: bytes, encoding: str, max_bytes: int) -> bytes:
+    encoding = (encoding or '').strip().lower()
+    if encoding in ('gzip', 'x-gzip'):
+        decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    elif encoding == 'deflate':
+        decoder = zlib.decompressobj()
+    else:
+        return raw
+
+    try:
+        body = decoder.decompress(raw, max_bytes + 1)
+    except zlib.error:
+        if encoding != 'deflate':
+            raise
+        # Alguns servidores mandam deflate "cru" (sem header zlib).
+        decoder = zlib.decompressobj(-zlib.MAX_WBITS)
+        body = decoder.decompress(raw, max_bytes + 1)
+    if len(body) > max_bytes or decoder.unconsumed_tail:
+        raise ResponseTooLarge(f"Resposta maior que {max_bytes} bytes (descomprimida)")
+    return body
+
+
+def _default_headers(user_agent: str, headers: dict[str, str] | None) -> dict[str, str]:
+    send_headers = {
+        'User-Agent': user_agent,
+        'Accept-Encoding': 'gzip, deflate',
+        'Connection': 'keep-alive',
+    }
+    send_headers.update(headers or {})
+    return send_headers
+
+
+class _StatsMixin:
+    def _init_stats(self) -> None:
+        self._stats: dict[str, _HostStats] = {}
+        self._lock = threading.Lock()
+
+    def _host(self, host: str) -> _HostStats:
+        stats = self._stats.get(host)
+        if stats is None:
+            stats = self._stats[host] = _HostStats()
+        return stats
+
+    def _record(self, host: str, elapsed_ms: float, *, error: bool) -> None:
+        with self._lock:
+            stats = self._host(host)
+            stats.requests += 1
+            stats.last_ms = elapsed_ms
+            stats.samples.append(elapsed_ms)
+            if error:
+                stats.errors += 1
+
+    def _count_connection(self, host: str, *, reused: bool) -> None:
+        with self._lock:
+            if reused:
+                self._host(host).reused += 1
+            else:
+                self._host(host).opened += 1
+
+    def host_stats(self) -> dict[str, dict]:
+        with self._lock:
+            out = {}
+            for host, s in self._stats.items():
+                samples = list(s.samples)
+                out[host] = {
+                    'requests': s.requests,
+                    'errors': s.errors,
+                    'opened': s.opened,
+                    'reused': s.reused,
+                    'last_ms': round(s.last_ms, 1),
+                    'avg_ms': round(sum(samples) / len(samples), 1) if samples else 0.0,
+                    'p50_ms': round(percentile(samples, 50), 1),
+                    'p95_ms': round(percentile(samples, 95), 1),
+                }
+            return out
+
+
+class HttpClient(_StatsMixin):
+    def __init__(
+        self,
+        *,
+        max_idle_per_host: int = MAX_IDLE_PER_HOST,
+        idle_timeout: float = IDLE_TIMEOUT,
+        user_agent: str = DEFAULT_USER_AGENT,
+    ):
+        self.max_idle_per_host = max_idle_per_host
+        self.idle_timeout = idle_timeout
+        self.user_agent = user_agent
+        self._ssl_context = ssl.create_default_context()
+        self._idle: dict[tuple[str, str, int], list[tuple[http.client.HTTPConnection, float]]] = {}
+        self._init_stats()
+
+    # Pool
+
+    def _connect(self, key: tuple[str, str, int], connect_timeout: float) -> http.client.HTTPConnection:
+        scheme, host, port = key
+        if scheme == 'https':
+            conn = http.client.HTTPSConnection(host, port, timeout=connect_timeout, context=self._ssl_context)
+        else:
+            conn = http.client.HTTPConnection(host, port, timeout=connect_timeout)
+        conn.connect()
+        return conn
+
+    def _acquire(self, key: tuple[str, str, int], connect_timeout: float) -> tuple[http.client.HTTPConnection, bool]:
+        now = time.monotonic()
+        reusable = None
+        with self._lock:
+            idle = self._idle.get(key) or []
+            while idle:
+                conn, last_used = idle.pop()
+                if now - last_used < self.idle_timeout and conn.sock is not None:
+                    reusable = conn
+                    break
+                conn.close()
+        if reusable is not None:
+            self._count_connection(key[1], reused=True)
+            return reusable, True
+        conn = self._connect(key, connect_timeout)
+        self._count_connection(key[1], reused=False)
+        return conn, False
+
+    def _release(self, key: tuple[str, str, int], conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle_per_host:
+                idle.append((conn, time.monotonic()))
+                return
+        conn.close()
+
+    def close(self) -> None:
+        with self._lock:
+            pools = list(self._idle.values())
+            self._idle.clear()
+        for idle in pools:
+            for conn, _ in idle:
+                conn.close()
+
+    # Requisição
+
+    def _read_body(self, resp: http.client.HTTPResponse, max_bytes: int) -> bytes:
+        chunks: list[bytes] = []
+        total = 0
+        while True:
+            chunk = resp.read(_READ_CHUNK)
+            if not chunk:
+                break
+            total += len(chunk)
+            if total > max_bytes:
+                raise ResponseTooLarge(f"Resposta maior que {max_bytes} bytes")
+            chunks.append(chunk)
+        return _decode_body(b''.join(chunks), resp.getheader('Content-Encoding') or '', max_bytes)
+
+    def _send_once(
+        self,
+        method: str,
+        url: str,
+        headers: dict[str, str],
+        connect_timeout: float,
+        read_timeout: float,
+        max_bytes: int,
+    ) -> tuple[int, str, Message, bytes]:
+        key, path = _split_url(url)
+
+        for attempt in (0, 1):
+            try:
+                conn, reused = self._acquire(key, connect_timeout)
+            except socket.timeout:
+                raise
+            except OSError as e:
+                raise URLError(e) from e
+
+            try:
+                conn.sock.settimeout(read_timeout)
+                conn.request(method, path, headers=headers)
+                resp = conn.getresponse()
+            except socket.timeout:
+                conn.close()
+                raise
+            except (ConnectionError, http.client.BadStatusLine) as e:
+                conn.close()
+                # Conexão do pool fechada pelo servidor: tenta uma vez com conexão nova.
+                if reused and attempt == 0:
+                    continue
+                raise URLError(e) from e
+            except OSError as e:
+                conn.close()
+                raise URLError(e) from e
+
+            try:
+                body = self._read_body(resp, max_bytes)
+            except socket.timeout:
+                conn.close()
+                raise
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                raise URLError(e) from e
+            except BaseException:
+                conn.close()
+                raise
+
+            if resp.will_close:
+                conn.close()
+            else:
+                self._release(key, conn)
+            return resp.status, resp.reason, resp.headers, body
+
+        raise URLError(f"Falha ao conectar em {key[1]}")
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        headers: dict[str, str] | None = None,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+        read_timeout: float = DEFAULT_READ_TIMEOUT,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ) -> HttpResponse:
+        send_headers = _default_headers(self.user_agent, headers)
+
+        for _ in range(MAX_REDIRECTS + 1):
+            host = urlsplit(url).hostname or ''
+            started = time.monotonic()
+            try:
+                status, reason, resp_headers, body = self._send_once(
+                    method, url, send_headers, connect_timeout, read_timeout, max_bytes
+                )
+            except BaseException:
+                self._record(host, (time.monotonic() - started) * 1000.0, error=True)
+                raise
+            self._record(host, (time.monotonic() - started) * 1000.0, error=status >= 400)
+
+            location = resp_headers.get('Location')
+            if status in _REDIRECT_STATUSES and location:
+                url = urljoin(url, location)
+                continue
+            if status >= 400:
+                raise HTTPError(url, status, reason, resp_headers, io.BytesIO(body))
+            return HttpResponse(url=url, status=status, headers=resp_headers, body=body)
+
+        raise URLError(f"Redirecionamentos demais: {url}")
+
+    def get(self, url: str, **kwargs) -> HttpResponse:
+        return self.request('GET', url, **kwargs)
+
+
+class _AsyncConn:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.loop = asyncio.get_running_loop()
+        self.last_used = time.monotonic()
+
+    def usable(self, idle_timeout: float) -> bool:
+        return (
+            self.loop is asyncio.get_running_loop()
+            and not self.writer.is_closing()
+            and not self.reader.at_eof()
+            and time.monotonic() - self.last_used < idle_timeout
+        )
+
+    def close(self) -> None:
+        try:
+            self.writer.close()
+        except Exception:
+            pass
+
+
+class AsyncHttpClient(_StatsMixin):
+    """Mesmo contrato do HttpClient, em asyncio puro (HTTP/1.1, GET).
+
+    As conexões ficam presas ao event loop que as criou; conexões de outro
+    loop (ex.: async_to_sync em WSGI) são descartadas em vez de reaproveitadas.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_idle_per_host: int = MAX_IDLE_PER_HOST,
+        idle_timeout: float = IDLE_TIMEOUT,
+        user_agent: str = DEFAULT_USER_AGENT,
+    ):
+        self.max_idle_per_host = max_idle_per_host
+        self.idle_timeout = idle_timeout
+        self.user_agent = user_agent
+        self._ssl_context = ssl.create_default_context()
+        self._idle: dict[tuple[str, str, int], list[_AsyncConn]] = {}
+        self._init_stats()
+
+    async def _acquire(self, key: tuple[str, str, int], connect_timeout: float) -> tuple[_AsyncConn, bool]:
+        idle = self._idle.get(key) or []
+        while idle:
+            conn = idle.pop()
+            if conn.usable(self.idle_timeout):
+                self._count_connection(key[1], reused=True)
+                return conn, True
+            conn.close()
+
+        scheme, host, port = key
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(
+                    host,
+                    port,
+                    ssl=self._ssl_context if scheme == 'https' else None,
+                    limit=_READ_CHUNK * 4,
+                ),
+                timeout=connect_timeout,
+            )
+        except TimeoutError:
+            raise
+        except OSError as e:
+            raise URLError(e) from e
+        self._count_connection(host, reused=False)
+        return _AsyncConn(reader, writer), False
+
+    def _release(self, key: tuple[str, str, int], conn: _AsyncConn) -> None:
+        idle = self._idle.setdefault(key, [])
+        if len(idle) < self.max_idle_per_host:
+            conn.last_used = time.monotonic()
+            idle.append(conn)
+            return
+        conn.close()
+
+    async def _read_response(self, conn: _AsyncConn, max_bytes: int) -> tuple[int, str, Message, bytes, bool]:
+        reader = conn.reader
+        status_line = (await reader.readline()).decode('latin-1').strip()
+        if not status_line:
+            raise ConnectionResetError('Conexão fechada pelo servidor')
+        try:
+            version, status_txt, *reason = status_line.split(' ', 2)
+            status = int(status_txt)
+        except ValueError as e:
+            raise http.client.BadStatusLine(status_line) from e
+
+        headers = Message()
+        while True:
+            line = (await reader.readline()).decode('latin-1')
+            if line in ('\r\n', '\n', ''):
+                break
+            name, _, value = line.partition(':')
+            headers[name.strip()] = value.strip()
+
+        connection = (headers.get('Connection') or '').lower()
+        will_close = version == 'HTTP/1.0' or 'close' in connection
+
+        chunks: list[bytes] = []
+        total = 0
+
+        def _append(chunk: bytes) -> None:
+            nonlocal total
+            total += len(chunk)
+            if total > max_bytes:
+                raise ResponseTooLarge(f"Resposta maior que {max_bytes} bytes")
+            chunks.append(chunk)
+
+        if status in (204, 304) or 100 <= status < 200:
+            pass
+        elif 'chunked' in (headers.get('Transfer-Encoding') or '').lower():
+            while True:
+                size_line = (await reader.readline()).decode('latin-1').split(';', 1)[0].strip()
+                size = int(size_line, 16)
+                if size == 0:
+                    # Trailers (normalmente vazios) até a linha em branco.
+                    while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                        pass
+                    break
+                if total + size > max_bytes:
+                    raise ResponseTooLarge(f"Resposta maior que {max_bytes} bytes")
+                _append(await reader.readexactly(size))
+                await reader.readexactly(2)
+        elif headers.get('Content-Length') is not None:
+            length = int(headers.get('Content-Length'))
+            if length > max_bytes:
+                raise ResponseTooLarge(f"Resposta maior que {max_bytes} bytes")
+            if length:
+                _append(await reader.readexactly(length))
+        else:
+            will_close = True
+            while True:
+                chunk = await reader.read(_READ_CHUNK)
+                if not chunk:
+                    break
+                _append(chunk)
+
+        body = _decode_body(b''.join(chunks), headers.get('Content-Encoding') or '', max_bytes)
+        return status, (reason[0] if reason else ''), headers, body, will_close
+
+    async def _send_once(
+        self,
+        method: str,
+        url: str,
+        headers: dict[str, str],
+        connect_timeout: float,
+        read_timeout: float,
+        max_bytes: int,
+    ) -> tuple[int, str, Message, bytes]:
+        key, path = _split_url(url)
+        host_header = key[1] if key[2] in (80, 443) else f"{key[1]}:{key[2]}"
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {host_header}"]
+        lines += [f"{k}: {v}" for k, v in headers.items()]
+        payload = ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+
+        for attempt in (0, 1):
+            conn, reused = await self._acquire(key, connect_timeout)
+            try:
+                conn.writer.write(payload)
+                await conn.writer.drain()
+                status, reason, resp_headers, body, will_close = await asyncio.wait_for(
+                    self._read_response(conn, max_bytes),
+                    timeout=read_timeout,
+                )
+            except TimeoutError:
+                conn.close()
+                raise
+            except (ConnectionError, asyncio.IncompleteReadError, http.client.BadStatusLine) as e:
+                conn.close()
+                # Conexão do pool fechada pelo servidor: tenta uma vez com conexão nova.
+                if reused and attempt == 0:
+                    continue
+                raise URLError(e) from e
+            except OSError as e:
+                conn.close()
+                raise URLError(e) from e
+            except BaseException:
+                conn.close()
+                raise
+
+            if will_close:
+                conn.close()
+            else:
+                self._release(key, conn)
+            return status, reason, resp_headers, body
+
+        raise URLError(f"Falha ao conectar em {key[1]}")
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        headers: dict[str, str] | None = None,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+        read_timeout: float = DEFAULT_READ_TIMEOUT,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ) -> HttpResponse:
+        send_headers = _default_headers(self.user_agent, headers)
+
+        for _ in range(MAX_REDIRECTS + 1):
+            host = urlsplit(url).hostname or ''
+            started = time.monotonic()
+            try:
+                status, reason, resp_headers, body = await self._send_once(
+                    method, url, send_headers, connect_timeout, read_timeout, max_bytes
+                )
+            except BaseException:
+                self._record(host, (time.monotonic() - started) * 1000.0, error=True)
+                raise
+            self._record(host, (time.monotonic() - started) * 1000.0, error=status >= 400)
+
+            location = resp_headers.get('Location')
+            if status in _REDIRECT_STATUSES and location:
+                url = urljoin(url, location)
+                continue
+            if status >= 400:
+                raise HTTPError(url, status, reason, resp_headers, io.BytesIO(body))
+            return HttpResponse(url=url, status=status, headers=resp_headers, body=body)
+
+        raise URLError(f"Redirecionamentos demais: {url}")
+
+    async def get(self, url: str, **kwargs) -> HttpResponse:
+        return await self.request('GET', url, **kwargs)
+
+
+# Clientes compartilhados pelo processo (views e management commands).
+default_client = HttpClient()
+default_async_client = AsyncHttpClient()
+
+
+def get_json(url: str, *, headers: dict[str, str] | None = None, **kwargs):
+    send_headers = {'Accept': 'application/json'}
+    send_headers.update(headers or {})
+    return default_client.get(url, headers=send_headers, **kwargs).json()
+
+
+def get_bytes(url: str, *, headers: dict[str, str] | None = None, **kwargs) -> bytes:
+    return default_client.get(url, headers=headers, **kwargs).body
+
+
+async def aget_json(url: str, *, headers: dict[str, str] | None = None, **kwargs):
+    send_headers = {'Accept': 'application/json'}
+    send_headers.update(headers or {})
+    return (await default_async_client.get(url, headers=send_headers, **kwargs)).json()
+
+
+def host_stats() -> dict[str, dict]:
+    """Métricas por host, somando os clientes sync e async."""
+    out = default_client.host_stats()
+    for host, row in default_async_client.host_stats().items():
+        if host not in out:
+            out[host] = row
+            continue
+        merged = dict(out[host])
+        for k in ('requests', 'errors', 'opened', 'reused'):
+            merged[k] += row[k]
+        # Percentis não somam: fica com o pior dos dois (visão conservadora).
+        for k in ('avg_ms', 'p50_ms', 'p95_ms', 'last_ms'):
+            merged[k] = max(merged[k], row[k])
+        out[host] = merged
+    return out
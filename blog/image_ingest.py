@@ -0,0 +1,218 @@
+"""Decode de imagens com memória proporcional à saída, não à entrada.
+
+Foto de celular de 50 MP decodificada inteira ocupa ~200 MB de RAM (RGB no
+Pillow são 4 bytes/pixel), e alguns uploads juntos derrubam o worker. Aqui:
+
+- o cabeçalho é lido antes do decode, e imagens acima de
+  OXIRA_IMAGE_MAX_PIXELS são recusadas (`ImageTooLarge`);
+- JPEG usa o draft mode do Pillow: o decoder já entrega 1/2, 1/4 ou 1/8 do
+  tamanho, o mais perto do que a saída precisa;
+- o crop e a redução inteira (`reduce`, com box) saem numa alocação só, do
+  tamanho da região já reduzida;
+- no máximo OXIRA_IMAGE_DECODE_SLOTS decodes rodam ao mesmo tempo no processo
+  (jobs, miniaturas e comandos dividem os mesmos slots);
+- cada decode gera um `IngestReport` com o pico estimado dos buffers do
+  Pillow; os últimos ficam em `recent_reports()`.
+"""
+from __future__ import annotations
+
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Iterator
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from PIL import Image, ImageOps
+
+
+DEFAULT_MAX_PIXELS = 60_000_000
+DEFAULT_DECODE_SLOTS = 2
+
+# Orientações EXIF que trocam largura e altura.
+_ROTATED = (5, 6, 7, 8)
+
+
+class ImageTooLarge(ValueError):
+    """Imagem acima do orçamento de pixels; não adianta tentar de novo."""
+
+
+def max_pixels() -> int:
+    return int(getattr(settings, 'OXIRA_IMAGE_MAX_PIXELS', DEFAULT_MAX_PIXELS) or DEFAULT_MAX_PIXELS)
+
+
+_slots: threading.BoundedSemaphore | None = None
+_slots_guard = threading.Lock()
+
+
+def _decode_slots() -> threading.BoundedSemaphore:
+    global _slots
+    with _slots_guard:
+        if _slots is None:
+            n = int(getattr(settings, 'OXIRA_IMAGE_DECODE_SLOTS', DEFAULT_DECODE_SLOTS) or DEFAULT_DECODE_SLOTS)
+            _slots = threading.BoundedSemaphore(max(1, n))
+        return _slots
+
+
+def _image_bytes(im: Image.Image) -> int:
+    # Buffer interno do Pillow: modos de 8 bits ocupam 1 byte/pixel, o resto (RGB inclusive) 4.
+    per_pixel = 1 if im.mode in ('1', 'L', 'P') else 2 if im.mode.startswith('I;16') else 4
+    return im.width * im.height * per_pixel
+
+
+@dataclass
+class IngestReport:
+    label: str
+    source_size: tuple[int, int]
+    decoded_size: tuple[int, int] = (0, 0)
+    region_size: tuple[int, int] = (0, 0)
+    draft: bool = False
+    peak_bytes: int = 0
+    seconds: float = 0.0
+    _started: float = field(default_factory=time.monotonic, repr=False)
+
+    def track(self, *images: Image.Image | None) -> None:
+        """Anota as imagens vivas neste ponto; o pico é o maior total visto."""
+        total = sum(_image_bytes(im) for im in images if im is not None)
+        self.peak_bytes = max(self.peak_bytes, total)
+
+    def as_dict(self) -> dict:
+        out = asdict(self)
+        out.pop('_started', None)
+        out['peak_mb'] = round(self.peak_bytes / (1024 * 1024), 1)
+        return out
+
+
+_recent: deque[IngestReport] = deque(maxlen=100)
+_recent_lock = threading.Lock()
+
+
+def recent_reports(since: float = 0.0) -> list[dict]:
+    """Reports dos últimos decodes (os que começaram em/depois de `since`, em time.monotonic())."""
+    with _recent_lock:
+        return [r.as_dict() for r in _recent if r._started >= since]
+
+
+def describe(report: dict) -> str:
+    """Uma linha legível de um report, para os comandos de manutenção."""
+    sw, sh = report['source_size']
+    dw, dh = report['decoded_size']
+    return (
+        f"{report['label'] or 'imagem'}: {sw}x{sh} -> decode {dw}x{dh}{' (draft)' if report['draft'] else ''}, "
+        f"pico ~{report['peak_mb']} MB, {report['seconds']}s"
+    )
+
+
+def _oriented(im: Image.Image) -> tuple[int, int, int]:
+    orientation = im.getexif().get(0x0112, 1)
+    w, h = im.size
+    return (h, w, orientation) if orientation in _ROTATED else (w, h, orientation)
+
+
+def _check_budget(width: int, height: int, label: str) -> None:
+    if width * height > max_pixels():
+        raise ImageTooLarge(
+            f"{label or 'imagem'}: {width}x{height} ({width * height / 1e6:.0f} MP) passa do limite de "
+            f"{max_pixels() / 1e6:.0f} MP"
+        )
+
+
+def probe(fp, *, label: str = '') -> tuple[int, int]:
+    """(largura, altura) já com a rotação EXIF, lendo só o cabeçalho. Aplica o orçamento de pixels."""
+    with Image.open(fp) as im:
+        width, height, _ = _oriented(im)
+    _check_budget(width, height, label)
+    return width, height
+
+
+def validate_image_budget(value) -> None:
+    """Validator dos ImageFields: recusa no upload o que o decode recusaria depois."""
+    if not value:
+        return
+    try:
+        # Upload cru (forms.ImageField deixa o PIL.Image em .image) ou FieldFile do model.
+        image = getattr(value, 'image', None)
+        width, height = image.size if image is not None else (int(value.width or 0), int(value.height or 0))
+    except Exception:
+        return
+    if width * height > max_pixels():
+        raise ValidationError(
+            'Imagem grande demais (%(w)s×%(h)s). O limite é %(mp)s megapixels; reduza antes de enviar.',
+            params={'w': width, 'h': height, 'mp': round(max_pixels() / 1e6)},
+        )
+
+
+def _clamp(box: tuple[int, int, int, int], width: int, height: int) -> tuple[int, int, int, int]:
+    x, y, x2, y2 = box
+    x = max(0, min(x, width - 1))
+    y = max(0, min(y, height - 1))
+    return x, y, max(x + 1, min(x2, width)), max(y + 1, min(y2, height))
+
+
+@contextmanager
+def decoded(
+    fp,
+    target: tuple[int, int],
+    box: tuple[int, int, int, int] | None = None,
+    *,
+    label: str = '',
+) -> Iterator[tuple[Image.Image, IngestReport]]:
+    """Decodifica só o necessário para gerar `target` a partir de `box` (coordenadas do original já rotacionado).
+
+    Entrega (região, report). A região já vem com a rotação EXIF aplicada, ocupa a
+    `box` inteira e tem pelo menos o tamanho de `target` (ou o da box, se for menor);
+    o resize final fica com quem chama. O slot de decode fica ocupado até o fim do
+    `with`, então resize e encode também entram na conta da concorrência.
+    """
+    with _decode_slots():
+        with Image.open(fp) as im:
+            width, height, orientation = _oriented(im)
+            report = IngestReport(label=label, source_size=(width, height))
+            _check_budget(width, height, label)
+
+            x, y, x2, y2 = _clamp(box, width, height) if box else (0, 0, width, height)
+            box_w, box_h = x2 - x, y2 - y
+            scale = min(1.0, max(target[0] / box_w, target[1] / box_h))
+
+            if scale < 1.0 and im.format == 'JPEG':
+                want = (math.ceil(width * scale), math.ceil(height * scale))
+                if orientation in _ROTATED:
+                    want = (want[1], want[0])
+                # O decoder escolhe a maior redução (1/2..1/8) que ainda cobre `want`.
+                report.draft = im.draft('RGB', want) is not None
+
+            source = ImageOps.exif_transpose(im) if orientation != 1 else im
+            source.load()
+            report.decoded_size = source.size
+            # Volta a box para a escala do que foi decodificado.
+            fx, fy = source.width / width, source.height / height
+            sbox = _clamp(
+                (math.floor(x * fx), math.floor(y * fy), math.ceil(x2 * fx), math.ceil(y2 * fy)),
+                source.width,
+                source.height,
+            )
+            sw, sh = sbox[2] - sbox[0], sbox[3] - sbox[1]
+            # Redução inteira com folga de 2x para o LANCZOS final; crop + reduce numa alocação só.
+            factor = int(min(sw / max(1, target[0]), sh / max(1, target[1])) // 2)
+            if source.mode in ('RGB', 'RGBA', 'L'):
+                region = source.reduce(factor, box=sbox) if factor >= 2 else source.crop(sbox)
+            else:
+                # Paleta, CMYK, 16 bits…: o reduce não aceita; converte só a região.
+                alpha = 'A' in source.getbands() or 'transparency' in source.info
+                region = source.crop(sbox).convert('RGBA' if alpha else 'RGB')
+                if factor >= 2:
+                    region = region.reduce(factor)
+            report.track(source, region)
+            if source is not im:
+                source.close()
+        report.region_size = region.size
+        report.track(region)
+        try:
+            yield region, report
+        finally:
+            report.seconds = round(time.monotonic() - report._started, 3)
+            with _recent_lock:
+                _recent.append(report)
@@ -0,0 +1,242 @@
+"""Processamento de imagens fora do request do admin.
+
+O save do Post/UserProfile só marca `*_status='processing'` e agenda o job
+(depois do commit); crop, resize, encode e variantes rodam numa thread do
+próprio processo, decodificando via image_ingest (memória proporcional à
+saída). Enquanto isso, as páginas mostram o arquivo original.
+
+Os jobs são idempotentes. Capas de post: o original não muda e as renditions
+derivam de (hash, crop, tamanho, formato) — ver post_images. Avatares: o crop
+grava num arquivo novo, cujo nome deriva do original + coordenadas, e só
+depois troca o campo e limpa as coordenadas num único UPDATE. Repetir o job
+(retry, ou `manage.py process_image_jobs` depois de um restart) nunca corta a
+imagem duas vezes.
+"""
+from __future__ import annotations
+
+import hashlib
+import io
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image
+
+from .image_ingest import ImageTooLarge, decoded
+from .inline_images import rewrite_content_images
+from .media_storage import release
+from .post_images import fallback_name, mark_variants_failed, refresh_variants, variants_current, variants_failed
+
+
+MAX_ATTEMPTS = 3
+RETRY_BACKOFF_SECONDS = 2.0
+
+# Tamanho final do crop do avatar.
+AVATAR_SIZE = (400, 400)
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='oxira-images')
+_queued: set[tuple[str, int]] = set()
+_queued_lock = threading.Lock()
+
+
+def _run_inline() -> bool:
+    # Em testes/scripts pode ser útil processar na hora.
+    return getattr(settings, 'OXIRA_IMAGE_JOBS_SYNC', False)
+
+
+def _cropped_name(name: str, crop: tuple[int, int, int, int], size: tuple[int, int]) -> str:
+    # Determinístico: o mesmo original + crop sempre gera o mesmo arquivo.
+    digest = hashlib.sha1(f"{name}|{crop}|{size}".encode('utf-8')).hexdigest()[:10]
+    head, tail = os.path.split(name)
+    stem = os.path.splitext(tail)[0]
+    return f"{head}/{stem}-c{digest}.jpg" if head else f"{stem}-c{digest}.jpg"
+
+
+def _crop_to_file(field, crop: tuple[int, int, int, int], size: tuple[int, int]) -> str | None:
+    """Grava o crop redimensionado num arquivo novo e devolve o nome (None se não há o que cortar)."""
+    x, y, w, h = crop
+    if w <= 0 or h <= 0:
+        return None
+    name = _cropped_name(field.name, crop, size)
+    storage = field.storage
+    if storage.exists(name):
+        return name
+    with decoded(field.path, size, (x, y, x + w, y + h), label=name) as (region, report):
+        cropped = region.convert('RGB').resize(size, Image.Resampling.LANCZOS)
+        report.track(region, cropped)
+        buf = io.BytesIO()
+        cropped.save(buf, format='JPEG', quality=88, optimize=True, progressive=True)
+    return storage.save(name, ContentFile(buf.getvalue()))
+
+
+def _swap_file(model, pk: int, field_name: str, old_name: str, new_name: str, clear: dict) -> bool:
+    """Troca o arquivo e limpa o crop num UPDATE só, se ninguém trocou a imagem no meio."""
+    updated = model.objects.filter(pk=pk, **{field_name: old_name}).update(**{field_name: new_name}, **clear)
+    if updated and old_name != new_name:
+        # O mesmo arquivo pode ser de outro perfil, post ou HTML (storage por conteúdo).
+        release(model._meta.get_field(field_name).storage, old_name)
+    return bool(updated)
+
+
+# Post.image
+
+def post_needs_processing(post) -> bool:
+    return not variants_current(post)
+
+
+def _process_post(pk: int) -> None:
+    from .models import Post
+
+    post = Post.objects.filter(pk=pk).first()
+    if post is None:
+        return
+    # Original intocado; o crop salvo em image_crop_* só entra nas renditions.
+    # Erros sobem para o run_job (retry / 'failed'); uma falha já gravada para
+    # esta imagem e crop só se repete quando o job é pedido de novo (process_image_jobs).
+    refresh_variants(post, force=variants_failed(post))
+    # Se a imagem/crop mudou no meio do caminho, o status fica com o job novo.
+    current = Post.objects.filter(pk=pk)
+    if post.image:
+        current = current.filter(image=post.image.name)
+    current.update(image_status='ready' if not post.image or fallback_name(post.image_variants) else 'failed')
+
+
+def _fail_post(pk: int) -> None:
+    from .models import Post
+
+    post = Post.objects.filter(pk=pk).first()
+    if post is not None:
+        mark_variants_failed(post)
+
+
+# UserProfile.avatar
+
+def avatar_needs_processing(profile) -> bool:
+    return bool(profile.avatar and profile.avatar_crop_w and profile.avatar_crop_h)
+
+
+def _process_avatar(pk: int) -> None:
+    from .models import UserProfile
+
+    profile = UserProfile.objects.filter(pk=pk).first()
+    if profile is None:
+        return
+    if avatar_needs_processing(profile):
+        crop = (
+            int(profile.avatar_crop_x or 0),
+            int(profile.avatar_crop_y or 0),
+            int(profile.avatar_crop_w or 0),
+            int(profile.avatar_crop_h or 0),
+        )
+        clear = {'avatar_crop_x': None, 'avatar_crop_y': None, 'avatar_crop_w': None, 'avatar_crop_h': None}
+        new_name = _crop_to_file(profile.avatar, crop, AVATAR_SIZE)
+        if new_name is None:
+            UserProfile.objects.filter(pk=pk).update(**clear)
+        elif not _swap_file(UserProfile, pk, 'avatar', profile.avatar.name, new_name, clear):
+            return
+    UserProfile.objects.filter(pk=pk).update(avatar_status='ready')
+
+
+# Imagens do corpo (Post.content)
+
+def _process_inline_images(pk: int) -> None:
+    from .models import Post
+
+    post = Post.objects.filter(pk=pk).only('pk', 'content').first()
+    if post is None:
+        return
+    # Gera as renditions que o save não gerou e reescreve os <img> (inline_images).
+    content, _ = rewrite_content_images(post.content)
+    if content != post.content:
+        # Só se ninguém editou no meio; o save novo agenda o próprio job.
+        if not Post.objects.filter(pk=pk, content=post.content).update(content=content):
+            return
+    # inline_variants engole o erro de cada imagem: confere pelo modo do save se ficou alguma para trás.
+    if rewrite_content_images(content, create=False)[1]:
+        raise RuntimeError(f"Post #{pk}: imagens do corpo sem renditions")
+    Post.objects.filter(pk=pk).update(content_images_status='ready')
+
+
+# kind: (processa, ao falhar de vez, model, campo de status ou None)
+_JOBS = {
+    'post': (_process_post, _fail_post, 'Post', 'image_status'),
+    'avatar': (_process_avatar, None, 'UserProfile', 'avatar_status'),
+    'inline': (_process_inline_images, None, 'Post', 'content_images_status'),
+}
+
+
+def run_job(kind: str, pk: int) -> bool:
+    """Roda o job com retries. Retorna True se terminou (ready), False se ficou 'failed'."""
+    from django.apps import apps
+
+    # Sai da fila ao começar: um save durante o job agenda outro (que verá o estado novo).
+    with _queued_lock:
+        _queued.discard((kind, pk))
+    process, on_failed, model_name, status_field = _JOBS[kind]
+    model = apps.get_model('blog', model_name)
+
+    def fail() -> bool:
+        if on_failed is not None:
+            on_failed(pk)
+        if status_field:
+            model.objects.filter(pk=pk).update(**{status_field: 'failed'})
+        return False
+
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        try:
+            process(pk)
+        except ImageTooLarge:
+            # Acima do orçamento de pixels: repetir não muda nada.
+            return fail()
+        except Exception:
+            if attempt == MAX_ATTEMPTS:
+                return fail()
+            time.sleep(RETRY_BACKOFF_SECONDS * attempt)
+        else:
+            return not status_field or not model.objects.filter(pk=pk, **{status_field: 'failed'}).exists()
+    return False
+
+
+def enqueue(kind: str, pk: int) -> None:
+    """Agenda o job depois do commit (um por objeto na fila do processo)."""
+    def submit():
+        if _run_inline():
+            run_job(kind, pk)
+            return
+        with _queued_lock:
+            if (kind, pk) in _queued:
+                return
+            _queued.add((kind, pk))
+        _executor.submit(run_job, kind, pk)
+
+    transaction.on_commit(submit)
+
+
+def schedule_post(post) -> None:
+    if not post_needs_processing(post):
+        return
+    type(post).objects.filter(pk=post.pk).update(image_status='processing')
+    post.image_status = 'processing'
+    enqueue('post', post.pk)
+
+
+def schedule_inline_images(post, *, pending: bool) -> None:
+    """Renditions que faltaram no save (imagens do corpo) saem em background."""
+    status = 'processing' if pending else 'ready'
+    if post.content_images_status != status:
+        type(post).objects.filter(pk=post.pk).update(content_images_status=status)
+        post.content_images_status = status
+    if pending:
+        enqueue('inline', post.pk)
+
+
+def schedule_avatar(profile) -> None:
+    if not avatar_needs_processing(profile):
+        return
+    type(profile).objects.filter(pk=profile.pk).update(avatar_status='processing')
+    profile.avatar_status = 'processing'
+    enqueue('avatar', profile.pk)
@@ -0,0 +1,223 @@
+"""Imagens inseridas no corpo do post pelo CKEditor (ckeditor_uploader).
+
+O upload vai para CKEDITOR_UPLOAD_PATH como veio (muitas vezes um PNG de
+vários MB), e o <img> que o editor grava não tem dimensões nem srcset. Aqui:
+
+- `OptimizingBackend` (CKEDITOR_IMAGE_BACKEND) grava o original como o backend
+  Pillow do ckeditor_uploader e, logo em seguida, gera as renditions
+  WebP/JPEG do arquivo com o mesmo `post_images.build_variants` das capas
+  (posts/renditions, chaveadas pelo sha do conteúdo); a miniatura do navegador
+  de arquivos também sai pelo decode com orçamento de memória (image_ingest);
+- `rewrite_content_images` roda no save do Post e reescreve cada <img> do
+  MEDIA com width/height (do cabeçalho do original), srcset/sizes (JPEGs das
+  renditions), loading="lazy" e decoding="async". O src continua apontando
+  para o original, então o editor segue abrindo o mesmo arquivo e reaplicar a
+  transformação não muda nada;
+- no save só entram as renditions que já existem (nada de decode no request do
+  admin); se faltar alguma (post antigo, upload de antes desta versão), o
+  image_jobs gera em background e reescreve o HTML, e `manage.py
+  optimize_inline_images` faz o mesmo para o acervo. Nome legado (sem o hash
+  do conteúdo no nome) também vai para o job: achar o sha dele exigiria ler o
+  arquivo inteiro no request.
+
+Falha em qualquer etapa nunca impede o upload nem o save: o <img> fica como
+o editor gravou.
+"""
+from __future__ import annotations
+
+import html
+import io
+import os
+import re
+from dataclasses import dataclass
+from typing import Any
+from urllib.parse import unquote
+
+from ckeditor_uploader import utils
+from ckeditor_uploader.backends import PillowBackend
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.utils.html import escape
+from PIL import Image
+
+from .image_ingest import ImageTooLarge, decoded
+from .media_storage import content_hash, media_names_in_html
+from .post_images import RENDITIONS_DIR, VARIANT_FORMATS, build_variants, srcset
+
+
+# Coluna do artigo (max-w-3xl no post_detail): acima disso a imagem não cresce.
+INLINE_SIZES = '(max-width: 768px) 100vw, 768px'
+
+# Formatos que viram renditions; GIF (animação) e SVG ficam como estão.
+_OPTIMIZABLE = ('.jpg', '.jpeg', '.png', '.webp')
+
+_IMG_TAG_RE = re.compile(r'<img\b(?P<attrs>[^>]*?)\s*(?P<close>/?)>', re.IGNORECASE)
+_ATTR_RE = re.compile(r'''([^\s=/>"']+)(?:\s*=\s*("[^"]*"|'[^']*'|[^\s"'=<>`]+))?''')
+
+
+@dataclass
+class _StoredImage:
+    """O mínimo de um FieldFile que o build_variants usa (name, storage, path)."""
+
+    name: str
+    storage: Any
+
+    @property
+    def path(self) -> str:
+        return self.storage.path(self.name)
+
+
+def _optimizable(name: str) -> bool:
+    return (
+        bool(name)
+        and not name.startswith(f"{RENDITIONS_DIR}/")
+        and os.path.splitext(name)[1].lower() in _OPTIMIZABLE
+    )
+
+
+def inline_variants(name: str, storage=None, *, create: bool = True) -> dict[str, Any] | None:
+    """Renditions (sem crop) de um arquivo do MEDIA. None se não der.
+
+    Com create=True gera as que faltam; com create=False só lê (ver build_variants).
+    """
+    storage = storage or default_storage
+    if not _optimizable(name):
+        return None
+    try:
+        if not storage.exists(name):
+            return None
+        return build_variants(_StoredImage(name, storage), None, create=create) or None
+    except Exception:
+        return None
+
+
+class OptimizingBackend(PillowBackend):
+    """Backend de upload do CKEditor: original + miniatura como antes, e as renditions na hora."""
+
+    def save_as(self, filepath):
+        saved_path = super().save_as(filepath)
+        if self.is_image:
+            inline_variants(saved_path, self.storage_engine)
+        return saved_path
+
+    def create_thumbnail(self, file_object, file_path):
+        # Mesma miniatura do PillowBackend, mas sem decodificar o original inteiro.
+        size = getattr(settings, 'CKEDITOR_THUMBNAIL_SIZE', (75, 75))
+        try:
+            with self.storage_engine.open(file_path, 'rb') as f:
+                with decoded(f, size, label=file_path) as (region, _report):
+                    image = region.convert('RGB')
+                    image.thumbnail(size, Image.Resampling.LANCZOS)
+        except (ImageTooLarge, OSError):
+            return None
+        thumbnail_io = io.BytesIO()
+        image.save(thumbnail_io, format='JPEG', optimize=True)
+        return self.storage_engine.save(utils.get_thumb_filename(file_path), thumbnail_io)
+
+
+def renditions_in_html(content: str) -> set[str]:
+    """Renditions citadas no srcset do HTML, mais as irmãs nos outros formatos (para o prune não apagar)."""
+    names: set[str] = set()
+    for name in media_names_in_html(content):
+        if name.startswith(f"{RENDITIONS_DIR}/"):
+            stem = os.path.splitext(name)[0]
+            names |= {f"{stem}.{ext}" for _, _, ext, _ in VARIANT_FORMATS}
+    return names
+
+
+# Reescrita do HTML
+
+def _parse_attrs(raw: str) -> list[list[str | None]]:
+    # [nome original, valor cru (com aspas) ou None]; mantém ordem e o que não for mexido.
+    return [[m.group(1), m.group(2)] for m in _ATTR_RE.finditer(raw)]
+
+
+def _attr_value(raw: str | None) -> str:
+    if raw is None:
+        return ''
+    if raw[:1] in ('"', "'"):
+        raw = raw[1:-1]
+    return html.unescape(raw)
+
+
+def _media_name(src: str) -> str | None:
+    media_url = settings.MEDIA_URL
+    if not src.startswith(media_url):
+        return None
+    return unquote(re.split(r'[?#]', src[len(media_url):], maxsplit=1)[0])
+
+
+def _same_aspect(width: str, height: str, variants: dict) -> bool:
+    # Dimensões que o autor ajustou mantendo a proporção ficam; as de outra imagem, não.
+    try:
+        w, h = int(width), int(height)
+    except ValueError:
+        return False
+    vw, vh = int(variants.get('width') or 0), int(variants.get('height') or 0)
+    return w > 0 and h > 0 and vw > 0 and vh > 0 and abs(w / h - vw / vh) <= 0.02 * (vw / vh)
+
+
+def _rewrite_img(match: re.Match, variants_for) -> str:
+    attrs = _parse_attrs(match.group('attrs'))
+    index = {name.lower(): i for i, (name, _) in enumerate(attrs)}
+
+    def get(name: str) -> str | None:
+        i = index.get(name)
+        return None if i is None else _attr_value(attrs[i][1])
+
+    def put(name: str, value, *, keep: bool = False) -> None:
+        quoted = f'"{escape(str(value))}"'
+        i = index.get(name)
+        if i is None:
+            index[name] = len(attrs)
+            attrs.append([name, quoted])
+        elif not keep:
+            attrs[i][1] = quoted
+
+    name = _media_name(get('src') or '')
+    variants = variants_for(name, bool(get('srcset'))) if name else None
+    if variants:
+        width, height = get('width'), get('height')
+        if not (width and height and _same_aspect(width, height, variants)):
+            put('width', variants['width'])
+            put('height', variants['height'])
+        # srcset só com todas as larguras; até o job terminar, o navegador usa o src.
+        if variants.get('jpeg') and not variants.get('partial'):
+            put('srcset', srcset(variants, 'jpeg', default_storage.url))
+            put('sizes', INLINE_SIZES, keep=True)
+    put('loading', 'lazy', keep=True)
+    put('decoding', 'async', keep=True)
+
+    parts = ''.join(f' {n}' if v is None else f' {n}={v}' for n, v in attrs)
+    return f"<img{parts}{' /' if match.group('close') else ''}>"
+
+
+def rewrite_content_images(content: str, *, create: bool = True) -> tuple[str, bool]:
+    """Reescreve os <img> do HTML com dimensões, srcset, lazy e async. Idempotente.
+
+    Devolve (html, faltam renditions). Com create=False não gera nada nem lê
+    original legado inteiro, só usa o que já existe (é o modo do save do Post).
+    """
+    if not content or '<img' not in content.lower():
+        return content, False
+
+    cache: dict[str, dict | None] = {}
+    pending = False
+
+    def variants_for(name: str, rewritten: bool) -> dict | None:
+        nonlocal pending
+        if not create and not content_hash(name):
+            # Legado: fica como está se já foi reescrito (job/backfill); senão, vai para o job.
+            pending = pending or (not rewritten and _optimizable(name))
+            return None
+        if name not in cache:
+            cache[name] = inline_variants(name, create=create)
+            pending = pending or bool(cache[name] and cache[name].get('partial'))
+        return cache[name]
+
+    return _IMG_TAG_RE.sub(lambda m: _rewrite_img(m, variants_for), content), pending
+
+
+def optimize_content_images(content: str) -> str:
+    """rewrite_content_images gerando o que faltar (job em background e backfill)."""
+    return rewrite_content_images(content)[0]
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from blog.consultas_dayfacts import dataset_items, index_days, index_path, merge_items, save_index
+from blog.consultas_upstream import load_wikipedia_onthisday
+
+
+class Command(BaseCommand):
+    help = (
+        "Gera o índice de curiosidades do dia (366 dias): dataset interno + Wikipedia (pt) 'on this day', "
+        "com os resumos já montados. /api/consultas/dayfacts/today/ passa a ser só um lookup nesse arquivo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            type=str,
+            default='',
+            help='Caminho do arquivo (padrão: settings.OXIRA_DAYFACTS_INDEX).',
+        )
+        parser.add_argument(
+            '--year',
+            type=int,
+            default=0,
+            help='Ano usado como semente dos resumos (padrão: ano atual).',
+        )
+        parser.add_argument(
+            '--no-wikipedia',
+            action='store_true',
+            help='Só o dataset interno (sem rede).',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=0.5,
+            help='Pausa (segundos) entre dias, para não martelar a Wikipedia (padrão 0.5).',
+        )
+
+    def handle(self, *args, **options):
+        output: str = (options['output'] or '').strip() or index_path()
+        year: int = int(options['year'] or timezone.localdate().year)
+        use_wikipedia: bool = not bool(options['no_wikipedia'])
+        sleep_s: float = max(0.0, float(options['sleep'] or 0.0))
+
+        days: dict[str, list[dict]] = {}
+        failed = 0
+        total_items = 0
+
+        for key, date_obj in index_days(year):
+            wiki: list[dict] = []
+            if use_wikipedia:
+                try:
+                    wiki = load_wikipedia_onthisday(date_obj)
+                except Exception as e:
+                    # Dia fica fora do índice: em runtime sai o dataset + cache da Wikipedia,
+                    # que o prefetcher (ou o primeiro request, em background) aquece.
+                    failed += 1
+                    self.stdout.write(self.style.WARNING(f"{key}: Wikipedia falhou ({type(e).__name__}: {e})"))
+                    continue
+                finally:
+                    if sleep_s:
+                        time.sleep(sleep_s)
+
+            items = merge_items(dataset_items(date_obj), wiki)
+            days[key] = items
+            total_items += len(items)
+
+        path = save_index(days, year=year, path=output)
+        msg = f"Índice salvo em {path}: {len(days)} dia(s), {total_items} item(ns)."
+        if failed:
+            msg += f" Wikipedia falhou em {failed} dia(s) (fora do índice; rode de novo para completar)."
+        self.stdout.write(self.style.SUCCESS(msg))
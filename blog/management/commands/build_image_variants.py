@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from blog.image_ingest import ImageTooLarge, describe, recent_reports
+from blog.inline_images import renditions_in_html
+from blog.models import Post
+from blog.post_images import (
+    RENDITIONS_DIR,
+    mark_variants_failed,
+    referenced_names,
+    refresh_variants,
+    variants_current,
+    variants_failed,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Gera as renditions (original + crop, larguras x WebP/JPEG) das imagens destacadas que ainda não têm "
+        "ou estão desatualizadas. Posts novos já geram em background; isto é para o acervo existente."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Regera mesmo quando as variantes já estão em dia (ou quando a última tentativa falhou).',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Não gera nada; só mostra o que seria processado.',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=0,
+            help='Limita a quantidade de posts processados (0 = sem limite).',
+        )
+        parser.add_argument(
+            '--prune',
+            action='store_true',
+            help='No fim, apaga renditions que nenhum post usa (nem como capa, nem no srcset do corpo).',
+        )
+
+    def handle(self, *args, **options):
+        force: bool = bool(options['force'])
+        dry_run: bool = bool(options['dry_run'])
+        limit: int = int(options['limit'] or 0)
+        prune: bool = bool(options['prune'])
+
+        qs = Post.objects.exclude(image__isnull=True).exclude(image='').order_by('-published_date')
+        pending = [post for post in qs.iterator() if force or not variants_current(post)]
+        if limit > 0:
+            pending = pending[:limit]
+
+        if not pending:
+            self.stdout.write(self.style.SUCCESS('Todas as imagens já têm variantes.'))
+            if prune:
+                self._prune(dry_run)
+            return
+
+        done = failed = 0
+        for post in pending:
+            self.stdout.write(f"VARIANTES: {post.slug or post.pk} -> {post.image.name}")
+            if dry_run:
+                continue
+            started = time.monotonic()
+            try:
+                refresh_variants(post, force=True)
+            except ImageTooLarge as exc:
+                mark_variants_failed(post)
+                self.stdout.write(self.style.WARNING(f"  {exc}"))
+            except Exception as exc:
+                mark_variants_failed(post)
+                self.stdout.write(self.style.WARNING(f"  falhou (arquivo ausente ou ilegível): {post.image.name} ({exc})"))
+            for report in recent_reports(since=started):
+                self.stdout.write(f"  {describe(report)}")
+            if variants_failed(post):
+                failed += 1
+            else:
+                done += 1
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING(f"Dry-run: {len(pending)} post(s) seriam processados."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Concluído: {done} post(s) com variantes, {failed} falha(s)."))
+
+        if prune:
+            self._prune(dry_run)
+
+    def _prune(self, dry_run: bool):
+        storage = Post._meta.get_field('image').storage
+        used: set[str] = set()
+        for variants, content in Post.objects.values_list('image_variants', 'content'):
+            used |= referenced_names(variants)
+            # srcset das imagens do corpo (blog/inline_images.py).
+            used |= renditions_in_html(content)
+
+        # posts/variants/ é o layout anterior (variantes por nome de arquivo, sem crop no nome).
+        removed = 0
+        for root in (RENDITIONS_DIR, 'posts/variants'):
+            for name in self._walk(storage, root):
+                if name in used:
+                    continue
+                removed += 1
+                if not dry_run:
+                    storage.delete(name)
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING(f"Dry-run: {removed} rendition(s) sem uso seriam apagadas."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Prune: {removed} rendition(s) sem uso apagadas."))
+
+    def _walk(self, storage, root: str):
+        try:
+            dirs, files = storage.listdir(root)
+        except (FileNotFoundError, NotImplementedError):
+            return
+        for f in files:
+            yield f"{root}/{f}"
+        for d in dirs:
+            yield from self._walk(storage, f"{root}/{d}")
@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from blog.consultas_stub import StubConfig, make_server
+
+
+class Command(BaseCommand):
+    help = (
+        "Sobe um stub local dos upstreams de /consultas/ (Frankfurter, CoinGecko, Nager, Wikipedia), "
+        "com latência, erros, 429 e travamentos configuráveis. Rode o site com "
+        "OXIRA_CONSULTAS_UPSTREAM_STUB=http://HOST:PORTA e use `loadtest_consultas` para gerar carga."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', type=str, default='127.0.0.1', help='Endereço (padrão 127.0.0.1).')
+        parser.add_argument('--port', type=int, default=8765, help='Porta (padrão 8765).')
+        parser.add_argument('--latency-ms', type=float, default=50.0, help='Latência média por resposta (padrão 50).')
+        parser.add_argument('--jitter-ms', type=float, default=20.0, help='Variação da latência, ± (padrão 20).')
+        parser.add_argument('--error-rate', type=float, default=0.0, help='Fração de respostas 502 (0..1).')
+        parser.add_argument('--rate-429', type=float, default=0.0, help='Fração de respostas 429 com Retry-After (0..1).')
+        parser.add_argument(
+            '--hang-rate',
+            type=float,
+            default=0.0,
+            help='Fração de requests que travam por 30s (testa os timeouts do cliente; 0..1).',
+        )
+        parser.add_argument('--retry-after', type=int, default=5, help='Retry-After dos 429 (padrão 5).')
+        parser.add_argument('--seed', type=int, default=None, help='Semente do sorteio de erros (rodadas reproduzíveis).')
+
+    def handle(self, *args, **options):
+        config = StubConfig(
+            latency_ms=max(0.0, float(options['latency_ms'])),
+            jitter_ms=max(0.0, float(options['jitter_ms'])),
+            error_rate=min(1.0, max(0.0, float(options['error_rate']))),
+            rate_429=min(1.0, max(0.0, float(options['rate_429']))),
+            hang_rate=min(1.0, max(0.0, float(options['hang_rate']))),
+            retry_after=max(1, int(options['retry_after'])),
+        )
+        server, stats = make_server(options['host'], int(options['port']), config, seed=options['seed'])
+        host, port = server.server_address[:2]
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Stub em http://{host}:{port} (latência {config.latency_ms:.0f}±{config.jitter_ms:.0f}ms, "
+                f"502 {config.error_rate:.0%}, 429 {config.rate_429:.0%}, trava {config.hang_rate:.0%}). Ctrl+C para sair."
+            )
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+        summary = stats.as_dict()
+        self.stdout.write(f"Chamadas por provedor: {summary['calls']} (total {summary['total']}).")
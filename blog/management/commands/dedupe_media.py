@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from blog.media_storage import (
+    ContentAddressedStorage,
+    is_addressed,
+    media_names_in_html,
+    referenced_names,
+    release,
+)
+from blog.models import Post, UserProfile
+from blog.post_images import mark_variants_failed, refresh_variants
+
+
+class Command(BaseCommand):
+    help = (
+        "Move o acervo antigo (posts/, avatars/, uploads/ com nome de arquivo) para o storage por conteúdo: "
+        "cópias iguais viram um arquivo só e Post.image, UserProfile.avatar e o HTML dos posts passam a "
+        "apontar para o nome novo. Com --prune, apaga arquivos endereçados que nada mais usa."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Não move nem apaga nada; só mostra o que seria feito.',
+        )
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Mantém os arquivos antigos depois de migrar (por padrão, apaga os que ficaram sem uso).',
+        )
+        parser.add_argument(
+            '--prune',
+            action='store_true',
+            help='No fim, apaga arquivos endereçados sem nenhuma referência.',
+        )
+        parser.add_argument(
+            '--min-age',
+            type=float,
+            default=24.0,
+            help='Horas mínimas de vida para o --prune apagar (protege uploads de posts ainda não salvos; padrão 24).',
+        )
+
+    def handle(self, *args, **options):
+        dry_run: bool = bool(options['dry_run'])
+        keep: bool = bool(options['keep'])
+        prune: bool = bool(options['prune'])
+        min_age: float = float(options['min_age'] or 0.0)
+
+        storage = Post._meta.get_field('image').storage
+        if not isinstance(storage, ContentAddressedStorage):
+            raise CommandError('O default storage não é o ContentAddressedStorage (OXIRA_MEDIA_CONTENT_ADDRESSED=0?).')
+
+        legacy = self._legacy_names(storage)
+        if not legacy:
+            self.stdout.write(self.style.SUCCESS('Nenhum arquivo antigo para migrar.'))
+        else:
+            self._migrate(storage, legacy, dry_run=dry_run, keep=keep)
+
+        if prune:
+            self._prune(storage, dry_run=dry_run, min_age=min_age)
+
+    def _legacy_names(self, storage) -> list[str]:
+        names: set[str] = set()
+        names |= set(Post.objects.exclude(image='').exclude(image__isnull=True).values_list('image', flat=True))
+        names |= set(UserProfile.objects.exclude(avatar='').exclude(avatar__isnull=True).values_list('avatar', flat=True))
+        for content in Post.objects.filter(content__contains=settings.MEDIA_URL).values_list('content', flat=True).iterator():
+            names |= media_names_in_html(content)
+        return sorted(n for n in names if n and not is_addressed(n) and storage.exists(n))
+
+    def _migrate(self, storage, legacy: list[str], *, dry_run: bool, keep: bool):
+        mapping: dict[str, str] = {}
+        saved_bytes = 0
+        for old in legacy:
+            if dry_run:
+                self.stdout.write(f"MIGRAR: {old}")
+                continue
+            with storage.open(old, 'rb') as f:
+                new = storage.save(old, f)
+            if new in mapping.values():
+                saved_bytes += storage.size(new)
+            mapping[old] = new
+            self.stdout.write(f"MIGRADO: {old} -> {new}")
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING(f"Dry-run: {len(legacy)} arquivo(s) seriam migrados."))
+            return
+
+        for old, new in mapping.items():
+            Post.objects.filter(image=old).update(image=new)
+            UserProfile.objects.filter(avatar=old).update(avatar=new)
+
+        rewritten = 0
+        for post in Post.objects.filter(content__contains=settings.MEDIA_URL).only('pk', 'content').iterator():
+            content = post.content
+            for name in media_names_in_html(content) & mapping.keys():
+                content = content.replace(f"{settings.MEDIA_URL}{name}", f"{settings.MEDIA_URL}{mapping[name]}")
+            if content != post.content:
+                Post.objects.filter(pk=post.pk).update(content=content)
+                rewritten += 1
+
+        # Renditions são chaveadas pelo hash do conteúdo: só atualiza o src, sem reencode.
+        for post in Post.objects.filter(image__in=set(mapping.values())).iterator():
+            try:
+                refresh_variants(post)
+            except Exception as exc:
+                mark_variants_failed(post)
+                self.stdout.write(self.style.WARNING(f"VARIANTES: {post.slug or post.pk} falhou ({exc})"))
+
+        removed = 0
+        if not keep:
+            for old in mapping:
+                if release(storage, old):
+                    removed += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Concluído: {len(mapping)} arquivo(s) migrado(s) em {len(set(mapping.values()))} único(s), "
+            f"{rewritten} post(s) com HTML reescrito, {removed} antigo(s) apagado(s), "
+            f"{saved_bytes / (1024 * 1024):.1f} MB de duplicatas."
+        ))
+
+    def _prune(self, storage, *, dry_run: bool, min_age: float):
+        used = referenced_names()
+        cutoff = time.time() - min_age * 3600
+        removed = 0
+        for name in self._walk_addressed(storage):
+            if name in used:
+                continue
+            try:
+                if os.path.getmtime(storage.path(name)) > cutoff:
+                    continue
+            except OSError:
+                continue
+            removed += 1
+            if not dry_run:
+                storage.delete(name)
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING(f"Dry-run: {removed} arquivo(s) sem uso seriam apagados."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Prune: {removed} arquivo(s) sem uso apagados."))
+
+    def _walk_addressed(self, storage):
+        try:
+            folders, _ = storage.listdir('')
+        except FileNotFoundError:
+            return
+        for folder in folders:
+            try:
+                shards, _ = storage.listdir(folder)
+            except FileNotFoundError:
+                continue
+            for shard in shards:
+                if len(shard) != 2:
+                    continue
+                _, files = storage.listdir(f"{folder}/{shard}")
+                for f in files:
+                    name = f"{folder}/{shard}/{f}"
+                    if is_addressed(name) and not f.endswith('.tmp'):
+                        yield name
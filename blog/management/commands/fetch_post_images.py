@@ -1,15 +1,22 @@
 from __future__ import annotations
 
+import hashlib
 import io
+import json
+import os
 import re
+import threading
 import time
 import urllib.parse
-from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import asdict, dataclass
 
+from django.conf import settings
 from django.core.files.base import ContentFile
 from django.core.management.base import BaseCommand
 from django.db.models import Q
 
+from blog import http_client
 from blog.models import Post
 
 
@@ -51,69 +58,107 @@ CATEGORY_HINTS: list[tuple[str, list[str]]] = [
 ]
 
 
-def _http_get_json(url: str, timeout: float = 10.0) -> dict:
-    from urllib.request import Request, urlopen
+_USER_AGENT = 'Oxira/1.0 (dev; fetch_post_images)'
 
-    req = Request(
-        url,
-        headers={
-            'User-Agent': 'Oxira/1.0 (dev; fetch_post_images)',
-            'Accept': 'application/json',
-        },
-    )
-    with urlopen(req, timeout=timeout) as resp:
-        raw = resp.read().decode('utf-8')
-    import json
+# Quanto uma busca espera outra thread buscar a mesma key (que pode estar parada num 429).
+SEARCH_LOCK_WAIT_SECONDS = 15.0
 
-    return json.loads(raw)
 
+def _http_get(url: str, headers: dict[str, str] | None = None, timeout: float = 10.0) -> http_client.HttpResponse:
+    send_headers = {'User-Agent': _USER_AGENT, 'Accept': 'application/json'}
+    send_headers.update(headers or {})
+    return http_client.default_client.get(url, headers=send_headers, read_timeout=timeout)
 
-def _download_bytes(url: str, timeout: float = 20.0) -> bytes:
-    from urllib.request import Request, urlopen
 
-    req = Request(
+def _download_bytes(url: str, timeout: float = 20.0) -> bytes:
+    return http_client.get_bytes(
         url,
         headers={
-            'User-Agent': 'Oxira/1.0 (dev; fetch_post_images)',
+            'User-Agent': _USER_AGENT,
             'Accept': 'image/*,*/*;q=0.8',
         },
+        read_timeout=timeout,
+        max_bytes=25 * 1024 * 1024,
     )
-    with urlopen(req, timeout=timeout) as resp:
-        return resp.read()
 
 
-def _sleep(seconds: float):
+class _TokenBucket:
+    """Limite de taxa por host: `rate` req/s em média, com rajada de até `burst`.
+
+    Thread-safe. Um 429 pausa o host inteiro (todas as threads) pelo Retry-After,
+    em vez de cada thread dormir por conta própria.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = max(0.01, float(rate))
+        self.burst = max(1, int(burst))
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if now >= self._paused_until and self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                wait = max(self._paused_until - now, (1.0 - self._tokens) / self.rate)
+            time.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + max(0.0, seconds))
+            self._tokens = 0.0
+
+
+class _Limiter:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._buckets: dict[str, _TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, url: str) -> _TokenBucket:
+        host = urllib.parse.urlsplit(url).hostname or ''
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = self._buckets[host] = _TokenBucket(self.rate, self.burst)
+            return bucket
+
+
+def _retry_after(e) -> float | None:
     try:
-        time.sleep(max(0.0, float(seconds)))
+        value = e.headers.get('Retry-After')
     except Exception:
-        pass
+        return None
+    return float(value) if value and str(value).isdigit() else None
 
 
-def _with_retries(fn, *, tries: int, base_sleep: float, what: str):
+def _with_retries(fn, *, url: str, limiter: _Limiter, tries: int, base_sleep: float, what: str):
+    """Chama `fn` respeitando o limite do host de `url`; 429 pausa o host, outros erros fazem backoff na thread."""
     from urllib.error import HTTPError
 
+    bucket = limiter.bucket(url)
     last_exc: Exception | None = None
     for attempt in range(1, tries + 1):
+        bucket.acquire()
         try:
             return fn()
         except HTTPError as e:
             last_exc = e
-            status = getattr(e, 'code', None)
-            if status == 429 and attempt < tries:
-                retry_after = None
-                try:
-                    retry_after = e.headers.get('Retry-After')
-                except Exception:
-                    retry_after = None
-
-                wait = float(retry_after) if retry_after and str(retry_after).isdigit() else (base_sleep * (2 ** (attempt - 1)))
-                _sleep(wait)
+            if getattr(e, 'code', None) == 429 and attempt < tries:
+                bucket.pause(_retry_after(e) or base_sleep * (2 ** (attempt - 1)))
                 continue
             raise
         except Exception as e:
             last_exc = e
             if attempt < tries:
-                _sleep(base_sleep * (2 ** (attempt - 1)))
+                time.sleep(base_sleep * (2 ** (attempt - 1)))
                 continue
             raise
     if last_exc:
@@ -210,23 +255,62 @@ def _parse_extmetadata(meta: dict) -> tuple[str | None, str | None, bool]:
     return license_short, artist, attribution_required
 
 
-def _search_commons_images(query: str, width: int) -> list[CommonsImage]:
-    # Busca no namespace 6 (File:) do Wikimedia Commons.
-    params = {
-        'action': 'query',
-        'format': 'json',
-        'generator': 'search',
-        'gsrnamespace': '6',
-        'gsrsearch': query,
-        'gsrlimit': '8',
-        'prop': 'imageinfo',
-        'iiprop': 'url|extmetadata',
-        'iiurlwidth': str(width),
-        'redirects': '1',
-    }
-    url = 'https://commons.wikimedia.org/w/api.php?' + urllib.parse.urlencode(params)
-    data = _with_retries(lambda: _http_get_json(url), tries=3, base_sleep=2.0, what='commons search')
+class _SearchCache:
+    """Cache em disco das buscas no Commons, por (query, largura).
+
+    Um JSON por key, gravado de forma atômica; sobrevive entre rodadas e é
+    compartilhado entre posts com a mesma dica ("football match", "politics").
+    Dentro do TTL não há chamada nenhuma. Vencido, revalida com
+    If-None-Match/If-Modified-Since quando o Commons mandou ETag/Last-Modified
+    (304 só renova o prazo). Buscas simultâneas da mesma key viram uma só.
+    """
+
+    def __init__(self, directory: str, ttl_seconds: float):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self.stats = {'hit': 0, 'revalidated': 0, 'miss': 0}
+        self._locks: dict[str, threading.Lock] = {}
+        self._guard = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    @staticmethod
+    def key(query: str, width: int) -> str:
+        return hashlib.sha1(f"{query.strip().lower()}|{width}".encode('utf-8')).hexdigest()
+
+    def lock(self, key: str) -> threading.Lock:
+        with self._guard:
+            lock = self._locks.get(key)
+            if lock is None:
+                lock = self._locks[key] = threading.Lock()
+            return lock
 
+    def count(self, what: str) -> None:
+        with self._guard:
+            self.stats[what] += 1
+
+    def get(self, key: str) -> dict | None:
+        try:
+            with open(self._path(key), encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return entry if isinstance(entry, dict) and isinstance(entry.get('images'), list) else None
+
+    def fresh(self, entry: dict) -> bool:
+        return time.time() - float(entry.get('fetched_at') or 0) < self.ttl_seconds
+
+    def put(self, key: str, entry: dict) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+
+def _parse_commons_pages(data: dict) -> list[CommonsImage]:
     pages = (data.get('query') or {}).get('pages')
     if not isinstance(pages, dict):
         return []
@@ -268,28 +352,108 @@ def _search_commons_images(query: str, width: int) -> list[CommonsImage]:
     return out
 
 
+def _commons_json(resp: http_client.HttpResponse) -> dict | None:
+    if resp.status != 200:
+        return None
+    try:
+        data = resp.json()
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def _search_commons_images(query: str, width: int, limiter: _Limiter, cache: _SearchCache | None = None) -> list[CommonsImage]:
+    # Busca no namespace 6 (File:) do Wikimedia Commons.
+    params = {
+        'action': 'query',
+        'format': 'json',
+        'generator': 'search',
+        'gsrnamespace': '6',
+        'gsrsearch': query,
+        'gsrlimit': '8',
+        'prop': 'imageinfo',
+        'iiprop': 'url|extmetadata',
+        'iiurlwidth': str(width),
+        'redirects': '1',
+    }
+    url = 'https://commons.wikimedia.org/w/api.php?' + urllib.parse.urlencode(params)
+    if cache is None:
+        resp = _with_retries(lambda: _http_get(url), url=url, limiter=limiter, tries=3, base_sleep=2.0, what='commons search')
+        return _parse_commons_pages(_commons_json(resp) or {})
+
+    key = cache.key(query, width)
+    lock = cache.lock(key)
+    # Espera quem já busca a mesma key, mas não atrás de um 429 longo: passado o prazo, segue sozinho.
+    locked = lock.acquire(timeout=SEARCH_LOCK_WAIT_SECONDS)
+    try:
+        entry = cache.get(key)
+        if entry is not None and (not locked or cache.fresh(entry)):
+            # Sem o lock, vencido serve: a outra thread já está revalidando.
+            cache.count('hit')
+            return [CommonsImage(**img) for img in entry['images']]
+
+        conditional: dict[str, str] = {}
+        if entry is not None and entry.get('etag'):
+            conditional['If-None-Match'] = entry['etag']
+        if entry is not None and entry.get('last_modified'):
+            conditional['If-Modified-Since'] = entry['last_modified']
+        resp = _with_retries(
+            lambda: _http_get(url, conditional),
+            url=url,
+            limiter=limiter,
+            tries=3,
+            base_sleep=2.0,
+            what='commons search',
+        )
+
+        if resp.status == 304 and entry is not None:
+            cache.count('revalidated')
+            images = [CommonsImage(**img) for img in entry['images']]
+        else:
+            cache.count('miss')
+            data = _commons_json(resp)
+            if data is None:
+                # 304 sem entrada ou corpo que não é JSON: fica com o que tinha, sem regravar.
+                return [CommonsImage(**img) for img in entry['images']] if entry is not None else []
+            images = _parse_commons_pages(data)
+        cache.put(key, {
+            'query': query,
+            'width': width,
+            'fetched_at': time.time(),
+            'etag': resp.headers.get('ETag') or (entry or {}).get('etag'),
+            'last_modified': resp.headers.get('Last-Modified') or (entry or {}).get('last_modified'),
+            'images': [asdict(img) for img in images],
+        })
+        return images
+    finally:
+        if locked:
+            lock.release()
+
+
 def _to_jpeg_bytes(image_bytes: bytes, max_w: int) -> bytes:
     from PIL import Image
 
-    with Image.open(io.BytesIO(image_bytes)) as img:
+    from blog.image_ingest import decoded
+
+    # Originais do Commons passam fácil de 40 MP: decode reduzido (draft/reduce) e limitado.
+    with decoded(io.BytesIO(image_bytes), (max_w, 1)) as (img, report):
         img = img.convert('RGB')
         w, h = img.size
         if w > max_w:
             new_h = int(h * (max_w / w))
             img = img.resize((max_w, new_h), Image.LANCZOS)
+        report.track(img)
 
         out = io.BytesIO()
         img.save(out, format='JPEG', quality=90, optimize=True)
         return out.getvalue()
 
 
-def _download_unsplash_bytes(query: str, *, width: int, height: int) -> tuple[bytes, str]:
+def _unsplash_url(query: str, *, width: int, height: int) -> str:
     # Endpoint público de preview (sem chave). Observação: não retorna metadados de autoria.
     # Para produção, ideal é usar API oficial e exibir créditos conforme termos.
     q = urllib.parse.quote(query.strip())
-    url = f"https://source.unsplash.com/{width}x{height}/?{q}"
-    raw = _download_bytes(url)
-    return raw, url
+    return f"https://source.unsplash.com/{width}x{height}/?{q}"
 
 
 def _append_credit(post: Post, credit_line: str) -> None:
@@ -302,10 +466,128 @@ def _append_credit(post: Post, credit_line: str) -> None:
         post.internal_notes = credit_line
 
 
+def _commons_credit(picked: CommonsImage) -> str:
+    credit_bits = [
+        'Wikimedia Commons',
+        f"file={picked.page_title}",
+    ]
+    if picked.description_url:
+        credit_bits.append(picked.description_url)
+    if picked.license_short:
+        credit_bits.append(f"license={picked.license_short}")
+    if picked.artist:
+        artist_clean = re.sub(r"\s+", " ", picked.artist).strip()
+        credit_bits.append(f"artist={artist_clean[:120]}")
+    return "Imagem: " + " | ".join(credit_bits)
+
+
+@dataclass
+class _Result:
+    slug: str
+    provider: str  # commons | unsplash | '' (nenhum tentado com sucesso)
+    status: str  # ok | none | error
+    query: str = ''
+    jpg: bytes = b''
+    credit: str = ''
+    error: str = ''
+
+
+def _fetch_one(
+    slug: str,
+    title: str,
+    queries: list[str],
+    *,
+    provider: str,
+    width: int,
+    limiter: _Limiter,
+    cache: _SearchCache | None,
+) -> _Result:
+    """Busca + download + conversão de um post (roda numa thread do pool; não toca no banco)."""
+    picked: CommonsImage | None = None
+    picked_query = ''
+    provider_used = 'commons' if provider in ('auto', 'commons') else 'unsplash'
+    try:
+        if provider in ('auto', 'commons'):
+            for q in queries:
+                results = _search_commons_images(q, width=width, limiter=limiter, cache=cache)
+                if results:
+                    picked = results[0]
+                    picked_query = q
+                    break
+
+        if provider == 'commons' and not picked:
+            return _Result(slug, 'commons', 'none')
+
+        # 1) Wikimedia Commons (preferencial)
+        if picked is not None:
+            raw = _with_retries(
+                lambda: _download_bytes(picked.thumb_url),
+                url=picked.thumb_url,
+                limiter=limiter,
+                tries=3,
+                base_sleep=2.0,
+                what='commons download',
+            )
+            return _Result(slug, 'commons', 'ok', picked_query, _to_jpeg_bytes(raw, max_w=width), _commons_credit(picked))
+
+        # 2) Fallback: Unsplash Source (preview)
+        provider_used = 'unsplash'
+        q = queries[0] if queries else (title or 'news')
+        src_url = _unsplash_url(q, width=width, height=int(width * 9 / 16))
+        raw_u = _with_retries(
+            lambda: _download_bytes(src_url),
+            url=src_url,
+            limiter=limiter,
+            tries=3,
+            base_sleep=2.0,
+            what='unsplash download',
+        )
+        credit = f"Imagem: Unsplash Source (preview) | query={q} | url={src_url}"
+        return _Result(slug, 'unsplash', 'ok', q, _to_jpeg_bytes(raw_u, max_w=width), credit)
+    except Exception as e:
+        return _Result(slug, provider_used, 'error', error=f"{type(e).__name__}: {e}")
+
+
+def _checkpoint_run(provider: str, width: int, replace: bool) -> str:
+    # Só vale pular o que uma rodada com os mesmos parâmetros concluiu: um 'none'
+    # do commons não diz nada sobre o unsplash, nem um 'ok' sem --replace sobre um --replace.
+    return f"{provider}|{width}|{'replace' if replace else 'missing'}"
+
+
+def _load_checkpoint(path: str, run: str) -> set[str]:
+    # Uma linha JSON por post concluído; linha truncada (processo morto no meio) é ignorada.
+    done: set[str] = set()
+    try:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    continue
+                if (
+                    isinstance(row, dict)
+                    and row.get('run') == run
+                    and row.get('status') in ('ok', 'none')
+                    and row.get('slug')
+                ):
+                    done.add(row['slug'])
+    except FileNotFoundError:
+        pass
+    return done
+
+
+def _format_eta(seconds: float) -> str:
+    seconds = int(max(0, seconds))
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    return f"{seconds // 60}m{seconds % 60:02d}s"
+
+
 class Command(BaseCommand):
     help = (
         "Baixa fotos relevantes do Wikimedia Commons (por título/categoria) e define como imagem destacada do post. "
-        "Salva uma linha de crédito/licença em internal_notes."
+        "Salva uma linha de crédito/licença em internal_notes. Busca/download rodam em paralelo, com limite de "
+        "taxa por host, e um checkpoint permite retomar de onde parou."
     )
 
     def add_arguments(self, parser):
@@ -330,7 +612,50 @@ class Command(BaseCommand):
             '--sleep',
             type=float,
             default=1.2,
-            help='Pausa (segundos) entre chamadas externas (padrão 1.2).',
+            help='Intervalo médio (segundos) entre chamadas ao mesmo host; vira o token bucket do host (padrão 1.2).',
+        )
+        parser.add_argument(
+            '--burst',
+            type=int,
+            default=2,
+            help='Chamadas seguidas permitidas por host antes do limite de taxa entrar (padrão 2).',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Threads de busca/download em paralelo (padrão 4).',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            type=str,
+            default=os.path.join(settings.BASE_DIR, 'var', 'fetch_post_images.checkpoint.jsonl'),
+            help=(
+                'Arquivo de checkpoint: slugs já concluídos por uma rodada interrompida (mesmo provider, largura e '
+                '--replace) são pulados na próxima. Some quando uma rodada termina sem erros.'
+            ),
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Ignora (e zera) o checkpoint, processando tudo de novo.',
+        )
+        parser.add_argument(
+            '--cache-dir',
+            type=str,
+            default=os.path.join(settings.BASE_DIR, 'var', 'commons_search_cache'),
+            help='Diretório do cache das buscas no Commons (por query + largura).',
+        )
+        parser.add_argument(
+            '--cache-ttl',
+            type=float,
+            default=168.0,
+            help='Horas em que uma busca em cache vale sem revalidar (padrão 168 = 7 dias).',
+        )
+        parser.add_argument(
+            '--no-cache',
+            action='store_true',
+            help='Não lê nem grava o cache de buscas (sempre consulta o Commons).',
         )
         parser.add_argument(
             '--slugs',
@@ -351,6 +676,13 @@ class Command(BaseCommand):
         limit: int = int(options['limit'] or 0)
         width: int = int(options['width'] or 1600)
         sleep_s: float = float(options['sleep'] or 0.0)
+        burst: int = int(options['burst'] or 1)
+        workers: int = max(1, int(options['workers'] or 1))
+        checkpoint: str = str(options['checkpoint'] or '')
+        restart: bool = bool(options['restart'])
+        cache_dir: str = str(options['cache_dir'] or '')
+        cache_ttl: float = float(options['cache_ttl'] or 0.0)
+        no_cache: bool = bool(options['no_cache'])
         slugs_raw: str = str(options['slugs'] or '').strip()
         slugs: list[str] = [s.strip() for s in slugs_raw.split(',') if s.strip()] if slugs_raw else []
         provider: str = str(options['provider'] or 'auto').strip().lower()
@@ -361,86 +693,108 @@ class Command(BaseCommand):
         if not replace:
             qs = qs.filter(Q(image__isnull=True) | Q(image=''))
 
-        posts = list(qs[:limit] if limit > 0 else qs)
+        if checkpoint and restart and os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        run = _checkpoint_run(provider, width, replace)
+        done = _load_checkpoint(checkpoint, run) if checkpoint else set()
+
+        posts = [post for post in (qs[:limit] if limit > 0 else qs) if replace or not post.image]
+        skipped = sum(1 for post in posts if post.slug in done)
+        posts = [post for post in posts if post.slug not in done]
         if not posts:
-            self.stdout.write(self.style.SUCCESS('Nenhum post para processar.'))
+            if skipped:
+                # A rodada interrompida já tinha concluído tudo: fecha o checkpoint.
+                os.remove(checkpoint)
+            self.stdout.write(self.style.SUCCESS(f"Nenhum post para processar ({skipped} já no checkpoint)."))
             return
-
-        processed = 0
-        skipped = 0
-
-        for post in posts:
-            if (not replace) and post.image:
-                skipped += 1
-                continue
-
-            queries = _build_queries(post)
-            picked: CommonsImage | None = None
-            picked_query = None
-
-            if provider in ('auto', 'commons'):
-                for q in queries:
-                    _sleep(sleep_s)
-                    results = _search_commons_images(q, width=width)
-                    if results:
-                        picked = results[0]
-                        picked_query = q
-                        break
-
-            if provider == 'commons' and not picked:
-                self.stdout.write(self.style.WARNING(f"SEM RESULTADO (commons): {post.slug} ({post.title})"))
-                continue
-
-            try:
-                filename = f"{post.slug}.jpg"
-
-                # 1) Wikimedia Commons (preferencial)
-                if picked is not None:
-                    _sleep(sleep_s)
-                    raw = _with_retries(lambda: _download_bytes(picked.thumb_url), tries=3, base_sleep=2.0, what='commons download')
-                    jpg = _to_jpeg_bytes(raw, max_w=width)
-                    post.image.save(filename, ContentFile(jpg), save=False)
-
-                    credit_bits = [
-                        'Wikimedia Commons',
-                        f"file={picked.page_title}",
-                    ]
-                    if picked.description_url:
-                        credit_bits.append(picked.description_url)
-                    if picked.license_short:
-                        credit_bits.append(f"license={picked.license_short}")
-                    if picked.artist:
-                        artist_clean = re.sub(r"\s+", " ", picked.artist).strip()
-                        credit_bits.append(f"artist={artist_clean[:120]}")
-
-                    credit_line = "Imagem: " + " | ".join(credit_bits)
-                    _append_credit(post, credit_line)
-
-                    post.save(update_fields=['image', 'internal_notes'])
-                    processed += 1
-                    self.stdout.write(self.style.SUCCESS(f"OK: {post.slug} <- commons '{picked_query}'"))
-                    continue
-
-                # 2) Fallback: Unsplash Source (preview)
-                if provider in ('auto', 'unsplash'):
-                    q = queries[0] if queries else (post.title or 'news')
-                    _sleep(sleep_s)
-                    raw_u, src_url = _with_retries(
-                        lambda: _download_unsplash_bytes(q, width=width, height=int(width * 9 / 16)),
-                        tries=3,
-                        base_sleep=2.0,
-                        what='unsplash download',
+        if skipped:
+            self.stdout.write(f"Checkpoint: {skipped} post(s) já concluído(s), pulando.")
+
+        # --sleep 0 = sem limite de taxa na prática.
+        limiter = _Limiter(rate=1.0 / sleep_s if sleep_s > 0 else 1000.0, burst=burst)
+        cache = None if no_cache or not cache_dir else _SearchCache(cache_dir, cache_ttl * 3600)
+        by_slug = {post.slug: post for post in posts}
+        summary: dict[str, dict[str, int]] = {}
+        total = len(posts)
+        finished = 0
+        started = time.monotonic()
+
+        if checkpoint:
+            os.makedirs(os.path.dirname(checkpoint) or '.', exist_ok=True)
+        ckpt = open(checkpoint, 'a', encoding='utf-8') if checkpoint else None
+        try:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='fetch-images') as pool:
+                futures = [
+                    pool.submit(
+                        _fetch_one,
+                        post.slug,
+                        post.title or '',
+                        _build_queries(post),
+                        provider=provider,
+                        width=width,
+                        limiter=limiter,
+                        cache=cache,
                     )
-                    jpg = _to_jpeg_bytes(raw_u, max_w=width)
-                    post.image.save(filename, ContentFile(jpg), save=False)
-                    _append_credit(post, f"Imagem: Unsplash Source (preview) | query={q} | url={src_url}")
-                    post.save(update_fields=['image', 'internal_notes'])
-                    processed += 1
-                    self.stdout.write(self.style.SUCCESS(f"OK: {post.slug} <- unsplash '{q}'"))
-                    continue
-
-                self.stdout.write(self.style.WARNING(f"SEM RESULTADO: {post.slug} ({post.title})"))
-            except Exception as e:
-                self.stdout.write(self.style.ERROR(f"ERRO: {post.slug} ({type(e).__name__}): {e}"))
-
-        self.stdout.write(self.style.SUCCESS(f"Concluído: {processed} ok, {skipped} pulado(s)."))
+                    for post in posts
+                ]
+                # Storage, banco e checkpoint só nesta thread, na ordem em que os posts terminam.
+                for future in as_completed(futures):
+                    result = future.result()
+                    post = by_slug[result.slug]
+                    finished += 1
+                    elapsed = time.monotonic() - started
+                    progress = f"[{finished}/{total} ETA {_format_eta(elapsed / finished * (total - finished))}]"
+
+                    if result.status == 'ok':
+                        try:
+                            post.image.save(f"{post.slug}.jpg", ContentFile(result.jpg), save=False)
+                            _append_credit(post, result.credit)
+                            post.save(update_fields=['image', 'internal_notes'])
+                        except Exception as e:
+                            result.status, result.error = 'error', f"{type(e).__name__}: {e}"
+
+                    if result.status == 'ok':
+                        self.stdout.write(self.style.SUCCESS(f"{progress} OK: {post.slug} <- {result.provider} '{result.query}'"))
+                    elif result.status == 'none':
+                        self.stdout.write(self.style.WARNING(f"{progress} SEM RESULTADO ({result.provider}): {post.slug} ({post.title})"))
+                    else:
+                        self.stdout.write(self.style.ERROR(f"{progress} ERRO: {post.slug} ({result.error})"))
+
+                    row = summary.setdefault(result.provider or '-', {'ok': 0, 'none': 0, 'error': 0})
+                    row[result.status] += 1
+                    if ckpt is not None:
+                        ckpt.write(json.dumps({
+                            'slug': post.slug,
+                            'run': run,
+                            'status': result.status,
+                            'provider': result.provider,
+                            'at': int(time.time()),
+                        }) + "\n")
+                        ckpt.flush()
+        finally:
+            if ckpt is not None:
+                ckpt.close()
+
+        for host, st in sorted(http_client.host_stats().items()):
+            self.stdout.write(
+                f"HTTP {host}: {st['requests']} req, {st['errors']} erro(s), "
+                f"{st['opened']} conexão(ões) aberta(s), p50 {st['p50_ms']} ms, p95 {st['p95_ms']} ms"
+            )
+        if cache is not None:
+            st = cache.stats
+            self.stdout.write(
+                f"Cache de buscas: {st['hit']} hit(s), {st['revalidated']} revalidada(s) (304), {st['miss']} consulta(s) ao Commons"
+            )
+        for name, row in sorted(summary.items()):
+            self.stdout.write(f"{name}: {row['ok']} ok, {row['none']} sem resultado, {row['error']} erro(s)")
+        processed = sum(row['ok'] for row in summary.values())
+        failed = sum(row['error'] for row in summary.values())
+        if checkpoint and not failed:
+            # Rodada completa: o checkpoint só serve para retomar, não para a próxima rodada.
+            try:
+                os.remove(checkpoint)
+            except OSError:
+                pass
+        self.stdout.write(self.style.SUCCESS(
+            f"Concluído: {processed} ok, {failed} erro(s), {skipped} pulado(s) em {_format_eta(time.monotonic() - started)}."
+        ))
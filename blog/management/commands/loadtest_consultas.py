@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+from django.core.management.base import BaseCommand, CommandError
+
+from blog.stats import percentile
+
+
+# Mistura padrão: o que a página /consultas/ chama (bundle) mais as APIs avulsas.
+DEFAULT_PATHS = (
+    '/api/consultas/bundle/',
+    '/api/consultas/fx/latest/?base=USD&symbols=BRL,EUR',
+    '/api/consultas/fx/range/?base=USD&days=30',
+    '/api/consultas/crypto/prices/?ids=bitcoin,ethereum',
+    '/api/consultas/crypto/chart/?id=bitcoin&days=30',
+    '/api/consultas/holidays/today/',
+    '/api/consultas/dayfacts/today/',
+)
+
+
+def _stub_stats(stub: str) -> dict | None:
+    if not stub:
+        return None
+    try:
+        with urlopen(f"{stub}/_stats", timeout=5) as resp:
+            return json.loads(resp.read().decode('utf-8'))
+    except (URLError, OSError, ValueError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Gera carga em /api/consultas/* com concorrência fixa e mostra latência (p50/p90/p99), "
+        "status por endpoint e, com --stub, quantas chamadas chegaram aos upstreams (consultas_stub)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', type=str, default='http://127.0.0.1:8000', help='Base do site (padrão http://127.0.0.1:8000).')
+        parser.add_argument('--stub', type=str, default='', help='Base do consultas_stub, para contar chamadas aos upstreams.')
+        parser.add_argument('--concurrency', type=int, default=20, help='Requests simultâneos (padrão 20).')
+        parser.add_argument('--requests', type=int, default=1000, help='Total de requests (padrão 1000).')
+        parser.add_argument('--duration', type=float, default=0.0, help='Roda por N segundos em vez de --requests.')
+        parser.add_argument('--timeout', type=float, default=15.0, help='Timeout por request (padrão 15s).')
+        parser.add_argument(
+            '--path',
+            action='append',
+            default=[],
+            help='Endpoint a exercitar (repetível). Padrão: bundle + todas as APIs de /consultas/.',
+        )
+        parser.add_argument('--gzip', action='store_true', help='Manda Accept-Encoding: gzip, br.')
+
+    def handle(self, *args, **options):
+        base: str = (options['url'] or '').rstrip('/')
+        stub: str = (options['stub'] or '').rstrip('/')
+        concurrency = max(1, int(options['concurrency']))
+        total = max(1, int(options['requests']))
+        duration = max(0.0, float(options['duration'] or 0.0))
+        timeout = max(0.1, float(options['timeout']))
+        paths: list[str] = list(options['path'] or DEFAULT_PATHS)
+        headers = {'Accept-Encoding': 'gzip, br'} if options['gzip'] else {}
+
+        before = _stub_stats(stub)
+        if stub and before is None:
+            raise CommandError(f"Stub não respondeu em {stub}/_stats")
+
+        lock = threading.Lock()
+        latencies: dict[str, list[float]] = {p: [] for p in paths}
+        statuses: dict[str, dict[str, int]] = {p: {} for p in paths}
+        counter = {'next': 0}
+        deadline = time.monotonic() + duration if duration else None
+
+        def next_path() -> str | None:
+            with lock:
+                n = counter['next']
+                if deadline is None and n >= total:
+                    return None
+                counter['next'] = n + 1
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            return paths[n % len(paths)]
+
+        def worker() -> None:
+            while True:
+                path = next_path()
+                if path is None:
+                    return
+                started = time.perf_counter()
+                try:
+                    with urlopen(Request(base + path, headers=headers), timeout=timeout) as resp:
+                        resp.read()
+                        status = str(resp.status)
+                except HTTPError as e:
+                    status = str(e.code)
+                except (URLError, TimeoutError, OSError) as e:
+                    status = type(getattr(e, 'reason', e)).__name__
+                except Exception as e:
+                    # IncompleteRead, BadStatusLine etc.: conta como erro em vez de matar o worker.
+                    status = type(e).__name__
+                elapsed_ms = (time.perf_counter() - started) * 1000.0
+                with lock:
+                    latencies[path].append(elapsed_ms)
+                    statuses[path][status] = statuses[path].get(status, 0) + 1
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            futures = [pool.submit(worker) for _ in range(concurrency)]
+        wall = time.perf_counter() - started
+        # Worker que morreu mesmo assim não pode sumir do relatório calado.
+        crashed = [f.exception() for f in futures if f.exception() is not None]
+        for error in crashed:
+            self.stdout.write(self.style.ERROR(f"Worker parou: {type(error).__name__}: {error}"))
+
+        done = sum(len(v) for v in latencies.values())
+        self.stdout.write(f"{done} request(s) em {wall:.1f}s ({done / wall if wall else 0:.0f} req/s), concorrência {concurrency}.")
+        everything: list[float] = []
+        for path in paths:
+            values = latencies[path]
+            if not values:
+                continue
+            everything.extend(values)
+            codes = ', '.join(f"{code}×{n}" for code, n in sorted(statuses[path].items()))
+            self.stdout.write(
+                f"{path}\n"
+                f"  p50 {percentile(values, 50):.1f}ms  p90 {percentile(values, 90):.1f}ms  "
+                f"p99 {percentile(values, 99):.1f}ms  max {max(values):.1f}ms  [{codes}]"
+            )
+        if everything:
+            self.stdout.write(
+                f"Total: p50 {percentile(everything, 50):.1f}ms  p90 {percentile(everything, 90):.1f}ms  "
+                f"p99 {percentile(everything, 99):.1f}ms"
+            )
+
+        after = _stub_stats(stub)
+        if before is not None and after is not None:
+            calls = {
+                provider: n - before['calls'].get(provider, 0)
+                for provider, n in after['calls'].items()
+                if n - before['calls'].get(provider, 0)
+            }
+            self.stdout.write(f"Chamadas aos upstreams nesta rodada: {calls or 'nenhuma'} (total {sum(calls.values())}).")
+
+        if crashed:
+            raise CommandError(f"{len(crashed)} worker(s) pararam antes do fim; os números acima estão incompletos.")
+        self.stdout.write(self.style.SUCCESS('Concluído.'))
@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from blog.image_ingest import describe, recent_reports
+from blog.inline_images import optimize_content_images
+from blog.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        "Gera as renditions das imagens do corpo dos posts (uploads do CKEditor) e reescreve os <img> com "
+        "width/height, srcset, loading=\"lazy\" e decoding=\"async\". Posts salvos depois desta versão já "
+        "saem assim; isto é para o acervo existente."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Não grava o HTML; só mostra os posts que mudariam (as renditions que faltarem são geradas).',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=0,
+            help='Limita a quantidade de posts processados (0 = sem limite).',
+        )
+
+    def handle(self, *args, **options):
+        dry_run: bool = bool(options['dry_run'])
+        limit: int = int(options['limit'] or 0)
+
+        qs = Post.objects.filter(content__icontains='<img').only('pk', 'slug', 'content').order_by('-published_date')
+        if limit > 0:
+            qs = qs[:limit]
+
+        changed = seen = 0
+        for post in qs.iterator():
+            seen += 1
+            started = time.monotonic()
+            content = optimize_content_images(post.content)
+            for report in recent_reports(since=started):
+                self.stdout.write(f"  {describe(report)}")
+            if content == post.content:
+                continue
+            changed += 1
+            self.stdout.write(f"HTML: {post.slug or post.pk}")
+            if not dry_run:
+                # update(): não dispara o save (nem os jobs da imagem destacada).
+                Post.objects.filter(pk=post.pk).update(content=content)
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING(f"Dry-run: {changed} de {seen} post(s) seriam reescritos."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Concluído: {changed} de {seen} post(s) reescritos."))
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from blog.image_ingest import describe, recent_reports
+from blog.image_jobs import run_job
+from blog.models import Post, UserProfile
+
+
+class Command(BaseCommand):
+    help = (
+        "Roda (na hora, neste processo) os jobs de imagem pendentes: capas, imagens do corpo e perfis em "
+        "'processing' (ex.: o worker reiniciou no meio) ou 'failed', e crops ainda não aplicados. Idempotente."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Não processa nada; só mostra o que está pendente.',
+        )
+
+    def handle(self, *args, **options):
+        dry_run: bool = bool(options['dry_run'])
+
+        posts = list(
+            Post.objects.filter(
+                Q(image_status__in=('processing', 'failed'))
+                | (Q(image_crop_w__isnull=False) & Q(image_crop_h__isnull=False))
+            ).values_list('pk', flat=True)
+        )
+        inline = list(
+            Post.objects.filter(content_images_status__in=('processing', 'failed')).values_list('pk', flat=True)
+        )
+        profiles = list(
+            UserProfile.objects.filter(
+                Q(avatar_status__in=('processing', 'failed'))
+                | (Q(avatar_crop_w__isnull=False) & Q(avatar_crop_h__isnull=False))
+            ).values_list('pk', flat=True)
+        )
+
+        if not posts and not inline and not profiles:
+            self.stdout.write(self.style.SUCCESS('Nenhum job de imagem pendente.'))
+            return
+
+        if dry_run:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"Dry-run: {len(posts)} capa(s), {len(inline)} post(s) com imagens no corpo "
+                    f"e {len(profiles)} perfil(is) pendentes."
+                )
+            )
+            return
+
+        ok = failed = 0
+        for kind, pks in (('post', posts), ('inline', inline), ('avatar', profiles)):
+            for pk in pks:
+                started = time.monotonic()
+                if run_job(kind, pk):
+                    ok += 1
+                else:
+                    failed += 1
+                    self.stdout.write(self.style.ERROR(f"FALHOU: {kind} #{pk}"))
+                for report in recent_reports(since=started):
+                    self.stdout.write(f"  {kind} #{pk} {describe(report)}")
+
+        self.stdout.write(self.style.SUCCESS(f"Concluído: {ok} job(s) ok, {failed} falha(s)."))
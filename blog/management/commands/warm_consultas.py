@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from blog.consultas_prefetch import ConsultasPrefetcher
+
+
+class Command(BaseCommand):
+    help = (
+        "Mantém as keys de /api/consultas/* quentes no cache (câmbio, cripto, feriados, Wikipedia), "
+        "atualizando antes de vencer, com jitter e rate-limit por provedor. "
+        "Útil com cache compartilhado (Redis/Memcached); com LocMem use OXIRA_CONSULTAS_PREFETCH=1."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Roda um ciclo só (bom para cron) e sai.',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5.0,
+            help='Pausa (segundos) entre ciclos no modo contínuo (padrão 5).',
+        )
+
+    def handle(self, *args, **options):
+        once: bool = bool(options['once'])
+        interval: float = float(options['interval'] or 5.0)
+
+        prefetcher = ConsultasPrefetcher()
+
+        if not once:
+            self.stdout.write('Prefetcher rodando (Ctrl+C para sair)…')
+            try:
+                while True:
+                    refreshed = prefetcher.run_once()
+                    if refreshed:
+                        self.stdout.write(f"{refreshed} key(s) atualizada(s).")
+                    time.sleep(interval)
+            except KeyboardInterrupt:
+                prefetcher.stop()
+            return
+
+        refreshed = prefetcher.run_once()
+        now = time.time()
+        for key, row in sorted(prefetcher.freshness.items()):
+            age = f"{int(now - row['fetched_at'])}s" if row.get('fetched_at') else '—'
+            if row.get('ok'):
+                self.stdout.write(f"OK: {key} ({row['provider']}, idade {age})")
+            else:
+                self.stdout.write(self.style.ERROR(f"ERRO: {key} ({row['provider']}): {row['error']}"))
+
+        self.stdout.write(self.style.SUCCESS(f"Concluído: {refreshed} key(s) atualizada(s)."))
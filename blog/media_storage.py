@@ -0,0 +1,149 @@
+"""Storage de MEDIA endereçado por conteúdo (sha256 dos bytes).
+
+`Post.image`, `UserProfile.avatar`, uploads do CKEditor, fetch_post_images e
+generate_post_images passam pelo default storage; aqui o nome pedido
+('posts/foo.jpg') vira '<pasta>/<sha[:2]>/<sha>.<ext>'. Os mesmos bytes viram
+o mesmo arquivo: um upload repetido não ocupa disco, e as renditions (chaveadas
+pelo mesmo sha) já existem. Como o nome nunca aponta para outro conteúdo, a URL
+pode ficar em cache por um ano (`IMMUTABLE_CACHE_CONTROL`; em DEBUG o
+`serve_media` já manda o header; em produção, configurar o mesmo no servidor
+para esses caminhos).
+
+Derivados com nome determinístico (renditions, crop do avatar, thumb do
+CKEditor) passam direto, sem rehash. Como um arquivo pode ser usado por vários
+posts/perfis/HTMLs, apagar só com `release()`, que confere as referências.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import uuid
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.views.static import serve
+
+from .post_images import RENDITIONS_DIR
+
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# '<pasta>/<ab>/<sha256>...': original endereçado ou derivado dele (sufixo -c…, _thumb).
+_ADDRESSED_RE = re.compile(r'^[^/]+/[0-9a-f]{2}/([0-9a-f]{64})')
+_ORIGINAL_RE = re.compile(r'^[^/]+/[0-9a-f]{2}/([0-9a-f]{64})\.[0-9a-z]+$')
+# Derivados que já têm nome determinístico, gravados como vieram.
+PASSTHROUGH_PREFIXES = (f"{RENDITIONS_DIR}/", 'posts/variants/')
+
+
+def is_addressed(name: str) -> bool:
+    return bool(_ADDRESSED_RE.match(name or ''))
+
+
+def is_immutable(name: str) -> bool:
+    """O conteúdo deste nome nunca muda (pode ir com cache de um ano)."""
+    return is_addressed(name) or (name or '').startswith(f"{RENDITIONS_DIR}/")
+
+
+def content_hash(name: str) -> str | None:
+    """sha256 do conteúdo, tirado do próprio nome (só para originais endereçados)."""
+    match = _ORIGINAL_RE.match(name or '')
+    return match.group(1) if match else None
+
+
+def addressed_name(name: str, digest: str) -> str:
+    folder = (name or '').replace('\\', '/').split('/', 1)[0] if '/' in (name or '') else 'files'
+    ext = os.path.splitext(name or '')[1].lower()
+    return f"{folder}/{digest[:2]}/{digest}{ext}"
+
+
+def _digest(content) -> str:
+    h = hashlib.sha256()
+    for chunk in content.chunks():
+        h.update(chunk if isinstance(chunk, bytes) else chunk.encode('utf-8'))
+    content.seek(0)
+    return h.hexdigest()
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = (name or '').replace('\\', '/')
+        if not is_addressed(name) and not name.startswith(PASSTHROUGH_PREFIXES):
+            name = addressed_name(name, _digest(content))
+        return super().save(name, content, max_length=max_length)
+
+    def get_available_name(self, name, max_length=None):
+        # Mesmo nome = mesmo conteúdo: nada de sufixo aleatório.
+        if is_addressed(name):
+            return name
+        return super().get_available_name(name, max_length=max_length)
+
+    def _save(self, name, content):
+        if not is_addressed(name):
+            return super()._save(name, content)
+        if self.exists(name):
+            return name
+        # Grava num temporário e troca: leitores nunca veem arquivo pela metade, e
+        # dois uploads iguais ao mesmo tempo terminam no mesmo arquivo inteiro.
+        tmp = super()._save(f"{name}.{uuid.uuid4().hex}.tmp", content)
+        os.replace(self.path(tmp), self.path(name))
+        return name
+
+
+def serve_media(request, path, document_root=None, show_indexes=False):
+    """`django.views.static.serve` com cache de um ano para os nomes imutáveis (só DEBUG)."""
+    response = serve(request, path, document_root=document_root, show_indexes=show_indexes)
+    if is_immutable(path):
+        response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    return response
+
+
+# Referências
+
+def media_names_in_html(html: str) -> set[str]:
+    return set(re.findall(re.escape(settings.MEDIA_URL) + r'([^"\'\s?#)<>]+)', html or ''))
+
+
+def referenced_names() -> set[str]:
+    """Tudo o que o banco aponta no MEDIA: imagens, avatares, renditions e arquivos citados no HTML dos posts."""
+    from .models import Post, UserProfile
+    from .post_images import referenced_names as rendition_names
+
+    names: set[str] = set()
+    for image, variants, content in Post.objects.values_list('image', 'image_variants', 'content').iterator():
+        if image:
+            names.add(image)
+        names |= rendition_names(variants)
+        for name in media_names_in_html(content):
+            names.add(name)
+            # O CKEditor gera <nome>_thumb.<ext> para o navegador de arquivos.
+            stem, ext = os.path.splitext(name)
+            names.add(f"{stem}_thumb{ext}")
+    names |= {a for a in UserProfile.objects.exclude(avatar='').values_list('avatar', flat=True) if a}
+    return names
+
+
+def is_referenced(name: str) -> bool:
+    from .models import Post, UserProfile
+
+    return (
+        Post.objects.filter(image=name).exists()
+        or UserProfile.objects.filter(avatar=name).exists()
+        or Post.objects.filter(content__contains=f"{settings.MEDIA_URL}{name}").exists()
+    )
+
+
+def release(storage, name: str) -> bool:
+    """Apaga `name` se nada mais aponta para ele. Retorna True se apagou."""
+    if not name or is_referenced(name):
+        return False
+    try:
+        storage.delete(name)
+    except Exception:
+        return False
+    return True
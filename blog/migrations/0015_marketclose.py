@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0014_adconfig_alter_post_image_crop_h_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarketClose',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('series', models.CharField(max_length=64)),
+                ('day', models.DateField()),
+                ('value', models.FloatField()),
+            ],
+            options={
+                'verbose_name': 'Fechamento (consultas)',
+                'verbose_name_plural': 'Fechamentos (consultas)',
+                'constraints': [models.UniqueConstraint(fields=('series', 'day'), name='blog_marketclose_series_day')],
+            },
+        ),
+    ]
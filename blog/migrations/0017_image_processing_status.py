@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0016_post_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_status',
+            field=models.CharField(choices=[('ready', 'Pronta'), ('processing', 'Processando'), ('failed', 'Falhou')], default='ready', editable=False, max_length=10),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='avatar_status',
+            field=models.CharField(choices=[('ready', 'Pronta'), ('processing', 'Processando'), ('failed', 'Falhou')], default='ready', editable=False, max_length=10),
+        ),
+    ]
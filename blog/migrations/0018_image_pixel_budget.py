@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:12
+
+import blog.image_ingest
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0017_image_processing_status'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, null=True, upload_to='posts/', validators=[blog.image_ingest.validate_image_budget], verbose_name='Imagem Destacada'),
+        ),
+        migrations.AlterField(
+            model_name='userprofile',
+            name='avatar',
+            field=models.ImageField(blank=True, null=True, upload_to='avatars/', validators=[blog.image_ingest.validate_image_budget], verbose_name='Foto de Perfil'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0018_image_pixel_budget'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='content_images_status',
+            field=models.CharField(choices=[('ready', 'Pronta'), ('processing', 'Processando'), ('failed', 'Falhou')], default='ready', editable=False, max_length=10),
+        ),
+    ]
@@ -7,18 +7,29 @@ from ckeditor_uploader.fields import RichTextUploadingField
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from .models_ads import AdConfig
+from .image_ingest import validate_image_budget
+from .image_jobs import schedule_avatar, schedule_inline_images, schedule_post
+from .inline_images import rewrite_content_images
 
-from PIL import Image, ImageOps
+# Estado do processamento de imagem em background (blog/image_jobs.py)
+IMAGE_STATUS_CHOICES = (
+    ('ready', 'Pronta'),
+    ('processing', 'Processando'),
+    ('failed', 'Falhou'),
+)
 
 # Perfil do Usuário (Avatar, Bio, etc)
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
-    avatar = models.ImageField(upload_to='avatars/', blank=True, null=True, verbose_name="Foto de Perfil")
+    avatar = models.ImageField(
+        upload_to='avatars/', blank=True, null=True, verbose_name="Foto de Perfil", validators=[validate_image_budget]
+    )
     # Crop do avatar (coordenadas em pixels na imagem original)
     avatar_crop_x = models.PositiveIntegerField(blank=True, null=True)
     avatar_crop_y = models.PositiveIntegerField(blank=True, null=True)
     avatar_crop_w = models.PositiveIntegerField(blank=True, null=True)
     avatar_crop_h = models.PositiveIntegerField(blank=True, null=True)
+    avatar_status = models.CharField(max_length=10, choices=IMAGE_STATUS_CHOICES, default='ready', editable=False)
     bio = models.TextField(blank=True, verbose_name="Biografia")
 
     # Redes sociais / presença online (opcional)
@@ -58,50 +69,8 @@ class UserProfile(models.Model):
 
     def save(self, *args, **kwargs):
         super().save(*args, **kwargs)
-        self._apply_avatar_crop_if_needed()
-
-    def _apply_avatar_crop_if_needed(self):
-        if not self.avatar:
-            return
-        if not (self.avatar_crop_w and self.avatar_crop_h):
-            return
-
-        # Abre/corta/redimensiona para um quadrado padrão
-        try:
-            path = self.avatar.path
-        except Exception:
-            return
-
-        try:
-            with Image.open(path) as im:
-                im = ImageOps.exif_transpose(im)
-                x = int(self.avatar_crop_x or 0)
-                y = int(self.avatar_crop_y or 0)
-                w = int(self.avatar_crop_w or 0)
-                h = int(self.avatar_crop_h or 0)
-                if w <= 0 or h <= 0:
-                    return
-                # Clamp
-                x = max(0, min(x, im.width - 1))
-                y = max(0, min(y, im.height - 1))
-                x2 = max(x + 1, min(x + w, im.width))
-                y2 = max(y + 1, min(y + h, im.height))
-
-                cropped = im.crop((x, y, x2, y2)).convert('RGB')
-                cropped = cropped.resize((400, 400), Image.Resampling.LANCZOS)
-
-                # Salva sobrescrevendo o arquivo original
-                cropped.save(path, format='JPEG', quality=88, optimize=True, progressive=True)
-        except Exception:
-            return
-
-        # Limpa o crop para não aplicar novamente em futuros saves
-        type(self).objects.filter(pk=self.pk).update(
-            avatar_crop_x=None,
-            avatar_crop_y=None,
-            avatar_crop_w=None,
-            avatar_crop_h=None,
-        )
+        # Crop/resize rodam em background (blog/image_jobs.py); até lá vale o arquivo enviado.
+        schedule_avatar(self)
 
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
@@ -144,12 +113,20 @@ class Post(models.Model):
     
     # Conteúdo e Mídia
     content = RichTextUploadingField(verbose_name="Conteúdo")
-    image = models.ImageField(upload_to='posts/', blank=True, null=True, verbose_name="Imagem Destacada")
-    # Crop da imagem destacada (coordenadas em pixels na imagem original)
+    image = models.ImageField(
+        upload_to='posts/', blank=True, null=True, verbose_name="Imagem Destacada", validators=[validate_image_budget]
+    )
+    # Crop da imagem destacada (coordenadas em pixels na imagem original).
+    # O original nunca é sobrescrito: o crop fica salvo e só entra nas renditions.
     image_crop_x = models.PositiveIntegerField(blank=True, null=True)
     image_crop_y = models.PositiveIntegerField(blank=True, null=True)
     image_crop_w = models.PositiveIntegerField(blank=True, null=True)
     image_crop_h = models.PositiveIntegerField(blank=True, null=True)
+    # Renditions da imagem (original + crop, larguras x WebP/JPEG), geradas em background (blog/post_images.py)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
+    image_status = models.CharField(max_length=10, choices=IMAGE_STATUS_CHOICES, default='ready', editable=False)
+    # Renditions das imagens do corpo que o save não achou prontas (blog/inline_images.py), geradas em background
+    content_images_status = models.CharField(max_length=10, choices=IMAGE_STATUS_CHOICES, default='ready', editable=False)
     
     # SEO
     meta_description = models.CharField(max_length=160, blank=True, verbose_name="Meta Descrição (SEO)")
@@ -173,48 +150,29 @@ class Post(models.Model):
         return self.title or f"Post #{self.pk}" if self.pk else "(Sem título)"
 
     def save(self, *args, **kwargs):
+        self._drop_stale_crop()
+        update_fields = kwargs.get('update_fields')
+        inline_pending = None
+        if update_fields is None or 'content' in update_fields:
+            # <img> do editor ganham dimensões, srcset e lazy (blog/inline_images.py), só com o que já existe.
+            self.content, inline_pending = rewrite_content_images(self.content, create=False)
         super().save(*args, **kwargs)
-        self._apply_image_crop_if_needed()
-
-    def _apply_image_crop_if_needed(self):
-        if not self.image:
-            return
-        if not (self.image_crop_w and self.image_crop_h):
+        # Renditions rodam em background (blog/image_jobs.py); até lá as páginas usam o original.
+        schedule_post(self)
+        if inline_pending is not None:
+            schedule_inline_images(self, pending=inline_pending)
+
+    def _drop_stale_crop(self):
+        # Imagem nova sem crop novo: o crop salvo era da imagem anterior.
+        if not self.pk or not (self.image_crop_w and self.image_crop_h):
             return
-
-        try:
-            path = self.image.path
-        except Exception:
-            return
-
-        try:
-            with Image.open(path) as im:
-                im = ImageOps.exif_transpose(im)
-                x = int(self.image_crop_x or 0)
-                y = int(self.image_crop_y or 0)
-                w = int(self.image_crop_w or 0)
-                h = int(self.image_crop_h or 0)
-                if w <= 0 or h <= 0:
-                    return
-                x = max(0, min(x, im.width - 1))
-                y = max(0, min(y, im.height - 1))
-                x2 = max(x + 1, min(x + w, im.width))
-                y2 = max(y + 1, min(y + h, im.height))
-
-                cropped = im.crop((x, y, x2, y2)).convert('RGB')
-                # Tamanho padrão de capa: 1280x720 (16:9)
-                cropped = cropped.resize((1280, 720), Image.Resampling.LANCZOS)
-
-                cropped.save(path, format='JPEG', quality=88, optimize=True, progressive=True)
-        except Exception:
+        crop_fields = ('image_crop_x', 'image_crop_y', 'image_crop_w', 'image_crop_h')
+        previous = type(self).objects.filter(pk=self.pk).values('image', *crop_fields).first()
+        if previous is None or (previous['image'] or '') == (self.image.name or ''):
             return
-
-        type(self).objects.filter(pk=self.pk).update(
-            image_crop_x=None,
-            image_crop_y=None,
-            image_crop_w=None,
-            image_crop_h=None,
-        )
+        if all(previous[f] == getattr(self, f) for f in crop_fields):
+            for f in crop_fields:
+                setattr(self, f, None)
 
     def clean(self):
         super().clean()
@@ -343,3 +301,25 @@ class LinkClick(models.Model):
 
     def __str__(self):
         return f"Click {self.url}"
+
+
+class MarketClose(models.Model):
+    """Fechamento diário de uma série de /consultas/ (câmbio e cripto).
+
+    Histórico local: os upstreams só são consultados a partir do último ponto
+    gravado (ver blog/consultas_series.py).
+    """
+    # fx:EUR:USD (USD por 1 EUR) | crypto:bitcoin:brl
+    series = models.CharField(max_length=64)
+    day = models.DateField()
+    value = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['series', 'day'], name='blog_marketclose_series_day'),
+        ]
+        verbose_name = "Fechamento (consultas)"
+        verbose_name_plural = "Fechamentos (consultas)"
+
+    def __str__(self):
+        return f"{self.series} {self.day}: {self.value}"
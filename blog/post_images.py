@@ -0,0 +1,216 @@
+"""Renditions (variantes responsivas) da imagem destacada dos posts.
+
+O arquivo enviado em Post.image nunca é alterado: o crop fica salvo em
+image_crop_* e cada rendition é derivada do original numa reamostragem só.
+O nome de cada arquivo vem de (hash do original, crop, tamanho, formato), em
+posts/renditions/, então refazer um crop já usado ou pedir uma largura nova
+só gera o que ainda não existe. O que vale para o post fica em
+Post.image_variants, e o template tag `post_image` (templatetags/blog_images)
+monta o <picture> com srcset/sizes a partir disso, sem tocar no disco.
+"""
+from __future__ import annotations
+
+import hashlib
+import io
+import os
+from typing import Any
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+from .image_ingest import decoded, probe
+
+
+VARIANT_WIDTHS = (320, 640, 960, 1280)
+RENDITIONS_DIR = 'posts/renditions'
+
+# Com crop, as renditions saem no formato de capa (16:9, até 1280x720).
+COVER_ASPECT = (16, 9)
+
+# (formato no dict, formato do Pillow, extensão, opções de encode)
+VARIANT_FORMATS: tuple[tuple[str, str, str, dict], ...] = (
+    ('webp', 'WEBP', 'webp', {'quality': 80, 'method': 4}),
+    ('jpeg', 'JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+)
+
+
+def _source_mtime(field) -> float | None:
+    try:
+        return os.path.getmtime(field.path)
+    except Exception:
+        return None
+
+
+def post_crop(post) -> tuple[int, int, int, int] | None:
+    """Retângulo de crop salvo no post (pixels do original), ou None."""
+    w = int(post.image_crop_w or 0)
+    h = int(post.image_crop_h or 0)
+    if w <= 0 or h <= 0:
+        return None
+    return int(post.image_crop_x or 0), int(post.image_crop_y or 0), w, h
+
+
+def variants_current(post) -> bool:
+    """As renditions gravadas são da imagem e do crop atuais?"""
+    variants = post.image_variants or {}
+    if not post.image:
+        return not variants
+    crop = post_crop(post)
+    return (
+        variants.get('src') == post.image.name
+        and variants.get('mtime') == _source_mtime(post.image)
+        and variants.get('crop') == (list(crop) if crop else None)
+    )
+
+
+def _file_sha256(field) -> str:
+    from .media_storage import content_hash
+
+    # Original endereçado por conteúdo (media_storage): o hash já está no nome.
+    known = content_hash(field.name)
+    if known:
+        return known
+    h = hashlib.sha256()
+    with field.storage.open(field.name, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _clamp(crop: tuple[int, int, int, int], width: int, height: int) -> tuple[int, int, int, int]:
+    x, y, w, h = crop
+    x = max(0, min(x, width - 1))
+    y = max(0, min(y, height - 1))
+    x2 = max(x + 1, min(x + w, width))
+    y2 = max(y + 1, min(y + h, height))
+    return x, y, x2, y2
+
+
+def _sizes(box_w: int, box_h: int, cropped: bool) -> list[tuple[int, int]]:
+    if cropped:
+        aw, ah = COVER_ASPECT
+        widths = [w for w in VARIANT_WIDTHS if w <= max(box_w, VARIANT_WIDTHS[0])]
+        return [(w, round(w * ah / aw)) for w in widths]
+    widths = [w for w in VARIANT_WIDTHS if w <= box_w] or [box_w]
+    return [(w, max(1, round(box_h * w / box_w))) for w in widths]
+
+
+def _rendition_name(sha: str, crop_key: str, size: tuple[int, int], ext: str) -> str:
+    return f"{RENDITIONS_DIR}/{sha[:2]}/{sha[:24]}-{crop_key}-{size[0]}x{size[1]}.{ext}"
+
+
+def build_variants(
+    field,
+    crop: tuple[int, int, int, int] | None,
+    *,
+    sha: str | None = None,
+    create: bool = True,
+) -> dict[str, Any]:
+    """Gera (ou reaproveita) as renditions de `field` com o crop dado e devolve o dict de image_variants.
+
+    Com create=False não decodifica nada: devolve só as que já existem (width/height
+    vêm do cabeçalho) e marca `partial` se faltar alguma.
+    """
+    storage = field.storage
+    sha = sha or _file_sha256(field)
+    # Só o cabeçalho: o decode (caro) só acontece se faltar alguma rendition.
+    width, height = probe(field.path, label=field.name)
+    box = _clamp(crop, width, height) if crop else (0, 0, width, height)
+    box_w, box_h = box[2] - box[0], box[3] - box[1]
+    crop_key = 'c{}_{}_{}_{}'.format(*box) if crop else 'full'
+    sizes = _sizes(box_w, box_h, bool(crop))
+
+    out: dict[str, Any] = {
+        'src': field.name,
+        'mtime': _source_mtime(field),
+        'sha': sha,
+        'crop': list(crop) if crop else None,
+    }
+    missing: list[tuple[tuple[int, int], str, str, str, dict]] = []
+    for size in sizes:
+        for fmt, pil_format, ext, options in VARIANT_FORMATS:
+            name = _rendition_name(sha, crop_key, size, ext)
+            if storage.exists(name):
+                out.setdefault(fmt, {})[str(size[0])] = name
+            else:
+                missing.append((size, fmt, pil_format, name, options))
+        out['width'], out['height'] = size
+
+    if missing and not create:
+        out['partial'] = True
+    elif missing:
+        # Decodifica uma vez, perto da maior rendition que falta (image_ingest).
+        largest = max((m[0] for m in missing), key=lambda s: s[0])
+        with decoded(field.path, largest, box, label=field.name) as (region, report):
+            region = region.convert('RGB')
+            for size, fmt, pil_format, name, options in missing:
+                if crop:
+                    rendered = ImageOps.fit(region, size, Image.Resampling.LANCZOS)
+                else:
+                    rendered = region if region.size == size else region.resize(size, Image.Resampling.LANCZOS)
+                report.track(region, rendered)
+                buf = io.BytesIO()
+                rendered.save(buf, format=pil_format, **options)
+                out.setdefault(fmt, {})[str(size[0])] = storage.save(name, ContentFile(buf.getvalue()))
+    return out
+
+
+def refresh_variants(post, *, force: bool = False) -> bool:
+    """Atualiza image_variants se a imagem ou o crop mudaram. Retorna True se gravou algo.
+
+    Erros do encode (arquivo ausente, ilegível, `ImageTooLarge`) sobem para quem
+    chamou: o job decide entre tentar de novo e marcar a falha (`mark_variants_failed`).
+    Renditions antigas ficam no disco (servem de cache para outro crop/post);
+    `build_image_variants --prune` apaga as que nenhum post usa.
+    """
+    if not force and variants_current(post):
+        return False
+    variants: dict[str, Any] = {}
+    if post.image:
+        old = post.image_variants or {}
+        # Mesmo arquivo (nome + mtime): reaproveita o hash em vez de reler tudo.
+        same_file = old.get('src') == post.image.name and old.get('mtime') == _source_mtime(post.image)
+        variants = build_variants(post.image, post_crop(post), sha=old.get('sha') if same_file else None)
+    post.image_variants = variants
+    type(post).objects.filter(pk=post.pk).update(image_variants=variants)
+    return True
+
+
+def variants_failed(post) -> bool:
+    return bool((post.image_variants or {}).get('failed'))
+
+
+def mark_variants_failed(post) -> None:
+    """Grava a falha com a imagem e o crop atuais, sem renditions.
+
+    `variants_current` passa a valer, então salvar o post de novo não reagenda o
+    mesmo job; trocar a imagem ou o crop (ou `process_image_jobs`) tenta outra vez.
+    Sem renditions, o template usa o arquivo original.
+    """
+    crop = post_crop(post)
+    variants = {
+        'src': post.image.name,
+        'mtime': _source_mtime(post.image),
+        'crop': list(crop) if crop else None,
+        'failed': True,
+    } if post.image else {}
+    post.image_variants = variants
+    type(post).objects.filter(pk=post.pk).update(image_variants=variants)
+
+
+def referenced_names(variants: dict | None) -> set[str]:
+    return {name for fmt, _, _, _ in VARIANT_FORMATS for name in ((variants or {}).get(fmt) or {}).values()}
+
+
+def srcset(variants: dict | None, fmt: str, url) -> str:
+    """'url 320w, url 640w, …' para o formato pedido ('' se não houver)."""
+    names = (variants or {}).get(fmt) or {}
+    return ', '.join(f"{url(name)} {w}w" for w, name in sorted(names.items(), key=lambda kv: int(kv[0])))
+
+
+def fallback_name(variants: dict | None) -> str | None:
+    """Maior JPEG gerado (src do <img> para quem não entende srcset)."""
+    names = (variants or {}).get('jpeg') or {}
+    if not names:
+        return None
+    return names[max(names, key=int)]
@@ -0,0 +1,11 @@
+"""Estatística simples para métricas e relatórios dos comandos (sem numpy)."""
+from __future__ import annotations
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Percentil `pct` (0–100) por posição mais próxima; 0.0 sem amostras."""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    idx = min(len(values) - 1, max(0, int(round((pct / 100.0) * (len(values) - 1)))))
+    return values[idx]
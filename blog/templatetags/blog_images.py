@@ -0,0 +1,52 @@
+from django import template
+from django.utils.html import format_html
+
+from blog.post_images import fallback_name, srcset
+from blog.thumbnails import thumb_url as _thumb_url
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_image(post, sizes='100vw', css_class='', loading='lazy', fetchpriority=''):
+    # <picture> com WebP + JPEG em várias larguras; o navegador escolhe pelo `sizes` do slot.
+    # Sem variantes (sem backfill ou ainda processando), cai no <img> com o arquivo original.
+    image = getattr(post, 'image', None)
+    if not image:
+        return ''
+    alt = getattr(post, 'title', '') or ''
+    variants = getattr(post, 'image_variants', None) or {}
+    # Variantes de outra imagem (crop/upload ainda em processamento) não valem.
+    if variants.get('src') != image.name:
+        variants = {}
+    fallback = fallback_name(variants)
+    if not fallback:
+        return format_html(
+            '<img src="{}" alt="{}" class="{}" loading="{}"{} />',
+            image.url, alt, css_class, loading, _priority(fetchpriority),
+        )
+
+    url = image.storage.url
+    # display:contents: o <picture> não entra no layout, o CSS do slot continua valendo para o <img>.
+    return format_html(
+        '<picture style="display:contents">'
+        '<source type="image/webp" srcset="{}" sizes="{}" />'
+        '<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}" alt="{}" class="{}" loading="{}"{} />'
+        '</picture>',
+        srcset(variants, 'webp', url), sizes,
+        url(fallback), srcset(variants, 'jpeg', url), sizes,
+        variants.get('width') or '', variants.get('height') or '',
+        alt, css_class, loading, _priority(fetchpriority),
+    )
+
+
+def _priority(value):
+    return format_html(' fetchpriority="{}"', value) if value else ''
+
+
+@register.simple_tag
+def thumb_url(image, width, height, fit='cover', fmt='webp'):
+    # URL assinada de /thumb/ (blog/thumbnails.py). Para telas retina, peça o dobro do tamanho exibido.
+    if not image:
+        return ''
+    return _thumb_url(image.name, width, height, fit, fmt)
@@ -1,3 +1,1536 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.error import HTTPError, URLError
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.management import call_command
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from blog import (
+    consultas_breaker,
+    consultas_cache,
+    consultas_dayfacts,
+    consultas_response,
+    consultas_series,
+    consultas_snapshot,
+    cover_render,
+    http_client,
+    image_ingest,
+    image_jobs,
+    post_images,
+    thumbnails,
+)
+from blog.consultas_dayfacts import lookup as dayfacts_lookup
+from blog.consultas_fx import UnknownCurrency, cross_latest, cross_range
+from blog.consultas_holidays import easter, holidays_on, national_holidays, next_holiday
+from blog.consultas_prefetch import ConsultasPrefetcher
+from blog.consultas_upstream import (
+    CRYPTO_ALLOWED_IDS,
+    FX_TTL,
+    UpstreamTarget,
+    crypto_chart_target,
+    crypto_prices_target,
+    fx_table_target,
+    wikipedia_onthisday_target,
+)
+from blog.image_ingest import ImageTooLarge
+from blog.inline_images import inline_variants, rewrite_content_images
+from blog.management.commands import fetch_post_images
+from blog.media_storage import ContentAddressedStorage, content_hash, release
+from blog.models import MarketClose, Post, UserProfile
+from blog.stats import percentile
+from blog.templatetags.blog_images import post_image
+from blog.thumbnails import InvalidThumbnail, ThumbSpec, get_thumbnail, sign, thumb_url
+from blog.consultas_breaker import CircuitOpen
+from blog.consultas_cache import (
+    CacheMiss,
+    UpstreamUnavailable,
+    cached_fetch,
+    fetch_single_flight,
+    hard_ttl_for,
+)
+
+
+def _put(cache_key, data, age):
+    # Entrada SWR como o _store grava, com `age` segundos de idade.
+    cache.set(cache_key, {'_swr': 1, 'data': data, 'fetched_at': time.time() - age}, 3600)
+
+
+@override_settings(OXIRA_CONSULTAS_SNAPSHOT_DIR='')
+class ConsultasCacheTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_miss_fetches_and_stores(self):
+        result = cached_fetch('t:miss', lambda: {'v': 1}, soft_ttl=60)
+        self.assertEqual(result.data, {'v': 1})
+        self.assertFalse(result.stale)
+        self.assertEqual(cached_fetch('t:miss', lambda: {'v': 2}, soft_ttl=60).data, {'v': 1})
+
+    def test_cache_only_miss_raises(self):
+        with self.assertRaises(CacheMiss):
+            cached_fetch('t:cache-only', lambda: 1, soft_ttl=60, cache_only=True)
+
+    def test_fresh_entry_does_not_refresh(self):
+        _put('t:fresh', 'old', age=10)
+        with mock.patch.object(consultas_cache, 'refresh_in_background') as refresh:
+            result = cached_fetch('t:fresh', lambda: 'new', soft_ttl=60)
+        self.assertEqual(result.data, 'old')
+        self.assertFalse(result.stale)
+        refresh.assert_not_called()
+
+    def test_past_soft_ttl_serves_cache_and_refreshes(self):
+        _put('t:soft', 'old', age=120)
+        with mock.patch.object(consultas_cache, 'refresh_in_background') as refresh:
+            result = cached_fetch('t:soft', lambda: 'new', soft_ttl=60)
+        self.assertEqual(result.data, 'old')
+        self.assertFalse(result.stale)
+        refresh.assert_called_once()
+
+    def test_past_hard_ttl_is_stale(self):
+        _put('t:hard', 'old', age=500)
+        with mock.patch.object(consultas_cache, 'refresh_in_background'):
+            result = cached_fetch('t:hard', lambda: 'new', soft_ttl=60, hard_ttl=300)
+        self.assertEqual(result.data, 'old')
+        self.assertTrue(result.stale)
+
+    def test_default_hard_ttl_is_above_soft_ttl(self):
+        six_hours = 6 * 60 * 60
+        self.assertGreater(hard_ttl_for(six_hours), six_hours)
+        self.assertEqual(hard_ttl_for(60), consultas_cache.DEFAULT_HARD_TTL)
+        # Alvo de 6h logo depois do soft TTL: revalida, mas ainda não é stale.
+        _put('t:6h', 'old', age=six_hours + 60)
+        with mock.patch.object(consultas_cache, 'refresh_in_background'):
+            self.assertFalse(cached_fetch('t:6h', lambda: 'new', soft_ttl=six_hours).stale)
+
+    def test_background_refresh_replaces_value(self):
+        _put('t:bg', 'old', age=120)
+        self.assertTrue(consultas_cache.refresh_in_background('t:bg', lambda: 'new'))
+        deadline = time.monotonic() + 5
+        while consultas_cache.peek('t:bg')['data'] != 'new' and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(consultas_cache.peek('t:bg')['data'], 'new')
+
+    def test_single_flight_coalesces_concurrent_misses(self):
+        calls = []
+        release = threading.Event()
+
+        def fetch():
+            calls.append(1)
+            release.wait(5)
+            return 'v'
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(fetch_single_flight('t:sf', fetch)['data']))
+            for _ in range(8)
+        ]
+        for t in threads:
+            t.start()
+        time.sleep(0.1)
+        release.set()
+        for t in threads:
+            t.join(5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['v'] * 8)
+
+    def test_failure_is_negatively_cached(self):
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            raise URLError('boom')
+
+        with self.assertRaises(URLError):
+            fetch_single_flight('t:neg', fetch)
+        with self.assertRaises(UpstreamUnavailable) as ctx:
+            fetch_single_flight('t:neg', fetch)
+        self.assertEqual(len(calls), 1)
+        self.assertGreaterEqual(ctx.exception.retry_after, 1)
+
+    def test_negative_entry_expires(self):
+        with self.assertRaises(URLError):
+            fetch_single_flight('t:neg-exp', mock.Mock(side_effect=URLError('boom')))
+        cache.delete('t:neg-exp:neg')
+        self.assertEqual(fetch_single_flight('t:neg-exp', lambda: 'ok')['data'], 'ok')
+
+
+class ConsultasCrossWorkerTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.snapshots = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.snapshots, ignore_errors=True)
+        override = override_settings(OXIRA_CONSULTAS_SNAPSHOT_DIR=self.snapshots)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_cold_miss_waits_for_other_worker_and_adopts_snapshot(self):
+        # Outro worker segura a trava (arquivo) e grava o snapshot logo depois.
+        self.assertTrue(consultas_snapshot.claim('t:xw', 30))
+
+        def other_worker():
+            time.sleep(0.2)
+            consultas_snapshot.save('t:xw', {'_swr': 1, 'data': 'theirs', 'fetched_at': time.time()})
+            consultas_snapshot.release('t:xw')
+
+        threading.Thread(target=other_worker).start()
+        fetch = mock.Mock(return_value='mine')
+        self.assertEqual(cached_fetch('t:xw', fetch, soft_ttl=60).data, 'theirs')
+        fetch.assert_not_called()
+
+    def test_expired_snapshots_are_pruned_on_load(self):
+        old_time = time.time() - consultas_snapshot.MAX_AGE_SECONDS - 60
+        consultas_snapshot.save('t:old', {'_swr': 1, 'data': 'old', 'fetched_at': old_time})
+        consultas_snapshot.save('t:new', {'_swr': 1, 'data': 'new', 'fetched_at': time.time()})
+        old_path = consultas_snapshot._path(self.snapshots, 't:old')
+        os.utime(old_path, (old_time, old_time))
+        self.assertEqual(set(consultas_snapshot.load_all()), {'t:new'})
+        self.assertFalse(os.path.exists(old_path))
+        self.assertIsNone(consultas_snapshot.load('t:old'))
+
+    def test_cold_miss_fetches_when_nobody_holds_the_lock(self):
+        self.assertEqual(cached_fetch('t:xw-free', lambda: 'mine', soft_ttl=60).data, 'mine')
+        self.assertEqual(consultas_snapshot.load('t:xw-free')['data'], 'mine')
+        self.assertFalse(consultas_snapshot.claimed('t:xw-free', 30))
+
+
+@override_settings(OXIRA_CONSULTAS_SNAPSHOT_DIR='')
+class CircuitBreakerTests(SimpleTestCase):
+    provider = 'teste'
+
+    def setUp(self):
+        cache.clear()
+        self.now = 1_000_000.0
+        patcher = mock.patch('blog.consultas_breaker.time')
+        self.clock = patcher.start()
+        self.clock.time.side_effect = lambda: self.now
+        self.addCleanup(patcher.stop)
+
+    def _call(self, fetch):
+        return consultas_breaker.guard(self.provider, fetch)()
+
+    def _fail(self):
+        with self.assertRaises(URLError):
+            self._call(mock.Mock(side_effect=URLError('down')))
+
+    def _state(self):
+        return consultas_breaker._load(self.provider)
+
+    def _trip(self):
+        for _ in range(consultas_breaker.FAILURE_THRESHOLD):
+            self._fail()
+
+    def test_opens_after_threshold_failures(self):
+        for _ in range(consultas_breaker.FAILURE_THRESHOLD - 1):
+            self._fail()
+        self.assertEqual(self._state()['state'], consultas_breaker.CLOSED)
+        self._fail()
+        self.assertEqual(self._state()['state'], consultas_breaker.OPEN)
+        self.assertEqual(self._state()['open_seconds'], consultas_breaker.OPEN_SECONDS)
+
+    def test_failures_outside_window_do_not_add_up(self):
+        for _ in range(consultas_breaker.FAILURE_THRESHOLD - 1):
+            self._fail()
+        self.now += consultas_breaker.FAILURE_WINDOW_SECONDS + 1
+        self._fail()
+        self.assertEqual(self._state()['state'], consultas_breaker.CLOSED)
+        self.assertEqual(self._state()['failures'], 1)
+
+    def test_client_errors_do_not_count(self):
+        for _ in range(consultas_breaker.FAILURE_THRESHOLD):
+            with self.assertRaises(HTTPError):
+                self._call(mock.Mock(side_effect=HTTPError('u', 404, 'nf', None, None)))
+        self.assertEqual(self._state()['state'], consultas_breaker.CLOSED)
+
+    def test_open_fails_fast_without_calling(self):
+        self._trip()
+        fetch = mock.Mock(return_value='ok')
+        with self.assertRaises(CircuitOpen) as ctx:
+            self._call(fetch)
+        fetch.assert_not_called()
+        self.assertEqual(ctx.exception.retry_after, consultas_breaker.OPEN_SECONDS)
+
+    def test_half_open_probe_success_closes(self):
+        self._trip()
+        self.now += consultas_breaker.OPEN_SECONDS
+        self.assertEqual(self._call(lambda: 'ok'), 'ok')
+        state = self._state()
+        self.assertEqual(state['state'], consultas_breaker.CLOSED)
+        self.assertEqual(state['failures'], 0)
+
+    def test_only_one_probe_at_a_time(self):
+        self._trip()
+        self.now += consultas_breaker.OPEN_SECONDS
+        seen = []
+
+        def probe():
+            # Enquanto o probe está em voo, outra chamada falha na hora.
+            with self.assertRaises(CircuitOpen):
+                self._call(lambda: 'outro')
+            seen.append(self._state()['state'])
+            return 'ok'
+
+        self._call(probe)
+        self.assertEqual(seen, [consultas_breaker.HALF_OPEN])
+
+    def test_failed_probe_doubles_backoff_up_to_max(self):
+        self._trip()
+        expected = consultas_breaker.OPEN_SECONDS
+        for _ in range(6):
+            self.now = self._state()['open_until']
+            self._fail()
+            expected = min(expected * 2, consultas_breaker.MAX_OPEN_SECONDS)
+            state = self._state()
+            self.assertEqual(state['state'], consultas_breaker.OPEN)
+            self.assertEqual(state['open_seconds'], expected)
+            self.assertEqual(state['open_until'], self.now + expected)
+        self.assertEqual(expected, 5 * 60)
+
+
+class SharedCircuitBreakerTests(CircuitBreakerTests):
+    # Mesmo comportamento com o estado no diretório dos snapshots, visível a todos os workers.
+
+    def setUp(self):
+        super().setUp()
+        self.snapshots = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.snapshots, ignore_errors=True)
+        override = override_settings(OXIRA_CONSULTAS_SNAPSHOT_DIR=self.snapshots)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_state_is_shared_between_workers(self):
+        self._trip()
+        # Outro worker: LocMem vazio, mesmo diretório.
+        cache.clear()
+        fetch = mock.Mock(return_value='ok')
+        with self.assertRaises(CircuitOpen):
+            self._call(fetch)
+        fetch.assert_not_called()
+        [row] = consultas_breaker.snapshot([self.provider])
+        self.assertEqual(row['state'], consultas_breaker.OPEN)
+        self.assertEqual(row['trips'], 1)
+
+    def test_probe_lock_is_shared_between_workers(self):
+        self._trip()
+        self.now += consultas_breaker.OPEN_SECONDS
+        # Outro worker está com o probe em voo.
+        self.assertTrue(consultas_snapshot.claim(consultas_breaker._probe_key(self.provider), 15))
+        fetch = mock.Mock(return_value='ok')
+        with self.assertRaises(CircuitOpen):
+            self._call(fetch)
+        fetch.assert_not_called()
+
+
+@override_settings(OXIRA_CONSULTAS_SNAPSHOT_DIR='', OXIRA_CONSULTAS_NAGER=False)
+class HolidaysTests(SimpleTestCase):
+    # Ano: (Páscoa, Carnaval, Sexta-feira Santa, Corpus Christi)
+    MOVABLE = {
+        2008: ('2008-03-23', ('2008-02-04', '2008-02-05'), '2008-03-21', '2008-05-22'),
+        2019: ('2019-04-21', ('2019-03-04', '2019-03-05'), '2019-04-19', '2019-06-20'),
+        2024: ('2024-03-31', ('2024-02-12', '2024-02-13'), '2024-03-29', '2024-05-30'),
+        2025: ('2025-04-20', ('2025-03-03', '2025-03-04'), '2025-04-18', '2025-06-19'),
+        2026: ('2026-04-05', ('2026-02-16', '2026-02-17'), '2026-04-03', '2026-06-04'),
+        2038: ('2038-04-25', ('2038-03-08', '2038-03-09'), '2038-04-23', '2038-06-24'),
+    }
+
+    def _dates(self, year, local_name):
+        return tuple(h['date'] for h in national_holidays(year) if h['localName'] == local_name)
+
+    def test_easter_based_holidays(self):
+        for year, (sunday, carnival, good_friday, corpus) in self.MOVABLE.items():
+            with self.subTest(year=year):
+                self.assertEqual(easter(year).isoformat(), sunday)
+                self.assertEqual(self._dates(year, 'Carnaval'), carnival)
+                self.assertEqual(self._dates(year, 'Sexta-feira Santa'), (good_friday,))
+                self.assertEqual(self._dates(year, 'Corpus Christi'), (corpus,))
+
+    def test_year_is_sorted_and_respects_since(self):
+        dates = [h['date'] for h in national_holidays(2024)]
+        self.assertEqual(dates, sorted(dates))
+        self.assertIn('2024-11-20', dates)
+        self.assertNotIn('2023-11-20', [h['date'] for h in national_holidays(2023)])
+
+    def test_holidays_on(self):
+        self.assertEqual([h['localName'] for h in holidays_on(date(2025, 4, 18))], ['Sexta-feira Santa'])
+        self.assertEqual(holidays_on(date(2025, 4, 17)), [])
+
+    def test_next_holiday_crosses_year(self):
+        self.assertEqual(next_holiday(date(2024, 12, 24))['date'], '2024-12-25')
+        self.assertEqual(next_holiday(date(2024, 12, 25))['date'], '2025-01-01')
+        self.assertEqual(next_holiday(date(2024, 12, 31))['date'], '2025-01-01')
+
+    def test_next_holiday_is_strictly_after(self):
+        self.assertEqual(next_holiday(date(2025, 1, 1))['date'], '2025-03-03')
+        self.assertEqual(next_holiday(date(2026, 1, 1))['date'], '2026-02-16')
+
+
+class ThumbnailTests(SimpleTestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media)
+        override.enable()
+        self.addCleanup(override.disable)
+        os.makedirs(os.path.join(self.media, 'posts'))
+        Image.new('RGB', (800, 600), (200, 10, 10)).save(os.path.join(self.media, 'posts', 'a.jpg'))
+
+    def _get(self, url):
+        response = self.client.get(url)
+        if hasattr(response, 'streaming_content'):
+            response.close()
+        return response
+
+    def _signed(self, name, spec='100x100-cover.webp', version='0'):
+        url = reverse('media_thumbnail', kwargs={'spec': spec, 'name': name})
+        return f"{url}?v={version}&s={sign(name, ThumbSpec.parse(spec), version)}"
+
+    def test_valid_url_renders(self):
+        response = self._get(thumb_url('posts/a.jpg', 120, 80))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertIn('immutable', response['Cache-Control'])
+
+    def test_bad_signature_is_forbidden(self):
+        url = thumb_url('posts/a.jpg', 120, 80)
+        self.assertEqual(self._get(url[:-4] + '0000').status_code, 403)
+        self.assertEqual(self._get(url.split('&s=')[0]).status_code, 403)
+
+    def test_signature_is_bound_to_spec(self):
+        url = thumb_url('posts/a.jpg', 120, 80).replace('120x80', '121x80')
+        self.assertEqual(self._get(url).status_code, 403)
+
+    def test_out_of_range_spec_is_rejected(self):
+        for raw in ('0x100-cover.webp', '2001x100-cover.webp', '100x100-stretch.webp', '100x100-cover.gif', 'abc'):
+            with self.subTest(spec=raw):
+                with self.assertRaises(InvalidThumbnail):
+                    ThumbSpec.parse(raw)
+        url = reverse('media_thumbnail', kwargs={'spec': '4000x4000-cover.webp', 'name': 'posts/a.jpg'})
+        self.assertEqual(self._get(f"{url}?v=0&s=x").status_code, 403)
+
+    def _cached_names(self):
+        root = os.path.join(self.media, thumbnails.CACHE_DIR)
+        return [os.path.relpath(os.path.join(d, f), self.media) for d, _, fs in os.walk(root) for f in fs]
+
+    def test_sources_outside_media_or_in_cache_are_rejected(self):
+        self.assertEqual(self._get(thumb_url('posts/a.jpg', 50, 50)).status_code, 200)
+        spec = ThumbSpec.parse('100x100-cover.webp')
+        for name in ['../a.jpg', 'posts/../../a.jpg'] + self._cached_names():
+            with self.subTest(name=name):
+                with self.assertRaises(InvalidThumbnail):
+                    get_thumbnail(name, spec, '0')
+                # Mesmo com assinatura válida, a view não serve.
+                self.assertEqual(self._get(self._signed(name)).status_code, 404)
+
+    def test_repeat_hit_reuses_cached_file(self):
+        url = thumb_url('posts/a.jpg', 64, 64, fmt='jpg')
+        with mock.patch.object(thumbnails, '_render', wraps=thumbnails._render) as render:
+            self.assertEqual(self._get(url).status_code, 200)
+            self.assertEqual(self._get(url).status_code, 200)
+        render.assert_called_once()
+        self.assertEqual(len(self._cached_names()), 1)
+
+    def test_failed_render_releases_its_lock(self):
+        spec = ThumbSpec.parse('90x90-cover.webp')
+        with mock.patch.object(thumbnails, '_render', side_effect=OSError('decode')):
+            for _ in range(3):
+                with self.assertRaises(OSError):
+                    get_thumbnail('posts/a.jpg', spec, '0')
+        self.assertEqual(thumbnails._render_locks, {})
+        self.assertEqual(self._cached_names(), [])
+
+
+class ContentAddressedStorageTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        self.storage = ContentAddressedStorage(location=self.media, base_url='/media/')
+        self.author = User.objects.create(username='autor')
+
+    def _files(self):
+        return sorted(os.path.relpath(os.path.join(d, f), self.media) for d, _, fs in os.walk(self.media) for f in fs)
+
+    def test_same_content_shares_one_name(self):
+        first = self.storage.save('posts/foto.jpg', ContentFile(b'mesmos bytes'))
+        second = self.storage.save('posts/outro-nome.JPG', ContentFile(b'mesmos bytes'))
+        other = self.storage.save('posts/foto.jpg', ContentFile(b'outros bytes'))
+        self.assertRegex(first, r'^posts/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$')
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        self.assertEqual(self._files(), sorted([first, other]))
+        with self.storage.open(first) as f:
+            self.assertEqual(f.read(), b'mesmos bytes')
+
+    def test_name_carries_the_content_hash(self):
+        name = self.storage.save('uploads/2024/a.png', ContentFile(b'abc'))
+        self.assertTrue(name.startswith('uploads/'))
+        self.assertEqual(content_hash(name), 'ba7816bf8f01cfea414140de5dae2223b00361a396177a9cb410ff61f20015ad')
+
+    def test_passthrough_prefixes_keep_their_names(self):
+        for name in ('posts/renditions/ab/abcdef-full-320x180.webp', 'posts/variants/foto-640.jpg'):
+            with self.subTest(name=name):
+                self.assertEqual(self.storage.save(name, ContentFile(b'derivado')), name)
+        self.assertEqual(len(self._files()), 2)
+
+    def test_release_keeps_referenced_files(self):
+        cover = self.storage.save('posts/capa.jpg', ContentFile(b'capa'))
+        inline = self.storage.save('uploads/corpo.png', ContentFile(b'corpo'))
+        orphan = self.storage.save('posts/solta.jpg', ContentFile(b'solta'))
+        post = Post.objects.create(
+            title='t',
+            slug='t',
+            author=self.author,
+            content=f'<p><a href="/media/{inline}">arquivo</a></p>',
+        )
+        Post.objects.filter(pk=post.pk).update(image=cover)
+
+        self.assertFalse(release(self.storage, cover))
+        self.assertFalse(release(self.storage, inline))
+        self.assertTrue(release(self.storage, orphan))
+        self.assertEqual(self._files(), sorted([cover, inline]))
+
+        Post.objects.filter(pk=post.pk).update(image='', content='')
+        self.assertTrue(release(self.storage, cover))
+        self.assertTrue(release(self.storage, inline))
+        self.assertEqual(self._files(), [])
+
+
+class CrossRatesTests(SimpleTestCase):
+    TABLE = {
+        'base': 'EUR',
+        'rates': {
+            '2026-10-15': {'USD': 1.25, 'BRL': 6.25, 'GBP': 0.8},
+            '2026-10-16': {'USD': 1.2, 'BRL': 6.0, 'GBP': 0.9, 'XXX': 0},
+        },
+    }
+
+    def test_latest_crosses_through_eur(self):
+        self.assertEqual(cross_latest(self.TABLE, 'USD', ['BRL', 'EUR']), {
+            'amount': 1.0, 'base': 'USD', 'date': '2026-10-16', 'rates': {'BRL': 5.0, 'EUR': round(1 / 1.2, 6)},
+        })
+        # Sem símbolos: todas as moedas válidas menos a base.
+        self.assertEqual(set(cross_latest(self.TABLE, 'BRL', [])['rates']), {'USD', 'GBP', 'EUR'})
+
+    def test_range_is_windowed_by_end_and_days(self):
+        body = cross_range(self.TABLE, 'USD', 1, date(2026, 10, 16), ['BRL'])
+        self.assertEqual(body['start_date'], '2026-10-16')
+        self.assertEqual(body['rates'], {'2026-10-16': {'BRL': 5.0}})
+        self.assertEqual(cross_range(self.TABLE, 'USD', 7, date(2026, 10, 16), ['BRL'])['rates']['2026-10-15'], {'BRL': 5.0})
+
+    def test_unknown_currency(self):
+        with self.assertRaises(UnknownCurrency):
+            cross_latest(self.TABLE, 'XXX', ['BRL'])
+        with self.assertRaises(UnknownCurrency):
+            cross_range(self.TABLE, 'ABC', 7, date(2026, 10, 16))
+
+    def test_api_answers_any_base_from_the_canonical_table(self):
+        cache.clear()
+        consultas_response._memo.clear()
+        _put(fx_table_target(timezone.localdate()).cache_key, self.TABLE, age=0)
+        with override_settings(OXIRA_CONSULTAS_SNAPSHOT_DIR=''):
+            ok = self.client.get(reverse('api_consultas_fx_latest'), {'base': 'gbp', 'symbols': 'brl'})
+            unknown = self.client.get(reverse('api_consultas_fx_latest'), {'base': 'abc'})
+        self.assertEqual(ok.json()['rates'], {'BRL': round(6.0 / 0.9, 6)})
+        self.assertEqual(unknown.status_code, 400)
+
+
+class FxFetchStartTests(TestCase):
+    def _close(self, day):
+        MarketClose.objects.create(series=f"{consultas_series.FX_SERIES_PREFIX}USD", day=day, value=1.1)
+
+    def test_empty_history_fetches_whole_window(self):
+        end = date(2026, 10, 19)
+        self.assertEqual(
+            consultas_series.fx_fetch_start(end),
+            end - timedelta(days=consultas_series.HISTORY_DAYS - 1),
+        )
+
+    def test_weekend_after_friday_is_up_to_date(self):
+        self._close(date(2026, 10, 16))  # sexta
+        self.assertIsNone(consultas_series.fx_fetch_start(date(2026, 10, 17)))
+        self.assertIsNone(consultas_series.fx_fetch_start(date(2026, 10, 18)))
+        self.assertEqual(consultas_series.fx_fetch_start(date(2026, 10, 19)), date(2026, 10, 17))
+
+    def test_easter_holidays_are_up_to_date(self):
+        # Páscoa de 2026: 5/4. Sexta-feira Santa (3/4) e segunda (6/4) sem cotação do BCE.
+        self._close(date(2026, 4, 2))
+        self.assertIsNone(consultas_series.fx_fetch_start(date(2026, 4, 6)))
+        self.assertEqual(consultas_series.fx_fetch_start(date(2026, 4, 7)), date(2026, 4, 3))
+
+    def test_christmas_is_up_to_date(self):
+        self._close(date(2026, 12, 24))
+        self.assertIsNone(consultas_series.fx_fetch_start(date(2026, 12, 26)))
+
+
+@override_settings(OXIRA_CONSULTAS_SNAPSHOT_DIR='', OXIRA_CONSULTAS_PREFETCH=False)
+class FxTableTargetTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_key_does_not_change_with_the_day(self):
+        self.assertEqual(
+            fx_table_target(date(2026, 10, 18)).cache_key,
+            fx_table_target(date(2026, 10, 19)).cache_key,
+        )
+
+    def test_new_day_serves_yesterdays_table_and_refreshes(self):
+        yesterday = timezone.localdate() - timedelta(days=1)
+        table = {'base': 'EUR', 'rates': {yesterday.isoformat(): {'BRL': 6.0, 'USD': 1.2}}}
+        _put(fx_table_target(yesterday).cache_key, table, age=FX_TTL + 60)
+        with mock.patch.object(consultas_cache, 'refresh_in_background') as refresh:
+            response = self.client.get(reverse('api_consultas_fx_range'), {'base': 'USD', 'days': '7'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['current'], {'date': yesterday.isoformat(), 'rate': 5.0})
+        refresh.assert_called_once()
+
+
+@override_settings(OXIRA_CONSULTAS_SNAPSHOT_DIR='')
+class MarketHistoryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_fx_fetch_only_asks_for_new_days_and_merges(self):
+        consultas_series.store_fx_table({'rates': {
+            '2026-10-14': {'USD': 1.1, 'BRL': 6.1},
+            '2026-10-15': {'USD': 1.2, 'BRL': 6.2},
+        }})
+        new_day = {'rates': {'2026-10-16': {'USD': 1.3, 'BRL': 6.3}, 'lixo': {'USD': 1.0}}}
+        with mock.patch('blog.consultas_upstream.http_get_json', return_value=new_day) as upstream:
+            table = fx_table_target(date(2026, 10, 16)).fetch()
+        self.assertIn('/2026-10-16..2026-10-16?from=EUR', upstream.call_args.args[0])
+        self.assertEqual(list(table['rates']), ['2026-10-14', '2026-10-15', '2026-10-16'])
+        self.assertEqual(table['rates']['2026-10-16'], {'USD': 1.3, 'BRL': 6.3})
+
+        # Em dia: nenhuma chamada, a tabela sai só do histórico.
+        with mock.patch('blog.consultas_upstream.http_get_json') as upstream:
+            fx_table_target(date(2026, 10, 16)).fetch()
+        upstream.assert_not_called()
+
+    def test_store_skips_invalid_points(self):
+        stored = consultas_series.store_fx_table({'rates': {
+            '2026-10-15': {'USD': 1.2, 'BRL': 0, 'GBP': 'x'},
+            'ontem': {'USD': 1.0},
+        }})
+        self.assertEqual(stored, 1)
+        self.assertEqual(consultas_series.store_fx_table([]), 0)
+
+    def test_crypto_point_of_the_day_is_rewritten(self):
+        day = datetime(2026, 10, 19, tzinfo=dt_timezone.utc)
+        ms = int(day.timestamp() * 1000)
+        consultas_series.store_crypto_chart('bitcoin', {'prices': [[ms, 100.0], [ms + 3600_000, 110.0]]})
+        consultas_series.store_crypto_chart('bitcoin', {'prices': [[ms + 7200_000, 120.0]]})
+        chart = consultas_series.crypto_chart('bitcoin', day.date() - timedelta(days=1), day.date())
+        self.assertEqual(chart['prices'], [[ms, 120.0]])
+        # O dia de hoje continua mudando: nunca days=0.
+        self.assertEqual(consultas_series.crypto_fetch_days('bitcoin', day.date()), 1)
+        self.assertEqual(consultas_series.crypto_fetch_days('bitcoin', day.date() + timedelta(days=2)), 2)
+
+
+@override_settings(OXIRA_CONSULTAS_SNAPSHOT_DIR='', OXIRA_CONSULTAS_PREFETCH=False)
+class CryptoPricesProjectionTests(SimpleTestCase):
+    SNAPSHOT = {coin: {'brl': float(i + 1), 'usd': float(i + 1) / 5} for i, coin in enumerate(CRYPTO_ALLOWED_IDS)}
+
+    def setUp(self):
+        cache.clear()
+        consultas_response._memo.clear()
+
+    def _get(self, ids):
+        return self.client.get(reverse('api_consultas_crypto_prices'), {'ids': ids}).json()
+
+    def test_one_upstream_call_serves_every_subset(self):
+        with mock.patch('blog.consultas_upstream.http_get_json', return_value=self.SNAPSHOT) as upstream:
+            first = self._get('solana,bitcoin')
+            second = self._get('dogecoin,nada,solana,solana')
+            default = self._get('')
+        upstream.assert_called_once()
+        self.assertIn('ids=' + ','.join(CRYPTO_ALLOWED_IDS), upstream.call_args.args[0])
+        self.assertEqual(list(first), ['solana', 'bitcoin'])
+        self.assertEqual(list(second), ['dogecoin', 'solana'])
+        self.assertEqual(second['dogecoin'], self.SNAPSHOT['dogecoin'])
+        self.assertEqual(list(default), ['bitcoin', 'ethereum'])
+
+
+@override_settings(OXIRA_CONSULTAS_SNAPSHOT_DIR='', OXIRA_CONSULTAS_PREFETCH=False)
+class DayfactsFallbackTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        consultas_response._memo.clear()
+        override = override_settings(OXIRA_DAYFACTS_INDEX=os.path.join(tempfile.gettempdir(), 'oxira-sem-indice.json.gz'))
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def _get(self):
+        return self.client.get(reverse('api_consultas_dayfacts_today')).json()
+
+    def test_day_outside_index_never_waits_for_wikipedia(self):
+        with mock.patch('blog.views.refresh_in_background') as refresh, \
+                mock.patch('blog.consultas_upstream.load_wikipedia_onthisday') as upstream:
+            response = self.client.get(reverse('api_consultas_dayfacts_today'))
+        body = response.json()
+        self.assertTrue(body['ok'])
+        self.assertTrue(body['stale'])
+        upstream.assert_not_called()
+        refresh.assert_called_once()
+        self.assertEqual(refresh.call_args[0][0], wikipedia_onthisday_target(timezone.localdate()).cache_key)
+        # Corpo stale não fica no memo pelos 5 minutos.
+        self.assertIn('max-age=0', response['Cache-Control'])
+
+    def test_cached_wikipedia_items_are_merged(self):
+        item = {'kind': 'fato', 'title': 'Algo aconteceu', 'about': '', 'ia_summary': 'x', 'source': 'wikipedia'}
+        _put(wikipedia_onthisday_target(timezone.localdate()).cache_key, [item], age=10)
+        with mock.patch('blog.views.refresh_in_background') as refresh:
+            body = self._get()
+        refresh.assert_not_called()
+        self.assertNotIn('stale', body)
+        self.assertIn('Algo aconteceu', [i['title'] for i in body['items']])
+
+
+class DayfactsIndexTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.path = os.path.join(directory, 'dayfacts.json.gz')
+        override = override_settings(OXIRA_DAYFACTS_INDEX=self.path, OXIRA_CONSULTAS_SNAPSHOT_DIR='')
+        override.enable()
+        self.addCleanup(override.disable)
+        cache.clear()
+        consultas_response._memo.clear()
+
+    def _build(self):
+        def wikipedia(day):
+            if (day.month, day.day) == (10, 19):
+                raise URLError('fora')
+            return [{'kind': 'fato', 'title': f"Wiki {day:%d/%m}", 'about': '', 'ia_summary': 'x', 'source': 'wikipedia'}]
+
+        out = io.StringIO()
+        with mock.patch('blog.management.commands.build_dayfacts_index.load_wikipedia_onthisday', side_effect=wikipedia):
+            call_command('build_dayfacts_index', year=2026, sleep=0, stdout=out)
+        return out.getvalue()
+
+    def test_build_and_lookup(self):
+        # Processo que já olhou (sem índice) pega o arquivo novo na próxima conferida do mtime.
+        self.assertIsNone(dayfacts_lookup(date(2026, 10, 20)))
+        with mock.patch.object(consultas_dayfacts, '_INDEX_RECHECK_SECONDS', 0):
+            output = self._build()
+            self.assertIsNotNone(dayfacts_lookup(date(2026, 10, 20)))
+        self.assertIn('365 dia(s)', output)
+        titles = [i['title'] for i in dayfacts_lookup(date(2026, 9, 7))]
+        self.assertIn('Independência do Brasil (1822)', titles)
+        self.assertIn('Wiki 07/09', titles)
+        self.assertIsNotNone(dayfacts_lookup(date(2028, 2, 29)))
+        # Dia em que a Wikipedia falhou fica fora: o request usa o fallback.
+        self.assertIsNone(dayfacts_lookup(date(2026, 10, 19)))
+
+    def test_api_serves_the_indexed_day_without_upstream(self):
+        self._build()
+        today = date(2026, 10, 20)
+        with mock.patch('blog.views.timezone.localdate', return_value=today), \
+                mock.patch('blog.views.refresh_in_background') as refresh:
+            body = self.client.get(reverse('api_consultas_dayfacts_today')).json()
+        refresh.assert_not_called()
+        self.assertEqual(body['date'], today.isoformat())
+        self.assertNotIn('stale', body)
+        self.assertIn('Wiki 20/10', [i['title'] for i in body['items']])
+
+
+@override_settings(OXIRA_CONSULTAS_SNAPSHOT_DIR='')
+class PrefetchDayfactsTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.fetches = {'wikipedia': mock.Mock(return_value=[]), 'frankfurter': mock.Mock(return_value={})}
+        targets = [
+            UpstreamTarget(f"t:prefetch:{p}", p, 60, fetch, mock.Mock()) for p, fetch in self.fetches.items()
+        ]
+        patcher = mock.patch('blog.consultas_prefetch.warm_targets', return_value=targets)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _run(self, indexed):
+        with mock.patch('blog.consultas_prefetch.dayfacts_lookup', return_value=indexed):
+            ConsultasPrefetcher(min_interval={}).run_once(date(2026, 10, 19))
+
+    def test_day_in_index_skips_wikipedia(self):
+        self._run(indexed=[])
+        self.fetches['wikipedia'].assert_not_called()
+        self.fetches['frankfurter'].assert_called_once()
+
+    def test_day_missing_from_index_is_warmed(self):
+        self._run(indexed=None)
+        self.fetches['wikipedia'].assert_called_once()
+
+
+class ConsultasResponseMemoTests(SimpleTestCase):
+    PAYLOAD = {'ok': True, 'series': [{'date': f"2026-10-{d:02d}", 'rate': 5.0 + d / 100} for d in range(1, 31)], 'nome': 'câmbio'}
+
+    def setUp(self):
+        consultas_response._memo.clear()
+        self.factory = RequestFactory()
+        self.build = mock.Mock(return_value=(self.PAYLOAD, 120))
+
+    def _get(self, **headers):
+        request = self.factory.get('/api/consultas/x/', headers=headers)
+        return consultas_response.cached_json_response(request, 'k', self.build)
+
+    def test_hit_reuses_the_serialized_body(self):
+        first = self._get()
+        second = self._get()
+        self.build.assert_called_once()
+        self.assertEqual(json.loads(second.content), self.PAYLOAD)
+        self.assertEqual(first.content, second.content)
+        self.assertIn('câmbio', second.content.decode('utf-8'))
+        self.assertEqual(second['Vary'], 'Accept-Encoding')
+        self.assertRegex(second['Cache-Control'], r'^public, max-age=1[12]\d$')
+
+    def test_gzip_variant_and_q_zero(self):
+        resp = self._get(accept_encoding='gzip, deflate')
+        self.assertEqual(resp['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(resp.content)), self.PAYLOAD)
+        self.assertTrue(resp['ETag'].endswith('-gz"'))
+        self.assertFalse(self._get(accept_encoding='gzip;q=0').has_header('Content-Encoding'))
+
+    def test_any_variant_etag_revalidates(self):
+        etag = self._get(accept_encoding='gzip')['ETag']
+        resp = self._get(if_none_match=f'W/{etag}')
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(resp.content, b'')
+        self.assertEqual(self._get(if_none_match='"outro"').status_code, 200)
+
+    def test_brotli_when_available(self):
+        if consultas_response.brotli is None:
+            self.skipTest('brotli não instalado')
+        resp = self._get(accept_encoding='gzip, br')
+        self.assertEqual(resp['Content-Encoding'], 'br')
+        self.assertEqual(json.loads(consultas_response.brotli.decompress(resp.content)), self.PAYLOAD)
+
+    def test_stale_body_is_held_briefly_and_must_revalidate(self):
+        self.build.return_value = ({'ok': True}, 0)
+        resp = self._get(accept_encoding='gzip')
+        self.assertEqual(resp['Cache-Control'], 'public, max-age=0, must-revalidate')
+        # Corpo pequeno: sem compressão.
+        self.assertFalse(resp.has_header('Content-Encoding'))
+        self._get()
+        self.build.assert_called_once()
+        with mock.patch('blog.consultas_response.time.time', return_value=time.time() + consultas_response.MIN_MEMO_SECONDS + 1):
+            self._get()
+        self.assertEqual(self.build.call_count, 2)
+
+    def test_fresh_for_uses_the_oldest_source(self):
+        now = time.time()
+        fresh = consultas_cache.CachedValue(data=None, fetched_at=now - 10, stale=False)
+        older = consultas_cache.CachedValue(data=None, fetched_at=now - 50, stale=False)
+        self.assertIn(consultas_response.fresh_for(fresh, older, ttl=60), (9, 10))
+        self.assertEqual(consultas_response.fresh_for(fresh, consultas_cache.CachedValue(None, now, True), ttl=60), 0)
+
+
+class PercentileTests(SimpleTestCase):
+    def test_nearest_rank(self):
+        values = [float(v) for v in range(1, 101)]
+        self.assertEqual(percentile(values, 50), 51.0)
+        self.assertEqual(percentile(values, 99), 99.0)
+        self.assertEqual(percentile(values, 100), 100.0)
+        self.assertEqual(percentile([3.0, 1.0, 2.0], 0), 1.0)
+
+    def test_empty_is_zero(self):
+        self.assertEqual(percentile([], 95), 0.0)
+
+
+@override_settings(OXIRA_CONSULTAS_SNAPSHOT_DIR='', OXIRA_CONSULTAS_NAGER=False)
+class AsyncConsultasOffLoopTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def _loop_thread_calls(self, name, run):
+        # Devolve quantas vezes `name` (de blog.views) rodou na thread do event loop.
+        from blog import async_views
+
+        on_loop = []
+        real = getattr(async_views, name)
+
+        def spy(*args):
+            on_loop.append(threading.current_thread() is loop_thread)
+            return real(*args)
+
+        async def main():
+            nonlocal loop_thread
+            loop_thread = threading.current_thread()
+            with mock.patch.object(async_views, name, spy):
+                return await run(async_views)
+
+        loop_thread = None
+        asyncio.run(main())
+        self.assertTrue(on_loop)
+        return on_loop.count(True)
+
+    def test_dayfacts_index_is_read_off_the_loop(self):
+        with mock.patch('blog.async_views.arefresh_in_background'):
+            calls = self._loop_thread_calls('_dayfacts_indexed', lambda av: av._adayfacts_payload(date(2026, 10, 19)))
+        self.assertEqual(calls, 0)
+
+    def test_holidays_are_built_off_the_loop(self):
+        with mock.patch('blog.async_views.arefresh_in_background'):
+            calls = self._loop_thread_calls('_holidays_payload', lambda av: av._abundle([], [], 7))
+        self.assertEqual(calls, 0)
+
+
+def _jpeg(size=(1600, 900), color=(10, 120, 200)):
+    buf = io.BytesIO()
+    Image.new('RGB', size, color).save(buf, 'JPEG')
+    return buf.getvalue()
+
+
+class ImageIngestTests(SimpleTestCase):
+    def _photo(self, size=(4000, 3000), orientation=None):
+        buf = io.BytesIO()
+        exif = Image.Exif()
+        if orientation:
+            exif[0x0112] = orientation
+        Image.new('RGB', size, (90, 60, 30)).save(buf, 'JPEG', quality=70, exif=exif.tobytes())
+        buf.seek(0)
+        return buf
+
+    def test_jpeg_is_decoded_near_the_target(self):
+        started = time.monotonic()
+        with image_ingest.decoded(self._photo(), (480, 1), label='foto') as (region, report):
+            self.assertGreaterEqual(region.width, 480)
+            self.assertLess(region.width, 4000 // 2)
+        self.assertTrue(report.draft)
+        self.assertEqual(report.source_size, (4000, 3000))
+        self.assertEqual(report.decoded_size, (500, 375))
+        # Bem abaixo dos ~46 MB do decode inteiro.
+        self.assertLess(report.peak_bytes, 4000 * 3000 * 4 // 20)
+        self.assertEqual([r['label'] for r in image_ingest.recent_reports(started)], ['foto'])
+
+    def test_box_is_in_original_coordinates_after_exif_rotation(self):
+        photo = self._photo(size=(1200, 800), orientation=6)
+        self.assertEqual(image_ingest.probe(photo), (800, 1200))
+        photo.seek(0)
+        with image_ingest.decoded(photo, (100, 100), (0, 600, 800, 1200)) as (region, _report):
+            self.assertEqual(region.width * 600, region.height * 800)
+            self.assertGreaterEqual(region.width, 100)
+
+    @override_settings(OXIRA_IMAGE_MAX_PIXELS=1_000_000)
+    def test_pixel_budget(self):
+        with self.assertRaises(ImageTooLarge):
+            image_ingest.probe(self._photo())
+        with self.assertRaises(ImageTooLarge):
+            with image_ingest.decoded(self._photo(), (100, 100)):
+                pass
+        upload = mock.Mock(image=Image.new('RGB', (2000, 1000)))
+        with self.assertRaises(ValidationError):
+            image_ingest.validate_image_budget(upload)
+        image_ingest.validate_image_budget(mock.Mock(image=Image.new('RGB', (1000, 1000))))
+
+    def test_decodes_wait_for_a_free_slot(self):
+        slots = threading.BoundedSemaphore(1)
+        done = threading.Event()
+
+        def decode():
+            with image_ingest.decoded(self._photo((800, 600)), (100, 100)):
+                done.set()
+
+        with mock.patch.object(image_ingest, '_slots', slots):
+            slots.acquire()
+            worker = threading.Thread(target=decode)
+            worker.start()
+            self.assertFalse(done.wait(0.2))
+            slots.release()
+            self.assertTrue(done.wait(5))
+            worker.join()
+
+
+class CoverRenderTests(SimpleTestCase):
+    def test_cover_is_a_deterministic_jpeg_of_the_requested_size(self):
+        first = cover_render.render_cover('Final do campeonato', 'esportes', (640, 360))
+        self.assertEqual(first, cover_render.render_cover('Final do campeonato', 'esportes', (640, 360)))
+        self.assertNotEqual(first, cover_render.render_cover('Outro título', 'esportes', (640, 360)))
+        with Image.open(io.BytesIO(first)) as img:
+            self.assertEqual((img.format, img.size), ('JPEG', (640, 360)))
+
+    def test_only_the_title_is_drawn_per_post(self):
+        cover_render.render_cover('Tática do jogo', 'esportes', (320, 180))
+        before = cover_render._base_layer.cache_info()
+        cover_render.render_cover('Jogo de volta', 'esportes', (320, 180))
+        after = cover_render._base_layer.cache_info()
+        self.assertEqual((after.hits - before.hits, after.misses - before.misses), (1, 0))
+
+    def test_gradient_runs_from_bg1_to_bg2(self):
+        img = cover_render._gradient((0, 100, 200), (200, 100, 0), (50, 11))
+        self.assertEqual(img.size, (50, 11))
+        self.assertEqual(img.getpixel((0, 0)), (0, 100, 200))
+        self.assertEqual(img.getpixel((49, 5)), (100, 100, 100))
+        self.assertEqual(img.getpixel((25, 10)), (200, 100, 0))
+
+
+class GeneratePostImagesTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media, MEDIA_URL='/media/')
+        override.enable()
+        self.addCleanup(override.disable)
+        author = User.objects.create(username='autor')
+        patcher = mock.patch.object(image_jobs, 'enqueue')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        for i in range(3):
+            Post.objects.create(title=f"Post {i}", slug=f"post-{i}", author=author, content='<p>x</p>')
+
+    def test_process_pool_renders_every_post(self):
+        out = io.StringIO()
+        call_command('generate_post_images', jobs=2, width=320, height=180, stdout=out)
+        output = out.getvalue()
+        self.assertIn('Render: 2 processo(s)', output)
+        self.assertIn('Concluído: 3 imagem(ns)', output)
+        for post in Post.objects.all():
+            with default_storage.open(post.image.name) as f, Image.open(f) as img:
+                self.assertEqual(img.size, (320, 180))
+        # Só posts sem imagem: rodar de novo não faz nada.
+        out = io.StringIO()
+        call_command('generate_post_images', jobs=1, stdout=out)
+        self.assertIn('Nenhum post para processar.', out.getvalue())
+
+
+class PostCoverVariantsTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media, MEDIA_URL='/media/', OXIRA_IMAGE_JOBS_SYNC=False)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.author = User.objects.create(username='autor')
+        patcher = mock.patch.object(image_jobs, 'enqueue')
+        self.enqueue = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.image = default_storage.save('posts/capa.jpg', ContentFile(_jpeg()))
+
+    def _post(self, slug='capa', crop=(100, 50, 1200, 675)):
+        x, y, w, h = crop
+        post = Post(title='Capa', slug=slug, author=self.author, content='<p>x</p>', image=self.image,
+                    image_crop_x=x, image_crop_y=y, image_crop_w=w, image_crop_h=h)
+        post.save()
+        return post
+
+    def _renditions(self):
+        root = os.path.join(self.media, post_images.RENDITIONS_DIR)
+        return sorted(f for _, _, fs in os.walk(root) for f in fs)
+
+    def test_save_schedules_and_job_builds_every_width_and_format(self):
+        post = self._post()
+        self.assertEqual(post.image_status, 'processing')
+        self.enqueue.assert_any_call('post', post.pk)
+        self.assertTrue(image_jobs.run_job('post', post.pk))
+        post.refresh_from_db()
+        self.assertEqual(post.image_status, 'ready')
+        variants = post.image_variants
+        # Crop de 1200px de largura: só as larguras que cabem, em 16:9.
+        self.assertEqual(sorted(variants['webp'], key=int), ['320', '640', '960'])
+        self.assertEqual((variants['width'], variants['height']), (960, 540))
+        sha = content_hash(self.image)
+        self.assertTrue(all(name.endswith(('.webp', '.jpg')) and f"/{sha[:24]}-c100_50_1300_725-" in name
+                            for fmt in ('webp', 'jpeg') for name in variants[fmt].values()))
+        self.assertFalse(post_images.refresh_variants(post))
+
+        html = post_image(post, sizes='(max-width: 640px) 100vw, 640px')
+        self.assertIn('<picture', html)
+        self.assertIn(' 960w', html)
+        self.assertIn('type="image/webp"', html)
+
+    def test_same_original_and_crop_reuse_the_renditions(self):
+        first = self._post('a')
+        image_jobs.run_job('post', first.pk)
+        files = self._renditions()
+        self.assertEqual(len(files), 6)
+        second = self._post('b')
+        with mock.patch.object(post_images, 'decoded', side_effect=AssertionError('decode repetido')):
+            self.assertTrue(image_jobs.run_job('post', second.pk))
+        second.refresh_from_db()
+        first.refresh_from_db()
+        self.assertEqual(second.image_variants['jpeg'], first.image_variants['jpeg'])
+        self.assertEqual(self._renditions(), files)
+
+    def test_failed_render_is_recorded_and_template_falls_back(self):
+        post = self._post()
+        with mock.patch.object(image_jobs, 'RETRY_BACKOFF_SECONDS', 0), \
+                mock.patch.object(post_images, 'decoded', side_effect=OSError('disco')):
+            self.assertFalse(image_jobs.run_job('post', post.pk))
+        post.refresh_from_db()
+        self.assertEqual(post.image_status, 'failed')
+        self.assertTrue(post_images.variants_failed(post))
+        self.assertNotIn('<picture', post_image(post))
+        self.assertIn(f'src="/media/{self.image}"', post_image(post))
+
+
+class ImageJobsTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media, MEDIA_URL='/media/', OXIRA_IMAGE_JOBS_SYNC=False)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.user = User.objects.create(username='autor')
+
+    def _profile_with_crop(self):
+        profile = self.user.profile
+        profile.avatar = default_storage.save('avatars/foto.jpg', ContentFile(_jpeg()))
+        profile.avatar_crop_x, profile.avatar_crop_y, profile.avatar_crop_w, profile.avatar_crop_h = 200, 100, 800, 800
+        return profile
+
+    def test_save_only_enqueues_after_commit(self):
+        profile = self._profile_with_crop()
+        with mock.patch.object(image_jobs, '_executor') as executor, \
+                self.captureOnCommitCallbacks(execute=True) as callbacks:
+            profile.save()
+            profile.save()
+            executor.submit.assert_not_called()
+        self.assertEqual(len(callbacks), 2)
+        # Um job por objeto na fila do processo.
+        executor.submit.assert_called_once_with(image_jobs.run_job, 'avatar', profile.pk)
+        profile.refresh_from_db()
+        self.assertEqual(profile.avatar_status, 'processing')
+        image_jobs._queued.discard(('avatar', profile.pk))
+
+    def test_avatar_job_crops_once_and_is_idempotent(self):
+        profile = self._profile_with_crop()
+        original = profile.avatar.name
+        with mock.patch.object(image_jobs, 'enqueue'):
+            profile.save()
+        self.assertTrue(image_jobs.run_job('avatar', profile.pk))
+        profile.refresh_from_db()
+        self.assertEqual(profile.avatar_status, 'ready')
+        self.assertNotEqual(profile.avatar.name, original)
+        self.assertIsNone(profile.avatar_crop_w)
+        with Image.open(profile.avatar.path) as img:
+            self.assertEqual(img.size, image_jobs.AVATAR_SIZE)
+        # Rodar de novo (retry, process_image_jobs) não recorta o recorte.
+        self.assertTrue(image_jobs.run_job('avatar', profile.pk))
+        self.assertEqual(UserProfile.objects.get(pk=profile.pk).avatar.name, profile.avatar.name)
+
+    def test_transient_error_is_retried(self):
+        profile = self._profile_with_crop()
+        with mock.patch.object(image_jobs, 'enqueue'):
+            profile.save()
+        real = image_jobs._crop_to_file
+        calls = []
+
+        def flaky(*args):
+            calls.append(args)
+            if len(calls) == 1:
+                raise OSError('NFS piscou')
+            return real(*args)
+
+        with mock.patch.object(image_jobs, 'RETRY_BACKOFF_SECONDS', 0), \
+                mock.patch.object(image_jobs, '_crop_to_file', side_effect=flaky):
+            self.assertTrue(image_jobs.run_job('avatar', profile.pk))
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(UserProfile.objects.get(pk=profile.pk).avatar_status, 'ready')
+
+    def test_image_over_budget_fails_without_retrying(self):
+        profile = self._profile_with_crop()
+        with mock.patch.object(image_jobs, 'enqueue'):
+            profile.save()
+        with mock.patch.object(image_jobs, '_crop_to_file', side_effect=ImageTooLarge('grande demais')) as crop:
+            self.assertFalse(image_jobs.run_job('avatar', profile.pk))
+        crop.assert_called_once()
+        self.assertEqual(UserProfile.objects.get(pk=profile.pk).avatar_status, 'failed')
+
+
+class InlineImagesTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media, MEDIA_URL='/media/', OXIRA_IMAGE_JOBS_SYNC=False)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.author = User.objects.create(username='autor')
+        patcher = mock.patch.object(image_jobs, 'enqueue')
+        self.enqueue = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _post(self, name, extra=''):
+        post = Post(title='t', slug=f"t-{Post.objects.count()}", author=self.author, content=f'<p><img src="/media/{name}"{extra}></p>')
+        post.save()
+        return post
+
+    def _inline_queued(self, post):
+        return mock.call('inline', post.pk) in self.enqueue.call_args_list
+
+    def test_save_uses_existing_renditions_without_decoding(self):
+        name = default_storage.save('uploads/a.jpg', ContentFile(_jpeg()))
+        self.assertTrue(inline_variants(name))
+        with mock.patch.object(post_images, 'decoded', side_effect=AssertionError('decode no save')):
+            post = self._post(name)
+        self.assertIn('srcset="/media/posts/renditions/', post.content)
+        self.assertIn('width="1280" height="720"', post.content)
+        self.assertIn('loading="lazy"', post.content)
+        self.assertFalse(self._inline_queued(post))
+
+    def test_missing_renditions_go_to_the_job(self):
+        name = default_storage.save('uploads/b.jpg', ContentFile(_jpeg(color=(1, 2, 3))))
+        with mock.patch.object(post_images, 'decoded', side_effect=AssertionError('decode no save')):
+            post = self._post(name)
+        # Dimensões vêm do cabeçalho; srcset só quando todas as larguras existirem.
+        self.assertIn('width="1280" height="720"', post.content)
+        self.assertNotIn('srcset', post.content)
+        self.assertTrue(self._inline_queued(post))
+
+        self.assertTrue(image_jobs.run_job('inline', post.pk))
+        post.refresh_from_db()
+        self.assertIn('srcset="/media/posts/renditions/', post.content)
+        self.assertIn('sizes="(max-width: 768px) 100vw, 768px"', post.content)
+
+    def test_failed_job_is_recorded_and_retried(self):
+        name = default_storage.save('uploads/d.jpg', ContentFile(_jpeg(color=(4, 5, 6))))
+        post = self._post(name)
+        self.assertEqual(post.content_images_status, 'processing')
+        real = post_images.build_variants
+
+        def fails_on_create(source, crop, *, create=True):
+            if create:
+                raise OSError('disco')
+            return real(source, crop, create=False)
+
+        with mock.patch.object(image_jobs, 'RETRY_BACKOFF_SECONDS', 0), \
+                mock.patch('blog.inline_images.build_variants', side_effect=fails_on_create):
+            self.assertFalse(image_jobs.run_job('inline', post.pk))
+        post.refresh_from_db()
+        self.assertEqual(post.content_images_status, 'failed')
+        self.assertNotIn('srcset', post.content)
+
+        call_command('process_image_jobs', stdout=io.StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.content_images_status, 'ready')
+        self.assertIn('srcset', post.content)
+
+    def test_legacy_name_is_not_hashed_on_save(self):
+        legacy = FileSystemStorage(location=self.media).save('uploads/legado.jpg', ContentFile(_jpeg()))
+        self.assertIsNone(content_hash(legacy))
+        with mock.patch.object(post_images, '_file_sha256', wraps=post_images._file_sha256) as sha:
+            post = self._post(legacy)
+            rewritten = self._post(legacy, extra=' srcset="/media/x.jpg 320w"')
+        sha.assert_not_called()
+        self.assertTrue(self._inline_queued(post))
+        self.assertFalse(self._inline_queued(rewritten))
+
+    def test_rewrite_is_idempotent_and_keeps_author_dimensions(self):
+        name = default_storage.save('uploads/c.jpg', ContentFile(_jpeg(color=(9, 9, 9))))
+        html = f'<p><img alt="x" src="/media/{name}" width="640" height="360"></p>'
+        once, pending = rewrite_content_images(html)
+        self.assertFalse(pending)
+        self.assertIn('width="640" height="360"', once)
+        self.assertEqual(rewrite_content_images(once)[0], once)
+        # Imagem de fora do MEDIA só ganha lazy/async.
+        external, _ = rewrite_content_images('<img src="https://exemplo.com/a.jpg">')
+        self.assertEqual(external, '<img src="https://exemplo.com/a.jpg" loading="lazy" decoding="async">')
+
+
+class FetchPostImagesCommandTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media, MEDIA_URL='/media/')
+        override.enable()
+        self.addCleanup(override.disable)
+        self.checkpoint = os.path.join(self.media, 'checkpoint.jsonl')
+        author = User.objects.create(username='autor')
+        for slug in ('a', 'b', 'c'):
+            Post.objects.create(title=f"Estádio {slug}", slug=slug, author=author, content='<p>x</p>')
+        for target in (mock.patch.object(image_jobs, 'enqueue'), mock.patch.object(fetch_post_images.time, 'sleep')):
+            target.start()
+            self.addCleanup(target.stop)
+    def _run(self, failing=()):
+        def search(query, **kwargs):
+            # Uma imagem por post (a query é o título, "Estádio <slug>").
+            slug = query.split()[-1]
+            return [fetch_post_images.CommonsImage(f"File:{slug}.jpg", f"https://upload.example/{slug}.jpg", None, 'CC0', None, False)]
+
+        def download(url, **kwargs):
+            if url.rsplit('/', 1)[-1] in failing:
+                raise URLError('fora')
+            return _jpeg()
+
+        out = io.StringIO()
+        with mock.patch.object(fetch_post_images, '_search_commons_images', side_effect=search) as searched, \
+                mock.patch.object(fetch_post_images, '_download_bytes', side_effect=download):
+            call_command(
+                'fetch_post_images', provider='commons', sleep=0, workers=3, no_cache=True,
+                checkpoint=self.checkpoint, stdout=out,
+            )
+        return searched, out.getvalue()
+
+    def test_interrupted_run_resumes_from_the_checkpoint(self):
+        _searched, output = self._run(failing={'b.jpg'})
+        self.assertIn('commons: 2 ok, 0 sem resultado, 1 erro(s)', output)
+        self.assertEqual(
+            sorted(Post.objects.exclude(image='').exclude(image__isnull=True).values_list('slug', flat=True)), ['a', 'c'],
+        )
+        self.assertIn('file=File:a.jpg', Post.objects.get(slug='a').internal_notes)
+        self.assertTrue(os.path.exists(self.checkpoint))
+
+        searched, output = self._run()
+        self.assertEqual([c.args[0] for c in searched.call_args_list], ['Estádio b'])
+        self.assertIn('Concluído: 1 ok, 0 erro(s), 0 pulado(s)', output)
+        # Rodada sem erros: o checkpoint some.
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_checkpoint_only_counts_the_same_kind_of_run(self):
+        run = fetch_post_images._checkpoint_run('commons', 1600, False)
+        with open(self.checkpoint, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'slug': 'a', 'run': run, 'status': 'ok'}) + "\n")
+            f.write(json.dumps({'slug': 'b', 'run': fetch_post_images._checkpoint_run('unsplash', 1600, False), 'status': 'ok'}) + "\n")
+            f.write(json.dumps({'slug': 'c', 'run': run, 'status': 'error'}) + "\n")
+            f.write('{"slug": "trunc')
+        self.assertEqual(fetch_post_images._load_checkpoint(self.checkpoint, run), {'a'})
+
+
+class RateLimiterTests(SimpleTestCase):
+    def test_pause_holds_every_thread_on_the_host(self):
+        limiter = fetch_post_images._Limiter(rate=1000, burst=5)
+        bucket = limiter.bucket('https://commons.wikimedia.org/w/api.php')
+        self.assertIs(limiter.bucket('https://commons.wikimedia.org/wiki/File:x'), bucket)
+        self.assertIsNot(limiter.bucket('https://source.unsplash.com/x'), bucket)
+        bucket.pause(0.2)
+        started = time.monotonic()
+        bucket.acquire()
+        self.assertGreaterEqual(time.monotonic() - started, 0.15)
+
+    def test_rate_spreads_calls_after_the_burst(self):
+        bucket = fetch_post_images._TokenBucket(rate=20, burst=2)
+        started = time.monotonic()
+        for _ in range(4):
+            bucket.acquire()
+        # 2 de rajada + 2 a 20/s.
+        self.assertGreaterEqual(time.monotonic() - started, 0.09)
+
+    def test_429_pauses_the_host_with_retry_after(self):
+        limiter = fetch_post_images._Limiter(rate=1000, burst=5)
+        url = 'https://commons.wikimedia.org/w/api.php'
+        too_many = HTTPError(url, 429, 'Too Many Requests', {'Retry-After': '7'}, None)
+        fn = mock.Mock(side_effect=[too_many, 'ok'])
+        with mock.patch.object(fetch_post_images._TokenBucket, 'pause') as pause:
+            self.assertEqual(fetch_post_images._with_retries(fn, url=url, limiter=limiter, tries=3, base_sleep=0.01, what='t'), 'ok')
+        pause.assert_called_once_with(7.0)
+        self.assertEqual(fn.call_count, 2)
+
+
+class CommonsSearchCacheTests(SimpleTestCase):
+    IMAGE = {
+        'page_title': 'File:Estadio.jpg', 'thumb_url': 'https://upload.example/estadio.jpg',
+        'description_url': None, 'license_short': 'CC BY-SA 4.0', 'artist': None, 'attribution_required': False,
+    }
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.cache = fetch_post_images._SearchCache(directory, ttl_seconds=60)
+        self.limiter = fetch_post_images._Limiter(rate=100, burst=10)
+        self.key = self.cache.key('football match', 640)
+
+    def _search(self):
+        return fetch_post_images._search_commons_images('football match', 640, self.limiter, self.cache)
+
+    def _stale(self):
+        self.cache.put(self.key, {'fetched_at': 0, 'etag': '"v1"', 'images': [self.IMAGE]})
+
+    def _response(self, status, body=b'', headers=None):
+        return http_client.HttpResponse(url='https://commons.wikimedia.org/w/api.php', status=status, headers=headers or {}, body=body)
+
+    def test_miss_is_stored_and_reused_by_the_next_run(self):
+        data = {'query': {'pages': {'1': {
+            'title': 'File:Estadio.jpg',
+            'imageinfo': [{'thumburl': 'https://upload.example/estadio.jpg', 'extmetadata': {'LicenseShortName': {'value': 'CC0'}}}],
+        }}}}
+        body = json.dumps(data).encode()
+        with mock.patch.object(fetch_post_images, '_http_get', return_value=self._response(200, body, {'ETag': '"v2"'})) as get:
+            images = self._search()
+        self.assertEqual(get.call_args.args[1], {})
+        self.assertEqual((images[0].page_title, images[0].license_short), ('File:Estadio.jpg', 'CC0'))
+        self.assertEqual(self.cache.get(self.key)['etag'], '"v2"')
+
+        # Outra rodada (cache novo no mesmo diretório), query com outra caixa/espaços: nenhuma chamada.
+        again = fetch_post_images._SearchCache(self.cache.directory, ttl_seconds=60)
+        with mock.patch.object(fetch_post_images, '_http_get') as get:
+            cached = fetch_post_images._search_commons_images('  Football Match ', 640, self.limiter, again)
+        get.assert_not_called()
+        self.assertEqual(cached, images)
+        self.assertEqual(again.stats['hit'], 1)
+        self.assertNotEqual(self.cache.key('football match', 1280), self.key)
+
+    def test_unexpected_304_without_entry_is_not_an_error(self):
+        with mock.patch.object(fetch_post_images, '_http_get', return_value=self._response(304)):
+            self.assertEqual(self._search(), [])
+        self.assertIsNone(self.cache.get(self.key))
+
+    def test_non_json_body_keeps_the_stale_entry(self):
+        self._stale()
+        with mock.patch.object(fetch_post_images, '_http_get', return_value=self._response(200, b'<html>manutencao</html>')):
+            images = self._search()
+        self.assertEqual([img.page_title for img in images], ['File:Estadio.jpg'])
+        self.assertEqual(self.cache.get(self.key)['fetched_at'], 0)
+
+    def test_304_renews_the_entry(self):
+        self._stale()
+        with mock.patch.object(fetch_post_images, '_http_get', return_value=self._response(304)) as get:
+            images = self._search()
+        self.assertEqual(get.call_args.args[1], {'If-None-Match': '"v1"'})
+        self.assertEqual(len(images), 1)
+        self.assertTrue(self.cache.fresh(self.cache.get(self.key)))
+        self.assertEqual(self.cache.stats['revalidated'], 1)
+
+    def test_waiter_serves_stale_instead_of_queueing_behind_a_paused_fetch(self):
+        self._stale()
+        lock = self.cache.lock(self.key)
+        lock.acquire()
+        self.addCleanup(lock.release)
+        with mock.patch.object(fetch_post_images, 'SEARCH_LOCK_WAIT_SECONDS', 0.01), \
+                mock.patch.object(fetch_post_images, '_http_get') as get:
+            images = self._search()
+        get.assert_not_called()
+        self.assertEqual(len(images), 1)
+
+
+class _UpstreamHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        if self.path == '/redirect':
+            self._send(302, b'', Location='/json')
+        elif self.path == '/big':
+            self._send(200, b'x' * 4096)
+        elif self.path == '/json':
+            body = json.dumps({'ok': True, 'accept_encoding': self.headers.get('Accept-Encoding')}).encode()
+            self._send(200, gzip.compress(body), **{'Content-Encoding': 'gzip'})
+        else:
+            self._send(404, b'{}')
+
+    def _send(self, status, body, **headers):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class HttpClientTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), _UpstreamHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base = f"http://127.0.0.1:{cls.server.server_port}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client_ = http_client.HttpClient()
+        self.addCleanup(self.client_.close)
+
+    def test_reuses_the_pooled_connection_and_decodes_gzip(self):
+        for _ in range(3):
+            body = self.client_.get(f"{self.base}/json").json()
+        self.assertEqual(body, {'ok': True, 'accept_encoding': 'gzip, deflate'})
+        stats = self.client_.host_stats()['127.0.0.1']
+        self.assertEqual((stats['requests'], stats['opened'], stats['reused']), (3, 1, 2))
+
+    def test_follows_redirects(self):
+        resp = self.client_.get(f"{self.base}/redirect")
+        self.assertEqual(resp.url, f"{self.base}/json")
+        self.assertTrue(resp.json()['ok'])
+
+    def test_size_cap(self):
+        with self.assertRaises(http_client.ResponseTooLarge):
+            self.client_.get(f"{self.base}/big", max_bytes=1024)
+        self.assertEqual(len(self.client_.get(f"{self.base}/big").body), 4096)
+
+    def test_http_errors_are_counted(self):
+        with self.assertRaises(HTTPError) as ctx:
+            self.client_.get(f"{self.base}/missing")
+        self.assertEqual(ctx.exception.code, 404)
+        self.assertEqual(self.client_.host_stats()['127.0.0.1']['errors'], 1)
+
+    def test_async_client_pools_too(self):
+        client = http_client.AsyncHttpClient()
+
+        async def run():
+            return [(await client.get(f"{self.base}/redirect")).json() for _ in range(2)]
+
+        self.assertTrue(all(body['ok'] for body in asyncio.run(run())))
+        stats = client.host_stats()['127.0.0.1']
+        self.assertEqual(stats['opened'], 1)
+        self.assertEqual(stats['reused'], 3)
+
+
+def _put_consultas_sources(today):
+    # Fontes do /consultas/ já no cache (frescas); o gráfico do ethereum fica de fora.
+    days = [(today - timedelta(days=n)).isoformat() for n in (2, 1)]
+    _put(fx_table_target(today).cache_key, {'rates': {d: {'BRL': 6.0 + i, 'USD': 1.2} for i, d in enumerate(days)}}, age=0)
+    _put(crypto_prices_target().cache_key, {
+        'bitcoin': {'brl': 350000.0}, 'ethereum': {'brl': 12000.0}, 'solana': {'brl': 800.0},
+    }, age=0)
+    _put(crypto_chart_target('bitcoin').cache_key, {'prices': [[1760000000000, 340000.0]]}, age=0)
+
+
+@override_settings(
+    OXIRA_CONSULTAS_SNAPSHOT_DIR='',
+    OXIRA_CONSULTAS_NAGER=False,
+    OXIRA_DAYFACTS_INDEX=os.path.join(tempfile.gettempdir(), 'oxira-sem-indice.json.gz'),
+)
+class ConsultasBundleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        consultas_response._memo.clear()
+        self.today = timezone.localdate()
+        _put_consultas_sources(self.today)
+        patcher = mock.patch('blog.views.refresh_in_background')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_failing_section_is_isolated(self):
+        with mock.patch('blog.consultas_upstream._load_crypto_chart', side_effect=URLError('fora')):
+            response = self.client.get(reverse('api_consultas_bundle'), {'fx': 'usd,xyz', 'crypto': 'bitcoin,ethereum'})
+        body = response.json()
+        self.assertTrue(body['ok'])
+        self.assertEqual(body['fx']['USD']['current']['rate'], round(7.0 / 1.2, 6))
+        self.assertIs(body['fx']['XYZ']['ok'], False)
+        self.assertEqual(list(body['crypto']['prices']), ['bitcoin', 'ethereum'])
+        self.assertTrue(body['crypto']['charts']['bitcoin']['ok'])
+        self.assertIs(body['crypto']['charts']['ethereum']['ok'], False)
+        self.assertTrue(body['holidays']['ok'])
+        self.assertTrue(body['dayfacts']['ok'])
+        # Com seção falhando, o bundle não fica no memo.
+        self.assertIn('max-age=0', response['Cache-Control'])
+
+    @override_settings(OXIRA_CONSULTAS_EMBED_BUNDLE=True)
+    def test_page_embeds_only_what_is_cached(self):
+        with mock.patch('blog.consultas_upstream.http_get_json') as upstream, \
+                mock.patch('blog.consultas_upstream._load_crypto_chart') as chart:
+            response = self.client.get(reverse('consultas'))
+        upstream.assert_not_called()
+        chart.assert_not_called()
+        bundle = response.context['consultas_bundle']
+        self.assertEqual(list(bundle['fx']), ['USD', 'EUR', 'GBP'])
+        self.assertEqual(list(bundle['crypto']['charts']), ['bitcoin'])
+        self.assertContains(response, 'id="consultas-bundle"')
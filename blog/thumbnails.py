@@ -0,0 +1,160 @@
+"""Miniaturas sob demanda de arquivos do MEDIA (avatares, capas, cards de share).
+
+A URL leva o arquivo de origem, o tamanho, o `fit` e o formato, assinada com
+HMAC (SECRET_KEY): só o site gera URLs válidas, então ninguém usa o endpoint
+para mandar renderizar tamanhos arbitrários. O resultado fica em
+MEDIA_ROOT/cache/thumbs/ e renders simultâneos da mesma key viram um só.
+"""
+from __future__ import annotations
+
+import hashlib
+import io
+import os
+import threading
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.urls import reverse
+from django.utils.crypto import constant_time_compare, salted_hmac
+from django.utils.http import urlencode
+from PIL import Image, ImageOps
+
+from .image_ingest import decoded
+
+
+MAX_SIDE = 2000
+FITS = ('cover', 'contain')
+# formato na URL -> (formato do Pillow, content-type, opções de encode)
+FORMATS: dict[str, tuple[str, str, dict]] = {
+    'webp': ('WEBP', 'image/webp', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', 'image/jpeg', {'quality': 85, 'optimize': True, 'progressive': True}),
+    'png': ('PNG', 'image/png', {'optimize': True}),
+}
+CACHE_DIR = os.path.join('cache', 'thumbs')
+_SALT = 'blog.thumbnails'
+
+
+class InvalidThumbnail(ValueError):
+    """Spec, assinatura ou arquivo de origem inválidos."""
+
+
+@dataclass(frozen=True)
+class ThumbSpec:
+    width: int
+    height: int
+    fit: str
+    fmt: str
+
+    def __str__(self) -> str:
+        return f"{self.width}x{self.height}-{self.fit}.{self.fmt}"
+
+    @classmethod
+    def parse(cls, raw: str) -> ThumbSpec:
+        try:
+            size, fmt = raw.rsplit('.', 1)
+            dims, fit = size.split('-', 1)
+            w, h = (int(v) for v in dims.split('x', 1))
+        except ValueError:
+            raise InvalidThumbnail(f"spec inválida: {raw}")
+        if not (0 < w <= MAX_SIDE and 0 < h <= MAX_SIDE) or fit not in FITS or fmt not in FORMATS:
+            raise InvalidThumbnail(f"spec inválida: {raw}")
+        return cls(w, h, fit, fmt)
+
+
+def _source_path(name: str) -> str:
+    root = os.path.realpath(settings.MEDIA_ROOT)
+    path = os.path.realpath(os.path.join(root, name))
+    # Nada fora do MEDIA_ROOT, e nada do próprio cache.
+    if not path.startswith(root + os.sep) or path.startswith(os.path.join(root, CACHE_DIR) + os.sep):
+        raise InvalidThumbnail(f"origem inválida: {name}")
+    return path
+
+
+def _version(path: str) -> str:
+    try:
+        return str(int(os.path.getmtime(path)))
+    except OSError:
+        return '0'
+
+
+def sign(name: str, spec: ThumbSpec, version: str) -> str:
+    return salted_hmac(_SALT, f"{name}|{spec}|{version}").hexdigest()[:32]
+
+
+def thumb_url(name: str, width: int, height: int, fit: str = 'cover', fmt: str = 'webp') -> str:
+    """URL assinada da miniatura. `v` (mtime da origem) muda a URL quando o arquivo é reescrito."""
+    spec = ThumbSpec.parse(f"{int(width)}x{int(height)}-{fit}.{fmt}")
+    try:
+        version = _version(_source_path(name))
+    except InvalidThumbnail:
+        version = '0'
+    url = reverse('media_thumbnail', kwargs={'spec': str(spec), 'name': name})
+    return f"{url}?{urlencode({'v': version, 's': sign(name, spec, version)})}"
+
+
+def verify(name: str, spec: ThumbSpec, version: str, signature: str) -> None:
+    if not constant_time_compare(sign(name, spec, version), signature or ''):
+        raise InvalidThumbnail('assinatura inválida')
+
+
+def _cache_path(name: str, spec: ThumbSpec, version: str) -> str:
+    digest = hashlib.sha1(f"{name}|{spec}|{version}".encode('utf-8')).hexdigest()
+    return os.path.join(settings.MEDIA_ROOT, CACHE_DIR, digest[:2], f"{digest}.{spec.fmt}")
+
+
+def _render(source: str, spec: ThumbSpec) -> bytes:
+    pil_format, _, options = FORMATS[spec.fmt]
+    size = (spec.width, spec.height)
+    # Decode reduzido (draft/reduce) e limitado por slots: ver image_ingest.
+    with decoded(source, size, label=os.path.basename(source)) as (im, report):
+        if spec.fit == 'cover':
+            out = ImageOps.fit(im, size, Image.Resampling.LANCZOS)
+        else:
+            out = ImageOps.contain(im, size, Image.Resampling.LANCZOS)
+        if pil_format == 'JPEG' or out.mode not in ('RGB', 'RGBA'):
+            out = out.convert('RGB' if pil_format == 'JPEG' else 'RGBA')
+        report.track(im, out)
+        buf = io.BytesIO()
+        out.save(buf, format=pil_format, **options)
+    return buf.getvalue()
+
+
+_render_locks: dict[str, threading.Lock] = {}
+_render_locks_guard = threading.Lock()
+
+
+def _lock_for(key: str) -> threading.Lock:
+    with _render_locks_guard:
+        lock = _render_locks.get(key)
+        if lock is None:
+            lock = _render_locks[key] = threading.Lock()
+        return lock
+
+
+def get_thumbnail(name: str, spec: ThumbSpec, version: str) -> tuple[str, str]:
+    """(caminho do arquivo em cache, content-type). Renderiza na primeira vez."""
+    source = _source_path(name)
+    if not os.path.isfile(source):
+        raise FileNotFoundError(name)
+    target = _cache_path(name, spec, version)
+    content_type = FORMATS[spec.fmt][1]
+    if os.path.exists(target):
+        return target, content_type
+
+    # Single-flight por key no processo; entre workers, no pior caso dois renderizam
+    # e o os.replace deixa um arquivo inteiro de qualquer jeito.
+    lock = _lock_for(target)
+    try:
+        with lock:
+            if not os.path.exists(target):
+                data = _render(source, spec)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                tmp = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp, target)
+    finally:
+        # Também quando o render falha: senão cada miniatura com erro deixa um lock para trás.
+        with _render_locks_guard:
+            _render_locks.pop(target, None)
+    return target, content_type
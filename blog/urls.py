@@ -1,18 +1,26 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+if getattr(settings, 'OXIRA_ASYNC_CONSULTAS', False):
+    from . import async_views as consultas_api
+else:
+    consultas_api = views
+
 urlpatterns = [
     path('', views.post_list, name='post_list'),
     path('consultas/', views.consultas, name='consultas'),
     path('preview/<int:pk>/', views.post_preview, name='post_preview'),
     path('preview/draft/set/', views.post_preview_draft_set, name='post_preview_draft_set'),
     path('preview/draft/<uuid:token>/', views.post_preview_draft, name='post_preview_draft'),
-    path('api/consultas/fx/latest/', views.api_consultas_fx_latest, name='api_consultas_fx_latest'),
-    path('api/consultas/fx/range/', views.api_consultas_fx_range, name='api_consultas_fx_range'),
-    path('api/consultas/crypto/prices/', views.api_consultas_crypto_prices, name='api_consultas_crypto_prices'),
-    path('api/consultas/crypto/chart/', views.api_consultas_crypto_chart, name='api_consultas_crypto_chart'),
-    path('api/consultas/holidays/today/', views.api_consultas_holidays_today, name='api_consultas_holidays_today'),
-    path('api/consultas/dayfacts/today/', views.api_consultas_dayfacts_today, name='api_consultas_dayfacts_today'),
+    path('api/consultas/fx/latest/', consultas_api.api_consultas_fx_latest, name='api_consultas_fx_latest'),
+    path('api/consultas/fx/range/', consultas_api.api_consultas_fx_range, name='api_consultas_fx_range'),
+    path('api/consultas/crypto/prices/', consultas_api.api_consultas_crypto_prices, name='api_consultas_crypto_prices'),
+    path('api/consultas/crypto/chart/', consultas_api.api_consultas_crypto_chart, name='api_consultas_crypto_chart'),
+    path('api/consultas/holidays/today/', consultas_api.api_consultas_holidays_today, name='api_consultas_holidays_today'),
+    path('api/consultas/dayfacts/today/', consultas_api.api_consultas_dayfacts_today, name='api_consultas_dayfacts_today'),
+    path('api/consultas/bundle/', consultas_api.api_consultas_bundle, name='api_consultas_bundle'),
+    path('thumb/<str:spec>/<path:name>', views.media_thumbnail, name='media_thumbnail'),
     path('cadastro/', views.author_signup, name='author_signup'),
     path('metrics/click/', views.metrics_link_click, name='metrics_link_click'),
     path('metrics/engagement/', views.metrics_engagement, name='metrics_engagement'),
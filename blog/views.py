@@ -1,10 +1,10 @@
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import authenticate, get_user_model, login
 from django.contrib.admin.views.decorators import staff_member_required
-from django.core.cache import cache
 from django.core.paginator import Paginator
 from django.db import transaction
-from django.http import HttpRequest
+from django.http import FileResponse, Http404, HttpRequest, HttpResponseForbidden
 from django.http import JsonResponse
 from django.shortcuts import redirect
 from django.shortcuts import render, get_object_or_404
@@ -14,16 +14,37 @@ from django.views.decorators.http import require_GET, require_POST
 
 import re
 
-from urllib.request import Request, urlopen
 from urllib.error import URLError, HTTPError
-import json
-from datetime import timedelta, datetime
-import hashlib
+from datetime import date, datetime
 import uuid
 
+from .consultas_cache import CacheMiss, CachedValue, UpstreamUnavailable, cached_fetch, refresh_in_background
+from .consultas_dayfacts import (
+    dataset_items as dataset_dayfacts,
+    lookup as dayfacts_lookup,
+    merge_items as merge_dayfacts,
+)
+from .consultas_fx import UnknownCurrency, cross_latest, cross_range
+from .consultas_holidays import holidays_on, next_holiday
+from .consultas_prefetch import ensure_prefetcher_started
+from .consultas_response import cached_json_response, fresh_for
+from .consultas_upstream import (
+    CRYPTO_ALLOWED_IDS,
+    CRYPTO_DEFAULT_IDS,
+    FX_PAGE_BASES,
+    FX_PAGE_DEFAULT,
+    FX_PAGE_RANGE_DAYS,
+    UpstreamTarget,
+    crypto_chart_target,
+    crypto_prices_target,
+    fx_table_target,
+    wikipedia_onthisday_target,
+)
 from .forms import AuthorSignupForm
+from .image_ingest import ImageTooLarge
 from .metrics import get_session_hash, is_safe_http_url, record_post_view
 from .models import Category, EngagementEvent, LinkClick, Post, UserProfile
+from .thumbnails import InvalidThumbnail, ThumbSpec, get_thumbnail, verify as verify_thumbnail
 
 
 _AD_MARKER_RE = re.compile(
@@ -293,6 +314,29 @@ def metrics_engagement(request: HttpRequest):
     )
     return JsonResponse({'ok': True})
 
+# Miniaturas: a URL é assinada (blog/thumbnails.py) e muda quando a origem muda,
+# então a resposta pode ficar em cache "para sempre" no navegador/CDN.
+THUMBNAIL_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+@require_GET
+def media_thumbnail(request: HttpRequest, spec: str, name: str):
+    version = request.GET.get('v') or '0'
+    try:
+        thumb_spec = ThumbSpec.parse(spec)
+        verify_thumbnail(name, thumb_spec, version, request.GET.get('s') or '')
+    except InvalidThumbnail:
+        return HttpResponseForbidden('Miniatura inválida.')
+    try:
+        path, content_type = get_thumbnail(name, thumb_spec, version)
+    except (InvalidThumbnail, ImageTooLarge, OSError):
+        # Origem removida, ilegível (inclui UnidentifiedImageError do Pillow) ou acima do limite de pixels.
+        raise Http404('Imagem não encontrada.')
+    response = FileResponse(open(path, 'rb'), content_type=content_type)
+    response['Cache-Control'] = THUMBNAIL_CACHE_CONTROL
+    return response
+
+
 def category_list(request, slug):
     category = get_object_or_404(Category, slug=slug)
     posts = Post.objects.filter(status='published', category=category).order_by('-published_date')
@@ -372,29 +416,30 @@ def author_signup(request: HttpRequest):
 
 
 def consultas(request: HttpRequest):
-    return render(request, 'blog/consultas.html')
+    ensure_prefetcher_started()
+    context = {}
+    if getattr(settings, 'OXIRA_CONSULTAS_EMBED_BUNDLE', False):
+        # Só o que já está no cache: a página nunca espera upstream.
+        # O que faltar o JS busca depois, widget a widget.
+        context['consultas_bundle'] = _consultas_bundle(
+            list(FX_PAGE_DEFAULT),
+            list(CRYPTO_DEFAULT_IDS),
+            FX_PAGE_RANGE_DAYS,
+            cache_only=True,
+        )
+    return render(request, 'blog/consultas.html', context)
 
 
-def _http_get_json(url: str, timeout: float = 8.0):
-    req = Request(
-        url,
-        headers={
-            'User-Agent': 'Oxira/1.0 (+https://oxira.local)',
-            'Accept': 'application/json',
-        },
-    )
-    with urlopen(req, timeout=timeout) as resp:
-        raw = resp.read().decode('utf-8')
-    return json.loads(raw)
+def _cached_fetch_json(target: UpstreamTarget, *, cache_only: bool = False) -> CachedValue:
+    # ttl_seconds é o TTL "mole": depois dele o valor ainda é servido e atualizado em background.
+    ensure_prefetcher_started()
+    return cached_fetch(target.cache_key, target.fetch, soft_ttl=target.ttl_seconds, cache_only=cache_only)
 
 
-def _cached_fetch_json(cache_key: str, url: str, ttl_seconds: int):
-    cached = cache.get(cache_key)
-    if cached is not None:
-        return cached
-    data = _http_get_json(url)
-    cache.set(cache_key, data, ttl_seconds)
-    return data
+def _with_stale_flag(payload: dict, result: CachedValue) -> dict:
+    if result.stale:
+        payload = {**payload, 'stale': True}
+    return payload
 
 
 def _norm_ccy(value: str) -> str | None:
@@ -406,8 +451,21 @@ def _norm_ccy(value: str) -> str | None:
     return value
 
 
-@require_GET
-def api_consultas_fx_latest(request: HttpRequest):
+def _upstream_error_response(e: Exception) -> JsonResponse:
+    if isinstance(e, UnknownCurrency):
+        return JsonResponse({'ok': False, 'error': str(e)}, status=400, json_dumps_params={'ensure_ascii': False})
+    if isinstance(e, UpstreamUnavailable):
+        # Falha recente já conhecida (cache negativo / circuito aberto): 503 rápido.
+        resp = JsonResponse({'ok': False, 'error': str(e)}, status=503, json_dumps_params={'ensure_ascii': False})
+        resp['Retry-After'] = str(e.retry_after)
+        return resp
+    return JsonResponse({'ok': False, 'error': str(e)}, status=502, json_dumps_params={'ensure_ascii': False})
+
+
+# Parse de parâmetros + montagem do payload ficam separados da busca,
+# para as versões async (blog/async_views.py) reaproveitarem.
+
+def _fx_latest_params(request: HttpRequest) -> tuple[str, list[str]]:
     base = _norm_ccy(request.GET.get('base')) or 'USD'
     symbols_raw = (request.GET.get('symbols') or '').strip()
     symbols = []
@@ -418,22 +476,14 @@ def api_consultas_fx_latest(request: HttpRequest):
                 symbols.append(c)
 
     # limite simples
-    symbols = symbols[:10]
+    return base, symbols[:10]
 
-    url = f"https://api.frankfurter.app/latest?from={base}"
-    if symbols:
-        url += "&to=" + ",".join(symbols)
 
-    cache_key = f"consultas:fx:latest:{base}:{','.join(symbols) if symbols else 'ALL'}"
-    try:
-        data = _cached_fetch_json(cache_key, url, ttl_seconds=600)
-        return JsonResponse(data, json_dumps_params={'ensure_ascii': False})
-    except (HTTPError, URLError, TimeoutError, ValueError) as e:
-        return JsonResponse({'ok': False, 'error': str(e)}, status=502, json_dumps_params={'ensure_ascii': False})
+def _fx_latest_payload(base: str, symbols: list[str], result: CachedValue) -> dict:
+    return _with_stale_flag(cross_latest(result.data, base, symbols), result)
 
 
-@require_GET
-def api_consultas_fx_range(request: HttpRequest):
+def _fx_range_params(request: HttpRequest) -> tuple[str, int]:
     base = _norm_ccy(request.GET.get('base')) or 'USD'
 
     days_raw = (request.GET.get('days') or '').strip()
@@ -442,367 +492,352 @@ def api_consultas_fx_range(request: HttpRequest):
     except Exception:
         days = 30
 
-    days = max(7, min(60, days))
+    return base, max(7, min(60, days))
 
-    end = timezone.localdate()
-    start = end - timedelta(days=days - 1)
 
-    # Frankfurter: /YYYY-MM-DD..YYYY-MM-DD?from=USD&to=BRL
-    url = f"https://api.frankfurter.app/{start.isoformat()}..{end.isoformat()}?from={base}&to=BRL"
-    cache_key = f"consultas:fx:range:{base}:{days}:{end.isoformat()}"
+def _fx_range_payload(base: str, days: int, end: date, result: CachedValue) -> dict:
+    rates = cross_range(result.data, base, days, end, ['BRL']).get('rates')
+    series = []
+    if isinstance(rates, dict):
+        for d, v in rates.items():
+            if isinstance(v, dict) and isinstance(v.get('BRL'), (int, float)):
+                series.append({'date': d, 'rate': float(v['BRL'])})
 
-    try:
-        data = _cached_fetch_json(cache_key, url, ttl_seconds=600)
-        rates = data.get('rates') if isinstance(data, dict) else None
-        series = []
-        if isinstance(rates, dict):
-            for d, v in rates.items():
-                if isinstance(v, dict) and isinstance(v.get('BRL'), (int, float)):
-                    series.append({'date': d, 'rate': float(v['BRL'])})
-
-        series.sort(key=lambda x: x['date'])
-        current = series[-1] if series else None
-
-        return JsonResponse(
-            {
-                'ok': True,
-                'base': base,
-                'days': days,
-                'series': series,
-                'current': current,
-            },
-            json_dumps_params={'ensure_ascii': False},
-        )
-    except (HTTPError, URLError, TimeoutError, ValueError) as e:
-        return JsonResponse({'ok': False, 'error': str(e)}, status=502, json_dumps_params={'ensure_ascii': False})
+    series.sort(key=lambda x: x['date'])
+    current = series[-1] if series else None
+
+    return _with_stale_flag(
+        {
+            'ok': True,
+            'base': base,
+            'days': days,
+            'series': series,
+            'current': current,
+        },
+        result,
+    )
 
 
-@require_GET
-@require_GET
-def api_consultas_crypto_prices(request: HttpRequest):
-    # CoinGecko (sem chave), com cache para reduzir rate-limit.
+def _crypto_prices_params(request: HttpRequest) -> list[str]:
     # Aceita seleção via querystring, mas só por whitelist (segurança + estabilidade).
-    allowed_ids = {
-        'bitcoin',
-        'ethereum',
-        'solana',
-        'ripple',
-        'cardano',
-        'dogecoin',
-    }
-
     ids_raw = (request.GET.get('ids') or '').strip().lower()
     requested = []
     if ids_raw:
         for part in ids_raw.split(','):
             p = (part or '').strip().lower()
-            if p in allowed_ids and p not in requested:
+            if p in CRYPTO_ALLOWED_IDS and p not in requested:
                 requested.append(p)
 
     if not requested:
         requested = ['bitcoin', 'ethereum']
 
     # limite
-    requested = requested[:10]
-
-    ids_param = ','.join(requested)
-    url = (
-        "https://api.coingecko.com/api/v3/simple/price"
-        f"?ids={ids_param}"
-        "&vs_currencies=brl,usd"
-        "&include_24hr_change=true"
-    )
-    cache_key = f"consultas:crypto:prices:{ids_param}"
-    try:
-        data = _cached_fetch_json(cache_key, url, ttl_seconds=600)
-        return JsonResponse(data, json_dumps_params={'ensure_ascii': False})
-    except (HTTPError, URLError, TimeoutError, ValueError) as e:
-        return JsonResponse({'ok': False, 'error': str(e)}, status=502, json_dumps_params={'ensure_ascii': False})
+    return requested[:10]
 
 
-@require_GET
-def api_consultas_crypto_chart(request: HttpRequest):
-    allowed_ids = {
-        'bitcoin',
-        'ethereum',
-        'solana',
-        'ripple',
-        'cardano',
-        'dogecoin',
-    }
+def _crypto_prices_payload(requested: list[str], result: CachedValue) -> dict:
+    data = result.data if isinstance(result.data, dict) else {}
+    return _with_stale_flag({coin_id: data[coin_id] for coin_id in requested if coin_id in data}, result)
+
 
+def _crypto_chart_params(request: HttpRequest) -> tuple[str | None, int]:
     coin_id = (request.GET.get('id') or '').strip().lower()
-    if coin_id not in allowed_ids:
-        return JsonResponse({'ok': False, 'error': 'id inválido'}, status=400, json_dumps_params={'ensure_ascii': False})
+    if coin_id not in CRYPTO_ALLOWED_IDS:
+        coin_id = None
 
     days_raw = (request.GET.get('days') or '').strip()
     try:
         days = int(days_raw) if days_raw else 30
     except Exception:
         days = 30
-    days = max(7, min(60, days))
+    return coin_id, max(7, min(60, days))
+
+
+def _crypto_chart_payload(coin_id: str, days: int, result: CachedValue) -> dict:
+    data = result.data
+    prices = data.get('prices') if isinstance(data, dict) else None
+    series = []
+    if isinstance(prices, list):
+        for row in prices:
+            if isinstance(row, list) and len(row) >= 2 and isinstance(row[0], (int, float)) and isinstance(row[1], (int, float)):
+                dt = datetime.utcfromtimestamp(row[0] / 1000.0).date().isoformat()
+                series.append({'date': dt, 'price': float(row[1])})
+
+    # mantém crescente por data; o histórico vem inteiro e a janela é recortada aqui
+    # (days + 1 pontos, como o market_chart do CoinGecko devolvia).
+    series.sort(key=lambda x: x['date'])
+    series = series[-(days + 1):]
+    current = series[-1] if series else None
+
+    return _with_stale_flag(
+        {
+            'ok': True,
+            'id': coin_id,
+            'days': days,
+            'series': series,
+            'current': current,
+        },
+        result,
+    )
+
+
+def _holidays_payload(today: date) -> dict:
+    # Calculado localmente (consultas_holidays); não depende de upstream.
+    return {
+        'ok': True,
+        'today': holidays_on(today),
+        'next': next_holiday(today),
+    }
+
+
+# As APIs respondem via consultas_response: o corpo final (bytes + gzip/br + ETag)
+# fica memorizado por key = target + parâmetros normalizados, enquanto a fonte está fresca.
+# Views async montam as mesmas keys/payloads com os helpers abaixo.
 
-    url = f"https://api.coingecko.com/api/v3/coins/{coin_id}/market_chart?vs_currency=brl&days={days}&interval=daily"
-    cache_key = f"consultas:crypto:chart:{coin_id}:{days}"
+def _fx_latest_key(target: UpstreamTarget, base: str, symbols: list[str]) -> str:
+    return f"{target.cache_key}|latest:{base}:{','.join(symbols)}"
+
+
+def _fx_range_key(target: UpstreamTarget, base: str, days: int, end: date) -> str:
+    # A key do alvo não tem data; a janela da resposta tem.
+    return f"{target.cache_key}|range:{base}:{days}:{end.isoformat()}"
+
+
+def _crypto_prices_key(target: UpstreamTarget, requested: list[str]) -> str:
+    return f"{target.cache_key}|{','.join(requested)}"
+
+
+def _crypto_chart_key(target: UpstreamTarget, days: int) -> str:
+    return f"{target.cache_key}|{days}"
+
+
+@require_GET
+def api_consultas_fx_latest(request: HttpRequest):
+    base, symbols = _fx_latest_params(request)
+    target = fx_table_target(timezone.localdate())
+
+    def build():
+        result = _cached_fetch_json(target)
+        return _fx_latest_payload(base, symbols, result), fresh_for(result, ttl=target.ttl_seconds)
 
     try:
-        data = _cached_fetch_json(cache_key, url, ttl_seconds=600)
-        prices = data.get('prices') if isinstance(data, dict) else None
-        series = []
-        if isinstance(prices, list):
-            for row in prices:
-                if isinstance(row, list) and len(row) >= 2 and isinstance(row[0], (int, float)) and isinstance(row[1], (int, float)):
-                    dt = datetime.utcfromtimestamp(row[0] / 1000.0).date().isoformat()
-                    series.append({'date': dt, 'price': float(row[1])})
-
-        # mantém crescente por data
-        series.sort(key=lambda x: x['date'])
-        current = series[-1] if series else None
-
-        return JsonResponse(
-            {
-                'ok': True,
-                'id': coin_id,
-                'days': days,
-                'series': series,
-                'current': current,
-            },
-            json_dumps_params={'ensure_ascii': False},
-        )
+        return cached_json_response(request, _fx_latest_key(target, base, symbols), build)
     except (HTTPError, URLError, TimeoutError, ValueError) as e:
-        return JsonResponse({'ok': False, 'error': str(e)}, status=502, json_dumps_params={'ensure_ascii': False})
+        return _upstream_error_response(e)
 
 
 @require_GET
-def api_consultas_holidays_today(request: HttpRequest):
-    # BR (Nager.Date). Cache mais longo: feriados não mudam durante o dia.
-    today = timezone.localdate()
-    year = today.year
+def api_consultas_fx_range(request: HttpRequest):
+    base, days = _fx_range_params(request)
+    end = timezone.localdate()
+    target = fx_table_target(end)
 
-    holidays_cache_key = f"consultas:holidays:BR:{year}"
-    next_cache_key = "consultas:holidays:BR:next"
+    def build():
+        result = _cached_fetch_json(target)
+        return _fx_range_payload(base, days, end, result), fresh_for(result, ttl=target.ttl_seconds)
 
     try:
-        holidays = cache.get(holidays_cache_key)
-        if holidays is None:
-            holidays = _http_get_json(f"https://date.nager.at/api/v3/PublicHolidays/{year}/BR")
-            cache.set(holidays_cache_key, holidays, 6 * 60 * 60)
-
-        today_str = today.isoformat()
-        today_matches = [h for h in holidays if (h.get('date') == today_str)]
-
-        next_holidays = cache.get(next_cache_key)
-        if next_holidays is None:
-            next_holidays = _http_get_json("https://date.nager.at/api/v3/NextPublicHolidays/BR")
-            cache.set(next_cache_key, next_holidays, 6 * 60 * 60)
-
-        next_one = next_holidays[0] if isinstance(next_holidays, list) and next_holidays else None
-
-        return JsonResponse(
-            {
-                'ok': True,
-                'today': today_matches,
-                'next': next_one,
-            },
-            json_dumps_params={'ensure_ascii': False},
-        )
+        return cached_json_response(request, _fx_range_key(target, base, days, end), build)
     except (HTTPError, URLError, TimeoutError, ValueError) as e:
-        return JsonResponse({'ok': False, 'error': str(e)}, status=502, json_dumps_params={'ensure_ascii': False})
+        return _upstream_error_response(e)
 
 
-def _stable_pick(seed: str, options: list[str]) -> str:
-    if not options:
-        return ''
-    h = hashlib.md5(seed.encode('utf-8')).hexdigest()
-    idx = int(h[:8], 16) % len(options)
-    return options[idx]
+@require_GET
+def api_consultas_crypto_prices(request: HttpRequest):
+    # CoinGecko (sem chave), com cache para reduzir rate-limit.
+    requested = _crypto_prices_params(request)
+    target = crypto_prices_target()
 
+    def build():
+        result = _cached_fetch_json(target)
+        return _crypto_prices_payload(requested, result), fresh_for(result, ttl=target.ttl_seconds)
 
-def _day_facts_dataset() -> dict[str, list[dict]]:
-    # Chave: MM-DD (datas fixas). Mantemos só coisas úteis/realmente populares.
-    return {
-        '01-01': [
-            {'kind': 'comemorativa', 'title': 'Ano Novo', 'year': None, 'about': 'Primeiro dia do ano; muita gente usa como marco pra planos e recomeços.'},
-        ],
-        '03-08': [
-            {'kind': 'comemorativa', 'title': 'Dia Internacional da Mulher', 'year': None, 'about': 'Data de reconhecimento e reflexão sobre direitos e igualdade.'},
-        ],
-        '04-21': [
-            {'kind': 'feriado', 'title': 'Tiradentes (Brasil)', 'year': None, 'about': 'Feriado nacional brasileiro em homenagem a Tiradentes.'},
-        ],
-        '05-01': [
-            {'kind': 'comemorativa', 'title': 'Dia do Trabalhador', 'year': None, 'about': 'Data ligada à história do trabalho e direitos trabalhistas.'},
-        ],
-        '05-08': [
-            {'kind': 'fato', 'title': 'Fim da Segunda Guerra Mundial na Europa (VE Day)', 'year': 1945, 'about': 'Marca a rendição da Alemanha na Europa e o encerramento do conflito no continente.'},
-        ],
-        '06-05': [
-            {'kind': 'comemorativa', 'title': 'Dia Mundial do Meio Ambiente', 'year': None, 'about': 'Data global para lembrar ações de preservação ambiental.'},
-        ],
-        '07-20': [
-            {'kind': 'comemorativa', 'title': 'Dia do Amigo (Brasil)', 'year': None, 'about': 'Data popular no Brasil para celebrar amizade e vínculos.'},
-        ],
-        '07-30': [
-            {'kind': 'comemorativa', 'title': 'Dia Internacional da Amizade (ONU)', 'year': None, 'about': 'Data internacional para incentivar amizade e cooperação.'},
-        ],
-        '08-11': [
-            {'kind': 'comemorativa', 'title': 'Dia dos Pais (referência)', 'year': None, 'about': 'No Brasil é celebrado em agosto (data variável por ano).'},
-        ],
-        '09-02': [
-            {'kind': 'fato', 'title': 'Fim da Segunda Guerra Mundial (assinatura da rendição do Japão)', 'year': 1945, 'about': 'Assinatura formal da rendição do Japão, marcando o fim do conflito em escala global.'},
-        ],
-        '09-07': [
-            {'kind': 'feriado', 'title': 'Independência do Brasil', 'year': 1822, 'about': 'Feriado nacional que marca a independência do Brasil.'},
-        ],
-        '10-12': [
-            {'kind': 'feriado', 'title': 'Nossa Senhora Aparecida (Brasil)', 'year': None, 'about': 'Feriado nacional e data religiosa importante no país.'},
-            {'kind': 'comemorativa', 'title': 'Dia das Crianças (Brasil)', 'year': None, 'about': 'Data popular de celebração e consumo (presentes) no Brasil.'},
-        ],
-        '11-02': [
-            {'kind': 'feriado', 'title': 'Finados (Brasil)', 'year': None, 'about': 'Dia de memória e homenagem aos falecidos.'},
-        ],
-        '11-15': [
-            {'kind': 'feriado', 'title': 'Proclamação da República (Brasil)', 'year': 1889, 'about': 'Feriado nacional que marca a proclamação da República.'},
-        ],
-        '11-20': [
-            {'kind': 'feriado', 'title': 'Dia da Consciência Negra (Brasil)', 'year': None, 'about': 'Data de reflexão sobre a luta e contribuições da população negra.'},
-        ],
-        '12-25': [
-            {'kind': 'feriado', 'title': 'Natal', 'year': None, 'about': 'Data tradicional, com forte presença cultural e religiosa.'},
-        ],
+    try:
+        return cached_json_response(request, _crypto_prices_key(target, requested), build)
+    except (HTTPError, URLError, TimeoutError, ValueError) as e:
+        return _upstream_error_response(e)
+
+
+@require_GET
+def api_consultas_crypto_chart(request: HttpRequest):
+    coin_id, days = _crypto_chart_params(request)
+    if coin_id is None:
+        return JsonResponse({'ok': False, 'error': 'id inválido'}, status=400, json_dumps_params={'ensure_ascii': False})
+    target = crypto_chart_target(coin_id)
+
+    def build():
+        result = _cached_fetch_json(target)
+        return _crypto_chart_payload(coin_id, days, result), fresh_for(result, ttl=target.ttl_seconds)
+
+    try:
+        return cached_json_response(request, _crypto_chart_key(target, days), build)
+    except (HTTPError, URLError, TimeoutError, ValueError) as e:
+        return _upstream_error_response(e)
+
+
+# Feriados e curiosidades são calculados localmente; o corpo pronto vale alguns minutos.
+LOCAL_FRESH_SECONDS = 5 * 60
+
+
+@require_GET
+def api_consultas_holidays_today(request: HttpRequest):
+    # Feriados nacionais (BR) calculados localmente; o Nager.Date só complementa em background.
+    today = timezone.localdate()
+    return cached_json_response(
+        request,
+        f"consultas:holidays:{today.isoformat()}",
+        lambda: (_holidays_payload(today), LOCAL_FRESH_SECONDS),
+    )
+
+
+def _dayfacts_wiki_payload(today: date, wiki: CachedValue | None) -> dict:
+    # Dataset + Wikipedia. Sem a Wikipedia (upstream fora), sai só o dataset marcado como stale.
+    wiki_items = wiki.data if wiki is not None and isinstance(wiki.data, list) else []
+    payload = {
+        'ok': True,
+        'date': today.isoformat(),
+        'items': merge_dayfacts(dataset_dayfacts(today), wiki_items),
     }
+    if wiki is None or wiki.stale:
+        payload['stale'] = True
+    return payload
 
 
-def _fetch_dayfacts_from_wikipedia(date_obj):
-    """Busca itens do dia via Wikipedia (pt) usando a API 'onthisday'.
+def _dayfacts_indexed(today: date) -> dict | None:
+    items = dayfacts_lookup(today)
+    if items is None:
+        return None
+    return {'ok': True, 'date': today.isoformat(), 'items': items}
+
 
-    Fonte: pt.wikipedia.org (conteúdo CC BY-SA; consumimos via API pública).
-    Retorna lista de dicts compatível com o endpoint, ou [].
-    """
-    cache_key = f"consultas:dayfacts:wikipedia:onthisday:{date_obj.isoformat()}"
+def _dayfacts_payload(today: date) -> dict:
+    indexed = _dayfacts_indexed(today)
+    if indexed is not None:
+        return indexed
+    # Dia fora do índice (sem índice, ou a Wikipedia falhou no build): dataset +
+    # o que já houver da Wikipedia no cache. O request nunca espera a rede: um
+    # miss só dispara o fetch em background (e o prefetcher aquece esses dias).
+    target = wikipedia_onthisday_target(today)
     try:
-        cached = cache.get(cache_key)
-        if cached is not None:
-            return cached
-
-        month = int(date_obj.month)
-        day = int(date_obj.day)
-
-        holidays_url = f"https://pt.wikipedia.org/api/rest_v1/feed/onthisday/holidays/{month}/{day}"
-        events_url = f"https://pt.wikipedia.org/api/rest_v1/feed/onthisday/events/{month}/{day}"
-
-        holidays_data = _http_get_json(holidays_url)
-        events_data = _http_get_json(events_url)
-
-        holidays = holidays_data.get('holidays') if isinstance(holidays_data, dict) else None
-        events = events_data.get('events') if isinstance(events_data, dict) else None
-
-        out: list[dict] = []
-
-        def _add_items(kind: str, rows, limit: int):
-            if not isinstance(rows, list):
-                return
-            for row in rows:
-                if len(out) >= 12:
-                    return
-                if not isinstance(row, dict):
-                    continue
-                text = (row.get('text') or '').strip()
-                if not text:
-                    continue
-                year = row.get('year')
-                year_txt = f" ({year})" if isinstance(year, int) else ''
-
-                vibe = _stable_pick(
-                    f"wiki:{date_obj.isoformat()}:{kind}:{text}",
-                    [
-                        'Hoje tem dessas datas que ajudam a puxar contexto.',
-                        'Isso costuma passar batido, mas é bem interessante.',
-                        'Se você curte curiosidade prática: anota essa.',
-                        'Pra lembrar e comentar no dia: fica ótimo.',
-                    ],
-                )
-                why = _stable_pick(
-                    f"wiki:{date_obj.isoformat()}:{kind}:{text}:why",
-                    [
-                        'Serve como referência cultural e aparece em calendários e notícias.',
-                        'Ajuda a entender por que algumas datas viram “marco” na conversa pública.',
-                        'É um ótimo gancho pra organizar agenda e conteúdo do dia.',
-                    ],
-                )
-
-                out.append(
-                    {
-                        'kind': kind,
-                        'title': f"{text}{year_txt}",
-                        'about': '',
-                        'ia_summary': f"{vibe} {why}",
-                        'source': 'wikipedia',
-                    }
-                )
-
-        _add_items('comemorativa', holidays, limit=8)
-        _add_items('fato', events, limit=6)
-
-        cache.set(cache_key, out, 6 * 60 * 60)
-        return out
-    except Exception:
-        return []
+        wiki = _cached_fetch_json(target, cache_only=True)
+    except CacheMiss:
+        refresh_in_background(target.cache_key, target.fetch)
+        wiki = None
+    return _dayfacts_wiki_payload(today, wiki)
+
+
+def _dayfacts_fresh_seconds(payload: dict) -> int:
+    # Corpo montado sem a Wikipedia não fica no memo pelos 5 minutos.
+    return 0 if payload.get('stale') else LOCAL_FRESH_SECONDS
 
 
 @require_GET
 def api_consultas_dayfacts_today(request: HttpRequest):
     today = timezone.localdate()
-    # 1) tenta fontes (Wikipedia)
-    out = _fetch_dayfacts_from_wikipedia(today)
-
-    # 2) fallback: dataset interno
-    if not out:
-        key = today.strftime('%m-%d')
-        items = _day_facts_dataset().get(key, [])
-
-        for idx, item in enumerate(items):
-            title = item.get('title') or 'Curiosidade'
-            about = item.get('about') or ''
-            year = item.get('year')
-            kind = item.get('kind') or 'comemorativa'
-
-            vibe = _stable_pick(
-                f"{today.isoformat()}:{title}:{idx}",
-                [
-                    'Hoje é um daqueles dias que vale marcar no calendário.',
-                    'Dá pra usar isso como gancho pra uma conversa boa.',
-                    'Se você gosta de contexto, essa data é um prato cheio.',
-                    'Curiosidade útil pra não passar batido no dia.',
-                ],
-            )
-            why = _stable_pick(
-                f"{today.isoformat()}:{title}:why:{idx}",
-                [
-                    'Por que isso importa: muda a agenda, o humor do país ou a rotina de muita gente.',
-                    'Por que isso importa: vira referência cultural e aparece muito em notícias e calendários.',
-                    'Por que isso importa: é um marco que ajuda a entender o presente.',
-                ],
-            )
-
-            year_txt = f" ({year})" if isinstance(year, int) else ''
-            ia_summary = f"{vibe} {about} {why}".strip()
-
-            out.append(
-                {
-                    'kind': kind,
-                    'title': f"{title}{year_txt}",
-                    'about': about,
-                    'ia_summary': ia_summary,
-                    'source': 'dataset',
-                }
-            )
 
-    return JsonResponse(
-        {
-            'ok': True,
-            'date': today.isoformat(),
-            'items': out,
-        },
-        json_dumps_params={'ensure_ascii': False},
+    def build():
+        payload = _dayfacts_payload(today)
+        return payload, _dayfacts_fresh_seconds(payload)
+
+    return cached_json_response(request, f"consultas:dayfacts:{today.isoformat()}", build)
+
+
+def _bundle_params(request: HttpRequest) -> tuple[list[str], list[str], int]:
+    fx_codes: list[str] = []
+    for part in (request.GET.get('fx') or '').split(','):
+        c = _norm_ccy(part)
+        if c and c not in fx_codes:
+            fx_codes.append(c)
+
+    crypto_ids: list[str] = []
+    for part in (request.GET.get('crypto') or '').split(','):
+        p = (part or '').strip().lower()
+        if p in CRYPTO_ALLOWED_IDS and p not in crypto_ids:
+            crypto_ids.append(p)
+
+    days_raw = (request.GET.get('days') or '').strip()
+    try:
+        days = int(days_raw) if days_raw else FX_PAGE_RANGE_DAYS
+    except Exception:
+        days = FX_PAGE_RANGE_DAYS
+
+    return (
+        fx_codes[:len(FX_PAGE_BASES)] or list(FX_PAGE_DEFAULT),
+        crypto_ids[:len(CRYPTO_ALLOWED_IDS)] or list(CRYPTO_DEFAULT_IDS),
+        max(7, min(60, days)),
     )
+
+
+def _bundle_section(build):
+    # Isola cada seção: erro vira {'ok': False}; miss (cache_only) vira None e fica de fora.
+    try:
+        return build()
+    except CacheMiss:
+        return None
+    except Exception as e:
+        return {'ok': False, 'error': str(e)}
+
+
+def _bundle_compact(sections: dict) -> dict:
+    return {k: v for k, v in sections.items() if v is not None}
+
+
+def _consultas_bundle(fx_codes: list[str], crypto_ids: list[str], days: int, *, cache_only: bool = False) -> dict:
+    """Dados de todos os widgets de /consultas/ numa resposta só."""
+    today = timezone.localdate()
+
+    def fetch(target: UpstreamTarget) -> CachedValue:
+        return _cached_fetch_json(target, cache_only=cache_only)
+
+    fx = _bundle_compact({
+        code: _bundle_section(lambda code=code: _fx_range_payload(code, days, today, fetch(fx_table_target(today))))
+        for code in fx_codes
+    })
+    charts = _bundle_compact({
+        coin_id: _bundle_section(
+            lambda coin_id=coin_id: _crypto_chart_payload(coin_id, days, fetch(crypto_chart_target(coin_id)))
+        )
+        for coin_id in crypto_ids
+    })
+
+    return _bundle_compact({
+        'ok': True,
+        'fx': fx,
+        'crypto': _bundle_compact({
+            'prices': _bundle_section(lambda: _crypto_prices_payload(crypto_ids, fetch(crypto_prices_target()))),
+            'charts': charts,
+        }),
+        'holidays': _bundle_section(
+            lambda: _holidays_payload(today)
+        ),
+        'dayfacts': _bundle_section(lambda: _dayfacts_payload(today)),
+    })
+
+
+# Bundle junta várias fontes: memo curto, e só se nenhuma seção falhou.
+BUNDLE_FRESH_SECONDS = 60
+
+
+def _bundle_key(fx_codes: list[str], crypto_ids: list[str], days: int) -> str:
+    return f"consultas:bundle:{timezone.localdate().isoformat()}:{','.join(fx_codes)}:{','.join(crypto_ids)}:{days}"
+
+
+def _bundle_fresh_seconds(bundle: dict) -> int:
+    sections = [bundle.get('holidays'), bundle.get('dayfacts')]
+    sections += list((bundle.get('fx') or {}).values())
+    crypto = bundle.get('crypto') or {}
+    sections += [crypto.get('prices')] + list((crypto.get('charts') or {}).values())
+    failed = any(isinstance(s, dict) and s.get('ok') is False for s in sections)
+    stale = any(isinstance(s, dict) and s.get('stale') for s in sections)
+    return 0 if (failed or stale) else BUNDLE_FRESH_SECONDS
+
+
+@require_GET
+def api_consultas_bundle(request: HttpRequest):
+    fx_codes, crypto_ids, days = _bundle_params(request)
+
+    def build():
+        bundle = _consultas_bundle(fx_codes, crypto_ids, days)
+        return bundle, _bundle_fresh_seconds(bundle)
+
+    return cached_json_response(request, _bundle_key(fx_codes, crypto_ids, days), build)
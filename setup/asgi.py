@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'setup.settings')
+# No ASGI, as APIs de /consultas/ usam as views async (blog/async_views.py).
+os.environ.setdefault('OXIRA_ASYNC_CONSULTAS', '1')
 
 application = get_asgi_application()
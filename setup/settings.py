@@ -163,9 +163,50 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Uploads e imagens gravados pelo hash do conteúdo (blog/media_storage.py): bytes repetidos
+# não ocupam disco de novo e os caminhos <pasta>/<ab>/<sha256>.<ext> podem ir com cache de um ano.
+OXIRA_MEDIA_CONTENT_ADDRESSED = os.environ.get('OXIRA_MEDIA_CONTENT_ADDRESSED', '1') in ('1', 'true', 'True', 'yes', 'YES')
+STORAGES = {
+    'default': {
+        'BACKEND': (
+            'blog.media_storage.ContentAddressedStorage'
+            if OXIRA_MEDIA_CONTENT_ADDRESSED
+            else 'django.core.files.storage.FileSystemStorage'
+        ),
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
+# CONSULTAS (/api/consultas/*)
+# Liga o prefetcher em thread nos workers web: mantém as keys dos upstreams
+# (câmbio, cripto, feriados, Wikipedia) sempre quentes no cache.
+OXIRA_CONSULTAS_PREFETCH = os.environ.get('OXIRA_CONSULTAS_PREFETCH', '0') in ('1', 'true', 'True', 'yes', 'YES')
+# Usa as views async (fan-out concorrente, sem segurar thread). setup/asgi.py liga por padrão.
+OXIRA_ASYNC_CONSULTAS = os.environ.get('OXIRA_ASYNC_CONSULTAS', '0') in ('1', 'true', 'True', 'yes', 'YES')
+# Embute no HTML de /consultas/ (json_script) o que já estiver em cache, evitando os fetches iniciais.
+OXIRA_CONSULTAS_EMBED_BUNDLE = os.environ.get('OXIRA_CONSULTAS_EMBED_BUNDLE', '1') in ('1', 'true', 'True', 'yes', 'YES')
+# Índice de curiosidades do dia (gerado por `manage.py build_dayfacts_index`).
+OXIRA_DAYFACTS_INDEX = os.environ.get('OXIRA_DAYFACTS_INDEX', os.path.join(BASE_DIR, 'var', 'dayfacts_index.json.gz'))
+# Feriados são calculados localmente; o Nager.Date só complementa (em background). 0 = nunca chama.
+OXIRA_CONSULTAS_NAGER = os.environ.get('OXIRA_CONSULTAS_NAGER', '1') in ('1', 'true', 'True', 'yes', 'YES')
+# Última resposta boa de cada upstream, em disco: worker novo serve na hora, sem ir ao upstream. '' desliga.
+OXIRA_CONSULTAS_SNAPSHOT_DIR = os.environ.get('OXIRA_CONSULTAS_SNAPSHOT_DIR', os.path.join(BASE_DIR, 'var', 'consultas_snapshots'))
+# Só para teste de carga: manda os upstreams para o stub local (`manage.py consultas_stub`), ex. http://127.0.0.1:8765.
+OXIRA_CONSULTAS_UPSTREAM_STUB = os.environ.get('OXIRA_CONSULTAS_UPSTREAM_STUB', '')
+
+# IMAGENS (capas dos posts e avatares)
+# Crop/resize/variantes rodam em thread depois do save (blog/image_jobs.py). 1 = processa dentro do save.
+OXIRA_IMAGE_JOBS_SYNC = os.environ.get('OXIRA_IMAGE_JOBS_SYNC', '0') in ('1', 'true', 'True', 'yes', 'YES')
+# Limite de pixels por imagem (upload recusado acima disso) e decodes simultâneos por processo (blog/image_ingest.py).
+OXIRA_IMAGE_MAX_PIXELS = int(os.environ.get('OXIRA_IMAGE_MAX_PIXELS', '60000000'))
+OXIRA_IMAGE_DECODE_SLOTS = int(os.environ.get('OXIRA_IMAGE_DECODE_SLOTS', '2'))
+
 # CKEDITOR SETTINGS
 CKEDITOR_UPLOAD_PATH = "uploads/"
-CKEDITOR_IMAGE_BACKEND = "pillow"
+# Backend do Pillow + renditions e miniatura com orçamento de memória (blog/inline_images.py).
+CKEDITOR_IMAGE_BACKEND = "blog.inline_images.OptimizingBackend"
 
 CKEDITOR_CONFIGS = {
     'default': {
@@ -19,6 +19,7 @@ from django.urls import path, include
 from django.contrib.auth import views as auth_views
 from django.urls import reverse_lazy
 from blog import admin_views
+from blog.media_storage import serve_media
 
 from django.conf import settings
 from django.conf.urls.static import static
@@ -45,4 +46,4 @@ urlpatterns = [
             ),
             name='password_reset_complete',
         ),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+] + static(settings.MEDIA_URL, view=serve_media, document_root=settings.MEDIA_ROOT)